@@ -0,0 +1,135 @@
+"""
+Micro-benchmark for the JSON helpers in utils.py.
+
+Builds a synthetic settings tree shaped like server_settings.json (5k guilds by
+default) and times sanitize_for_json, safe_json_dump and safe_json_dumps against
+the original recursive implementation, which is kept below as the reference.
+
+    python bench_json.py [--guilds 5000] [--repeat 5]
+"""
+import argparse
+import io
+import json
+import random
+import time
+from collections.abc import Mapping, Sequence
+
+import utils
+
+
+# --- Reference: the recursive sanitizer these helpers replaced ---
+def legacy_sanitize_for_json(obj, seen=None):
+    if seen is None:
+        seen = set()
+    obj_id = id(obj)
+    if obj_id in seen:
+        return '<circular-reference>'
+    seen.add(obj_id)
+
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    elif isinstance(obj, Mapping):
+        out = {}
+        for k, v in obj.items():
+            key = legacy_sanitize_for_json(k, seen) if not isinstance(k, str) else k
+            if key in ('author', 'content', 'channel'):
+                out[key] = str(v)
+            elif key == 'timeout_enabled':
+                out[key] = v if isinstance(v, bool) else True
+            else:
+                out[key] = legacy_sanitize_for_json(v, seen)
+        return out
+    elif isinstance(obj, Sequence) and not isinstance(obj, (str, bytes, bytearray)):
+        return [legacy_sanitize_for_json(item, seen) for item in obj]
+    else:
+        return f'<non-serializable: {type(obj).__qualname__}>'
+
+def legacy_safe_json_dump(obj, fp, **kwargs):
+    json.dump(legacy_sanitize_for_json(obj), fp, **kwargs)
+
+def legacy_safe_json_dumps(obj, **kwargs):
+    return json.dumps(legacy_sanitize_for_json(obj), **kwargs)
+
+
+def build_settings(guilds, dirty=False, seed=0):
+    """A server_settings-like tree; `dirty` mixes in values the sanitizer must rewrite."""
+    rng = random.Random(seed)
+    settings = {}
+    for g in range(guilds):
+        guild_id = str(10**17 + g)
+        members = {
+            str(10**17 + g * 100 + m): {
+                "roles": [rng.randrange(10**17, 10**18) for _ in range(3)],
+                "nickname": f"member{m}",
+                "status": "online",
+            }
+            for m in range(5)
+        }
+        messages = [
+            {"author": f"user{m}", "content": f"message {m} in guild {g}", "channel": "general",
+             "timestamp": 1700000000.0 + m}
+            for m in range(10)
+        ]
+        entry = {
+            "automod_enabled": True,
+            "blocked_keywords": ["spam", "advertisement", "free nitro"],
+            "regex_patterns": [r"https?://\S+", r"discord\.gg/\S+"],
+            "timeout_enabled": True,
+            "timeout_duration": 60,
+            "spam_threshold": 5,
+            "spam_time_window": 10,
+            "owner_id": 10**17 + g,
+            "owner_name": f"owner{g}",
+            "members": members,
+            "messages": messages,
+        }
+        if dirty:
+            entry["timeout_enabled"] = "yes"
+            entry["created"] = object()
+            messages[0]["author"] = 12345
+            entry["roles_by_id"] = {1: "admin", 2: "mod"}
+        settings[guild_id] = entry
+    return settings
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    clean = build_settings(args.guilds)
+    dirty = build_settings(args.guilds, dirty=True)
+
+    # The legacy sanitizer's never-cleared `seen` set also replaces shared values (interned
+    # strings and ints) with '<circular-reference>', so outputs are checked against the
+    # plain encoder on the clean tree rather than against each other
+    assert utils.safe_json_dumps(clean) == json.dumps(clean)
+    assert utils.safe_json_dumps(clean, indent=2) == json.dumps(clean, indent=2)
+    json.loads(utils.safe_json_dumps(dirty))
+
+    cases = [
+        ("sanitize_for_json (clean)", lambda: legacy_sanitize_for_json(clean), lambda: utils.sanitize_for_json(clean)),
+        ("sanitize_for_json (dirty)", lambda: legacy_sanitize_for_json(dirty), lambda: utils.sanitize_for_json(dirty)),
+        ("safe_json_dump indent=2", lambda: legacy_safe_json_dump(clean, io.StringIO(), indent=2),
+         lambda: utils.safe_json_dump(clean, io.StringIO(), indent=2)),
+        ("safe_json_dumps compact", lambda: legacy_safe_json_dumps(clean), lambda: utils.safe_json_dumps(clean)),
+    ]
+    print(f"{args.guilds} guilds, best of {args.repeat}")
+    for name, old, new in cases:
+        old_ms = best_of(old, args.repeat)
+        new_ms = best_of(new, args.repeat)
+        print(f"  {name:<28} {old_ms:8.0f} ms -> {new_ms:8.0f} ms  ({old_ms / new_ms:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
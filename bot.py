@@ -3,17 +3,24 @@ from nextcord.ext import commands, tasks
 import logging
 import os
 import json
-from utils import safe_json_dump, safe_json_dumps
+from utils import json_merge_patch, safe_json_dump, safe_json_dumps
 from dotenv import load_dotenv  # Import dotenv to load environment variables
 import re
 import aiohttp
 # import requests  # No longer needed
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, session, url_for, jsonify, flash, send_file
+from flask import Flask, render_template, request, redirect, session, url_for, jsonify, flash, send_file, Response, g, has_request_context
+from werkzeug.serving import BaseWSGIServer
 import threading  # Import threading to run Flask in a separate thread
 import asyncio
+import concurrent.futures
+import hashlib
+import queue
+import secrets
+from collections import Counter, OrderedDict, deque
 from nextcord import Intents
 import time
+from dataclasses import dataclass, field
 from nextcord import Interaction  # Import Interaction for slash commands
 from nextcord.ext.commands import has_permissions  # Import has_permissions for permission checks
 
@@ -60,9 +67,7 @@ def user_has_owner_role(guild_id, user_id, access_token):
     Returns True if the user is the guild owner or has the owner role.
     Logs debug info for troubleshooting.
     """
-    import requests
-    owner_roles = load_owner_roles().get(guild_id, {})
-    owner_role_id = owner_roles.get("role_id")
+    owner_role_id = get_owner_role_id(guild_id)
     owner_id = server_settings.get(guild_id, {}).get("owner_id")
     # Debug logging
     logging.debug(f"[user_has_owner_role] guild_id={guild_id} user_id={user_id} owner_id={owner_id} owner_role_id={owner_role_id}")
@@ -70,20 +75,16 @@ def user_has_owner_role(guild_id, user_id, access_token):
         logging.debug("[user_has_owner_role] User is guild owner. Access granted.")
         return True
     if owner_role_id:
-        url = f'https://discord.com/api/users/@me/guilds/{guild_id}/member'
-        headers = {'Authorization': f'Bearer {access_token}'}
-        resp = requests.get(url, headers=headers)
-        if resp.status_code == 200:
-            roles = resp.json().get('roles', [])
-            logging.debug(f"[user_has_owner_role] Discord roles for user: {roles}")
-            if str(owner_role_id) in [str(r) for r in roles]:
-                logging.debug("[user_has_owner_role] User has owner role. Access granted.")
-                return True
-            logging.debug("[user_has_owner_role] User does not have owner role. Access denied.")
-            return False
-        else:
-            logging.warning(f"[user_has_owner_role] Failed to fetch roles from Discord API: {resp.status_code}")
+        access = guild_authorizer.member_access(guild_id, user_id, access_token)
+        if access is None:
+            logging.warning(f"[user_has_owner_role] No gateway or API data for user {user_id} in guild {guild_id}")
             return False
+        logging.debug(f"[user_has_owner_role] Roles for user: {sorted(access.role_ids)}")
+        if access.is_owner or owner_role_id in access.role_ids:
+            logging.debug("[user_has_owner_role] User has owner role. Access granted.")
+            return True
+        logging.debug("[user_has_owner_role] User does not have owner role. Access denied.")
+        return False
     else:
         # No owner_role_id set, fallback to owner_id check (already done above)
         # No owner_role_id set, fallback to owner_id check
@@ -114,39 +115,26 @@ app = Flask(__name__)
 
 # --- Utility: Clean circular references in server_settings.json ---
 def clean_server_settings_file():
+    """
+    Manual repair pass for server_settings.json: re-validate every guild entry through
+    GuildSettings and rewrite the file only if something had to be fixed.
+    Regular saves no longer need this, since values are validated on the way in.
+    """
     filename = SERVER_SETTINGS_FILE
     try:
         with open(filename, "r", encoding="utf-8") as f:
             data = json.load(f)
-        fields_to_check = ["timeout_enabled", "automod_threshold", "automod_time_window"]
-        changed = False
+        cleaned = {
+            gid: validate_guild_settings(settings) if isinstance(settings, dict) else settings
+            for gid, settings in data.items()
+        }
         # Clean global hide_owner_id
-        if isinstance(data.get("hide_owner_id"), str) and data["hide_owner_id"].startswith("<circular"):
-            data["hide_owner_id"] = True  # Default to True if corrupted
-            changed = True
-        for gid, settings in data.items():
-            if not isinstance(settings, dict):
-                continue
-            for field in fields_to_check:
-                val = settings.get(field)
-                # Clean circular references and non-numeric values
-                if (
-                    (isinstance(val, str) and val.startswith("<circular")) or
-                    (field in ["automod_threshold", "automod_time_window"] and not isinstance(val, (int, float)))
-                ):
-                    if field == "timeout_enabled":
-                        # Only reset if not a boolean or is a circular reference
-                        if not isinstance(val, bool) or (isinstance(val, str) and val.startswith("<circular")):
-                            settings[field] = True
-                        changed = True
-                    elif field == "automod_threshold":
-                        settings[field] = 5
-                    elif field == "automod_time_window":
-                        settings[field] = 10
-                    changed = True
+        if isinstance(cleaned.get("hide_owner_id"), str) and cleaned["hide_owner_id"].startswith("<circular"):
+            cleaned["hide_owner_id"] = True  # Default to True if corrupted
+        changed = cleaned != data
         if changed:
             with open(filename, "w", encoding="utf-8") as f:
-                safe_json_dump(data, f, indent=2)
+                safe_json_dump(cleaned, f, indent=2)
         return changed
     except Exception as e:
         logging.error(f"Error cleaning server_settings: {e}")
@@ -175,9 +163,7 @@ def set_hide_owner_id():
     if not isinstance(value, bool):
         return jsonify({'success': False, 'error': 'Value must be boolean'}), 400
 
-    global server_settings
-    server_settings = load_server_settings()
-    server_settings['hide_owner_id'] = value
+    set_global_setting('hide_owner_id', value)
     save_server_settings(server_settings)
     return jsonify({'success': True, 'hide_owner_id': server_settings['hide_owner_id']})
 
@@ -202,15 +188,13 @@ def update_owner_roles():
 
         # Check if the current user is the owner of the guild
         access_token = session.get('access_token')
-        headers = {'Authorization': f'Bearer {access_token}'}
-        import requests
-        user_resp = requests.get('https://discord.com/api/users/@me', headers=headers)
-        if user_resp.status_code != 200:
+        status, user, _ = discord_api('GET', '/users/@me', token=access_token, cache_ttl=DISCORD_CACHE_TTL)
+        if status != 200 or not user:
             return "Unable to fetch user info from Discord.", 403
-        user_id = user_resp.json().get('id')
+        user_id = user.get('id')
 
         # Load server settings and check owner
-        settings = load_server_settings().get(guild_id, {})
+        settings = server_settings.get(guild_id, {})
         owner_id = str(settings.get('owner_id'))
         if not owner_id or user_id != owner_id:
             return "Only the guild owner can update owner roles.", 403
@@ -253,31 +237,446 @@ def get_owner_roles(guild_id):
 # --- Automatically generate templates for all guilds when the bot is ready ---
 # (Moved below bot = ...)
 
-def load_owner_roles():
-    """Load owner roles from the JSON file and ensure guild IDs are included."""
+# --- Versioned guild state for the polling JSON endpoints ---
+# Anything that changes what /api/portal_guilds or /api/guilds return bumps the version,
+# so unchanged polls are answered from a cached body or with 304 Not Modified.
+PORTAL_PAYLOAD_CACHE_SIZE = 64
+
+class PortalStateVersion:
+    """
+    Monotonic state version plus the version at which each guild last changed.
+    Serialized payloads are cached per (endpoint, since) and only for the current version.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Start from the clock so versions (and ETags) from a previous process never repeat
+        self.version = int(time.time() * 1000)
+        self._floor = self.version  # `since` values below this get a full payload
+        self._changed = {}  # guild_id -> version of its last change
+        self._payloads = {}  # (name, since) -> (version, etag, body)
+
+    def bump(self, guild_id=None):
+        """Record a change to one guild, or to every guild when guild_id is None."""
+        with self._lock:
+            self.version += 1
+            if guild_id is None:
+                self._floor = self.version
+                self._changed.clear()
+            else:
+                self._changed[str(guild_id)] = self.version
+            self._payloads.clear()
+
+    def changes_since(self, since):
+        """Return (version, ids of guilds changed after `since`, or None if any may have)."""
+        with self._lock:
+            version = self.version
+            if since == version:
+                return version, set()
+            if since is None or since < self._floor or since > version:
+                return version, None
+            return version, {gid for gid, v in self._changed.items() if v > since}
+
+    def render(self, name, since, build):
+        """
+        Return (version, etag, body) for an endpoint. build(version, changed) returns the
+        payload dict; changed is the set of guild ids changed after `since`, or None for
+        a full payload. The body is built at most once per version and `since`.
+        """
+        version, changed = self.changes_since(since)
+        if changed is None:
+            since = None
+        with self._lock:
+            cached = self._payloads.get((name, since))
+            if cached is not None:
+                return cached
+        body = safe_json_dumps(build(version, changed))
+        etag = f"{name}-{version}" if since is None else f"{name}-{version}-{since}"
+        result = (version, etag, body)
+        with self._lock:
+            if self.version == version:
+                if len(self._payloads) >= PORTAL_PAYLOAD_CACHE_SIZE:
+                    self._payloads.clear()
+                self._payloads[(name, since)] = result
+        return result
+
+portal_state = PortalStateVersion()
+# /api/guilds only returns names, owners and member counts, so it is versioned apart from
+# portal_state (which also moves on settings and logged messages) and keeps its ETag
+# while guilds are merely chatting. Bumped on guild join/remove/update and member join/remove.
+guild_list_state = PortalStateVersion()
+
+def versioned_guilds_response(name, build_guild, state=portal_state, guild_ids=None):
+    """
+    JSON response listing build_guild(guild) for the bot's guilds, with a strong ETag
+    (304 on If-None-Match) and `?since=<version>` deltas: only guilds changed after that
+    version plus the ids of guilds the bot has left. `state` is the version the payload
+    follows; `guild_ids` limits the listing to those guilds (payloads are then cached
+    per distinct set).
+    """
+    if guild_ids is not None:
+        guild_ids = frozenset(str(gid) for gid in guild_ids)
+        name = f"{name}-{hashlib.sha256(','.join(sorted(guild_ids)).encode()).hexdigest()[:16]}"
+
+    def visible(gid):
+        return guild_ids is None or gid in guild_ids
+
+    def build(version, changed):
+        if changed is None:
+            return {'version': version, 'guilds': [build_guild(g) for g in bot.guilds if visible(str(g.id))]}
+        current = set()
+        guilds = []
+        for guild in bot.guilds:
+            gid = str(guild.id)
+            current.add(gid)
+            if gid in changed and visible(gid):
+                guilds.append(build_guild(guild))
+        removed = sorted(gid for gid in changed - current if visible(gid))
+        return {'version': version, 'since': since, 'guilds': guilds, 'removed': removed}
+
+    since = request.args.get('since', type=int)
+    version, etag, body = state.render(name, since, build)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def latest_guild_message(entry):
+    """The guild's latest logged message from its settings entry, or None."""
+    latest = entry.get('latest_message')
+    if not latest:
+        messages = entry.get('messages')
+        latest = messages[-1] if isinstance(messages, list) and messages else None
+    if not isinstance(latest, dict):
+        return None
+    return {
+        'author': latest.get('author', 'Unknown'),
+        'content': latest.get('content', ''),
+        'timestamp': latest.get('timestamp', ''),
+    }
+
+# --- Portal view model ---
+# The portal page is rendered from per-guild rows kept in memory and refreshed only for
+# guilds that portal_state reports as changed; GET /portal never writes settings to disk.
+
+class PortalGuildIndex:
+    """
+    Portal rows for the guilds the bot is in, and for guilds only known from
+    server_settings ("logged" guilds). Published copy-on-write like server_settings,
+    so a snapshot can be iterated while another thread refreshes the index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (version, rows by guild id, logged rows by guild id, settings entries by guild id)
+        self._state = (None, {}, {}, {})
+
+    def snapshot(self):
+        """Return (version, rows, logged rows, settings entries), refreshing changed guilds."""
+        state = self._state
+        version, changed = portal_state.changes_since(state[0])
+        if changed is not None and not changed:
+            return state
+        with self._lock:
+            state = self._state
+            version, changed = portal_state.changes_since(state[0])
+            if changed is None:
+                self._state = (version,) + self._build_all()
+            elif changed:
+                self._state = (version,) + self._update(state[1:], changed)
+            return self._state
+
+    def _build_all(self):
+        rows, logged, entries = {}, {}, {}
+        owner_roles = load_owner_roles()
+        for guild in bot.guilds:
+            gid = str(guild.id)
+            entries[gid] = self._entry(gid)
+            rows[gid] = self._row(guild, entries[gid], owner_roles)
+        for gid, entry in list(server_settings.items()):
+            if gid not in rows and isinstance(entry, dict) and str(gid).isdigit():
+                logged[gid] = self._logged_row(gid, entry)
+        return rows, logged, entries
+
+    def _update(self, snapshot, changed):
+        rows, logged, entries = (dict(part) for part in snapshot)
+        owner_roles = load_owner_roles()
+        for gid in changed:
+            guild = bot.get_guild(int(gid)) if gid.isdigit() else None
+            rows.pop(gid, None)
+            logged.pop(gid, None)
+            entries.pop(gid, None)
+            entry = server_settings.get(gid)
+            if guild is not None:
+                entries[gid] = self._entry(gid)
+                rows[gid] = self._row(guild, entries[gid], owner_roles)
+            elif isinstance(entry, dict):
+                logged[gid] = self._logged_row(gid, entry)
+        return rows, logged, entries
+
+    @staticmethod
+    def _entry(gid):
+        entry = server_settings.get(gid)
+        return entry if isinstance(entry, dict) else {}
+
+    @staticmethod
+    def _row(guild, entry, owner_roles):
+        gid = str(guild.id)
+        owner = getattr(guild, 'owner', None)
+        owner_entry = owner_roles.get(gid)
+        owner_entry = owner_entry if isinstance(owner_entry, dict) else {}
+        return {
+            'id': gid,
+            'name': guild.name,
+            'owner_name': owner.name if owner else "Unknown",
+            'owner_id': getattr(guild, 'owner_id', None) or "Unknown",
+            'owner_role_name': owner_entry.get("role_name") or 'Not Set',
+            'owner_roles': owner_entry,
+            'automod_enabled': entry.get("automod_enabled", False),
+            'blocked_keywords': entry.get("blocked_keywords", []),
+            'regex_patterns': entry.get("regex_patterns", []),
+            'spam_threshold': entry.get("spam_threshold", 5),
+            'spam_time_window': entry.get("spam_time_window", 10),
+            'bot_role_top': entry.get("bot_role_top", False),
+            'latest_message': latest_guild_message(entry),
+        }
+
+    @staticmethod
+    def _logged_row(gid, entry):
+        return {
+            'id': gid,
+            'name': entry.get('name', f'Guild {gid}'),
+            'owner_name': entry.get('owner_name', 'Unknown'),
+            'owner_id': entry.get('owner_id', 'Unknown'),
+            'automod_enabled': entry.get('automod_enabled', True),
+            'blocked_keywords': entry.get('blocked_keywords', []),
+            'regex_patterns': entry.get('regex_patterns', []),
+            'spam_threshold': entry.get('spam_threshold', 5),
+            'spam_time_window': entry.get('spam_time_window', 10),
+            'latest_message': latest_guild_message(entry),
+        }
+
+portal_guild_index = PortalGuildIndex()
+
+@dataclass(slots=True)
+class PortalView:
+    """Everything portal.html shows one user; cached on their PortalSession per state version."""
+    version: int
+    bot_guilds: list
+    logged_guilds: list
+    user_guilds_with_permissions: list
+    guilds_user_in_not_owner: list
+    settings: dict  # guild_id -> settings entry, for the per-guild forms
+
+def build_portal_view(record):
+    """Return the PortalView for a session, rebuilding it only after guild state changed."""
+    version, rows, logged, entries = portal_guild_index.snapshot()
+    cached = record.portal_view
+    if cached is not None and cached.version == version:
+        return cached
+    user_id = record.user_id
+    bot_guilds = []
+    for gid, row in rows.items():
+        user_is_owner = str(row['owner_id']) == user_id
+        # Only guilds the user is in can grant them the owner role
+        has_role = user_is_owner or (gid in record.guild_status and user_has_owner_role(gid, user_id, record.access_token))
+        bot_guilds.append(dict(row, user_is_owner=user_is_owner, user_has_owner_role=has_role))
+    by_id = {guild['id']: guild for guild in bot_guilds}
+    owner_roles = load_owner_roles()
+    user_guilds_with_permissions = []
+    guilds_user_in_not_owner = []
+    for guild in record.guilds:
+        gid = str(guild.get('id') or '')
+        if not gid:
+            continue
+        if gid in by_id:
+            if not by_id[gid]['user_is_owner']:
+                guilds_user_in_not_owner.append(by_id[gid])
+        elif record.guild_status[gid]['permissions'] & PERMISSION_MANAGE_GUILD:
+            owner_entry = owner_roles.get(gid)
+            owner_entry = owner_entry if isinstance(owner_entry, dict) else {}
+            user_guilds_with_permissions.append({
+                'id': gid,
+                'name': guild.get('name', 'Unknown'),
+                'icon': guild.get('icon', None),
+                'owner_role': owner_entry.get("role_name") or f"Role ID: {owner_entry.get('role_id', 'Unknown')}",
+            })
+    view = PortalView(version, bot_guilds, list(logged.values()), user_guilds_with_permissions,
+                      guilds_user_in_not_owner, entries)
+    record.portal_view = view
+    return view
+
+# In-memory owner roles, loaded from OWNER_ROLES_FILE once and written through by
+# save_owner_roles. Authorization checks never touch the disk.
+owner_roles = None
+_owner_roles_lock = threading.Lock()
+# guild_id -> resolved owner role id (or None); cleared by saves and role gateway events
+_owner_role_ids = {}
+
+def _read_owner_roles_file():
     try:
         with open(OWNER_ROLES_FILE, "r") as f:
-            owner_roles = json.load(f)
-            # Ensure guild IDs are included in the structure
-            for guild_id in owner_roles:
-                if "guild_id" not in owner_roles[guild_id]:
-                    owner_roles[guild_id]["guild_id"] = guild_id
-            return owner_roles
+            return json.load(f)
     except FileNotFoundError:
         logging.warning(f"{OWNER_ROLES_FILE} not found. Creating a new one.")
         with open(OWNER_ROLES_FILE, "w") as f:
             json.dump({}, f)
         return {}
 
-def save_owner_roles(owner_roles):
-    """Save owner roles to the JSON file."""
+def load_owner_roles():
+    """Return the cached owner roles, reading the JSON file only on first use."""
+    global owner_roles
+    if owner_roles is None:
+        with _owner_roles_lock:
+            if owner_roles is None:
+                owner_roles = _read_owner_roles_file()
+    return owner_roles
+
+def save_owner_roles(data):
+    """Save owner roles and additional settings to the JSON file and refresh the cache."""
+    global owner_roles
     try:
-        with open(OWNER_ROLES_FILE, "w") as f:
-            safe_json_dump(owner_roles, f, indent=2)
-        logging.info("Owner roles saved successfully.")
+        with _owner_roles_lock:
+            # Add additional settings to the owner roles structure
+            for guild_id, entry in data.items():
+                if isinstance(entry, dict) and "additional_settings" not in entry:
+                    entry["additional_settings"] = {
+                        "automod_enabled": False,
+                        "blocked_keywords": [],
+                        "regex_patterns": [],
+                        "permissions": {
+                            "manage_roles": True,
+                            "manage_channels": True
+                        }
+                    }
+            with open(OWNER_ROLES_FILE, "w") as f:
+                safe_json_dump(data, f, indent=2)
+            # Keep the module-level dict identity so existing references stay current
+            if owner_roles is None:
+                owner_roles = data
+            elif owner_roles is not data:
+                owner_roles.clear()
+                owner_roles.update(data)
+            _owner_role_ids.clear()
+        portal_state.bump()
+        logging.info("Owner roles and settings saved successfully.")
     except Exception as e:
         logging.error(f"Error saving owner roles: {e}")
 
+def get_owner_role_id(guild_id):
+    """
+    Owner role id for a guild from the cache. Entries stored by role name are resolved
+    against the gateway's role list once and remembered until a role event for the guild.
+    """
+    guild_id = str(guild_id)
+    if guild_id in _owner_role_ids:
+        return _owner_role_ids[guild_id]
+    entry = load_owner_roles().get(guild_id, {})
+    role_id = entry.get("role_id") if isinstance(entry, dict) else None
+    if not role_id and isinstance(entry, dict) and entry.get("role_name"):
+        guild = bot.get_guild(int(guild_id))
+        role = nextcord.utils.get(guild.roles, name=entry["role_name"]) if guild else None
+        role_id = role.id if role else None
+    _owner_role_ids[guild_id] = int(role_id) if role_id else None
+    return _owner_role_ids[guild_id]
+
+def invalidate_owner_role(guild_id):
+    """Forget the resolved owner role for a guild (after role create/update/delete)."""
+    _owner_role_ids.pop(str(guild_id), None)
+
+# --- Authorization decisions from the gateway cache ---
+# How long a decision built from the REST fallback is trusted (no gateway events cover it)
+AUTH_REST_DECISION_TTL = 60
+# Gateway-backed decisions are invalidated by member/role/guild events; this is the backstop
+AUTH_GATEWAY_DECISION_TTL = 300
+
+@dataclass(slots=True)
+class MemberAccess:
+    """Ownership and roles of one user in one guild."""
+    is_owner: bool
+    role_ids: frozenset
+    role_names: frozenset  # lower-cased
+    expires_at: float  # monotonic
+
+class GuildAuthorizer:
+    """
+    Answers "does user U own guild G or have role R there" from the bot's member and
+    role cache, with a per-(guild, user) decision cache. Only guilds the gateway cannot
+    answer for fall back to the member REST endpoint.
+    """
+
+    def __init__(self):
+        self._decisions = {}
+        # Flask threads read and fill the cache while bot-loop events invalidate it
+        self._lock = threading.Lock()
+
+    def member_access(self, guild_id, user_id, access_token=None):
+        key = (str(guild_id), str(user_id))
+        with self._lock:
+            access = self._decisions.get(key)
+        if access is not None and access.expires_at > time.monotonic():
+            return access
+        access = self._from_gateway(*key)
+        if access is None and access_token:
+            access = self._from_rest(key[0], access_token)
+        if access is not None:
+            with self._lock:
+                self._decisions[key] = access
+        return access
+
+    def has_role(self, guild_id, user_id, role_id=None, role_name=None, access_token=None):
+        access = self.member_access(guild_id, user_id, access_token)
+        if access is None:
+            return False
+        if role_id is not None and int(role_id) in access.role_ids:
+            return True
+        return role_name is not None and role_name.lower() in access.role_names
+
+    def invalidate(self, guild_id, user_id=None):
+        guild_id = str(guild_id)
+        with self._lock:
+            if user_id is not None:
+                self._decisions.pop((guild_id, str(user_id)), None)
+                return
+            for key in [k for k in self._decisions if k[0] == guild_id]:
+                del self._decisions[key]
+
+    @staticmethod
+    def _from_gateway(guild_id, user_id):
+        guild = bot.get_guild(int(guild_id))
+        if guild is None:
+            return None
+        member = guild.get_member(int(user_id))
+        if member is None:
+            # Without a full member list, absence proves nothing
+            if not getattr(guild, 'chunked', False):
+                return None
+            return MemberAccess(False, frozenset(), frozenset(), time.monotonic() + AUTH_GATEWAY_DECISION_TTL)
+        return MemberAccess(
+            guild.owner_id == member.id,
+            frozenset(role.id for role in member.roles),
+            frozenset(role.name.lower() for role in member.roles),
+            time.monotonic() + AUTH_GATEWAY_DECISION_TTL,
+        )
+
+    @staticmethod
+    def _from_rest(guild_id, access_token):
+        """The token owner's membership via REST; role names only resolve for cached guilds."""
+        status, member, _ = discord_api('GET', f'/users/@me/guilds/{guild_id}/member', token=access_token)
+        if status != 200 or not member:
+            return None
+        role_ids = frozenset(int(r) for r in member.get('roles', []))
+        guild = bot.get_guild(int(guild_id))
+        role_names = frozenset(r.name.lower() for r in guild.roles if r.id in role_ids) if guild else frozenset()
+        return MemberAccess(False, role_ids, role_names, time.monotonic() + AUTH_REST_DECISION_TTL)
+
+guild_authorizer = GuildAuthorizer()
+
+load_owner_roles()
+
 def clean_circular_references(obj, seen=None, path=None):
     """
     Recursively remove circular references from a dict/list.
@@ -309,85 +708,81 @@ def clean_circular_references(obj, seen=None, path=None):
     else:
         return obj
 
-def save_server_settings(settings):
-    """Save server-specific settings to the JSON file, ensuring valid int or float values. If settings is a flat automod dict, write it as-is (not nested)."""
-    try:
-        # If settings is a flat automod config (not per-guild dict), write as-is
-        automod_keys = {"automod_enabled", "timeout_enabled", "blocked_keywords", "regex_patterns"}
-        if set(settings.keys()) <= automod_keys:
-            # Clean automod_enabled to always be a bool if present
-            if "automod_enabled" in settings and not isinstance(settings["automod_enabled"], bool):
-                settings["automod_enabled"] = bool(settings["automod_enabled"])
-            # Validate timeout_enabled
-            if "timeout_enabled" not in settings or not isinstance(settings["timeout_enabled"], bool):
-                settings["timeout_enabled"] = True
-            # Validate timeout_duration
-            if "timeout_duration" not in settings or not isinstance(settings["timeout_duration"], int):
-                settings["timeout_duration"] = 60
-            with open(SERVER_SETTINGS_FILE, "w", encoding="utf-8") as f:
-                safe_json_dump(settings, f, indent=2)
-            logging.info("Flat automod config saved.")
-            return
-        # Otherwise, clean per-guild settings as before
-        changed = False
-        # Validate and clean each guild's settings
-        for gid, s in settings.items():
-            if not isinstance(s, dict):
-                continue
-            # Validate timeout_enabled
-            if "timeout_enabled" not in s or not isinstance(s["timeout_enabled"], bool):
-                s["timeout_enabled"] = True
-                changed = True
-            # Validate timeout_duration
-            if "timeout_duration" not in s or not isinstance(s["timeout_duration"], int):
-                s["timeout_duration"] = 60
-                changed = True
-            fields_to_check = ["automod_enabled", "automod_threshold", "automod_time_window", "timeout"]
-            # Helper for circular and invalid references
-            def sanitize_int_field(val, default):
-                if isinstance(val, (int, float)):
-                    return int(val)
-                if isinstance(val, str) and val.startswith('<circular'):
-                    return default
-                try:
-                    return int(val)
-                except Exception:
-                    return default
-
-            for field in fields_to_check:
-                val = s.get(field)
-                if field == "automod_enabled":
-                    if not isinstance(val, bool):
-                        s[field] = bool(val)
-                        changed = True
-                elif field == "automod_threshold":
-                    sanitized = sanitize_int_field(val, 5)
-                    if sanitized != val:
-                        s[field] = sanitized
-                        changed = True
-                elif field == "automod_time_window":
-                    sanitized = sanitize_int_field(val, 10)
-                    if sanitized != val:
-                        s[field] = sanitized
-                        changed = True
-                elif field == "timeout":
-                    sanitized = sanitize_int_field(val, 60)
-                    if sanitized != val:
-                        s[field] = sanitized
-                        changed = True
-        with open(SERVER_SETTINGS_FILE, "w", encoding="utf-8") as f:
-            safe_json_dump(settings, f, indent=2)
-        if changed:
-            logging.info("Server settings cleaned before save.")
-        clean_server_settings_file()
-        logging.info("Server settings saved and cleaned successfully.")
-    except Exception as e:
-        logging.error(f"Error saving server settings: {e}")
-
-
 # Ensure bot is initialized with application commands enabled
 bot = commands.Bot(command_prefix='/', intents=intents)
 
+# Gateway events that invalidate the in-memory caches (owner roles, authorization
+# decisions, portal state, guild snapshots); registered on the bot that actually runs
+@bot.event
+async def on_guild_role_create(role):
+    guild_snapshots.invalidate(role.guild.id)
+    invalidate_owner_role(role.guild.id)
+    guild_authorizer.invalidate(role.guild.id)
+    portal_state.bump(role.guild.id)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    guild_snapshots.invalidate(after.guild.id)
+    invalidate_owner_role(after.guild.id)
+    guild_authorizer.invalidate(after.guild.id)
+    portal_state.bump(after.guild.id)
+
+@bot.event
+async def on_guild_role_delete(role):
+    guild_id = str(role.guild.id)
+    guild_snapshots.invalidate(guild_id)
+    invalidate_owner_role(guild_id)
+    guild_authorizer.invalidate(guild_id)
+    portal_state.bump(guild_id)
+    entry = load_owner_roles().get(guild_id)
+    if isinstance(entry, dict) and entry.get("role_id") and int(entry["role_id"]) == role.id:
+        # The configured owner role no longer exists
+        entry["role_id"] = None
+        save_owner_roles(owner_roles)
+
+@bot.event
+async def on_member_join(member):
+    # A chunked guild may have a cached "not a member" decision for this user
+    guild_authorizer.invalidate(member.guild.id, member.id)
+    portal_state.bump(member.guild.id)  # member_count
+    guild_list_state.bump(member.guild.id)
+
+@bot.event
+async def on_member_remove(member):
+    guild_authorizer.invalidate(member.guild.id, member.id)
+    portal_state.bump(member.guild.id)
+    guild_list_state.bump(member.guild.id)
+
+@bot.event
+async def on_member_update(before, after):
+    guild_authorizer.invalidate(after.guild.id, after.id)
+    if before.roles != after.roles:
+        portal_state.bump(after.guild.id)  # owner-role flags on the portal
+
+@bot.event
+async def on_guild_update(before, after):
+    guild_snapshots.invalidate(after.id)
+    if before.owner_id != after.owner_id:
+        guild_authorizer.invalidate(after.id)
+    portal_state.bump(after.id)
+    guild_list_state.bump(after.id)
+
+@bot.event
+async def on_guild_channel_create(channel):
+    guild_snapshots.invalidate(channel.guild.id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    guild_snapshots.invalidate(after.guild.id)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    guild_snapshots.invalidate(channel.guild.id)
+
+@bot.event
+async def on_guild_emojis_update(guild, before, after):
+    guild_snapshots.invalidate(guild.id)
+
 # --- Automatically generate templates for all guilds when the bot is ready ---
 import threading
 
@@ -399,61 +794,66 @@ def auto_create_templates_on_flask_start():
     if not template_init_done:
         try:
             print("[AUTO-TEMPLATE] Flask startup: Creating templates for all guilds...")
-            with app.app_context():
-                result = create_templates_for_all_logs(auto_trigger=True)
-                print(f"[AUTO-TEMPLATE] {result}")
+            jobs.start('create_templates', generate_templates)
         except Exception as e:
             print(f"[AUTO-TEMPLATE] Error during Flask startup template creation: {e}")
         template_init_done = True
 
 # Discord bot: Run template creation after bot is ready
 # (This function should already exist, but ensure it's present and called)
-def generate_templates_on_ready():
+def generate_templates_on_ready(job=None):
     import time
     time.sleep(5)  # Wait a few seconds to ensure bot.guilds is populated
     try:
         print("[AUTO-TEMPLATE] Bot ready: Creating templates for all guilds...")
         with app.app_context():
-            result = create_templates_for_all_logs(auto_trigger=True)
+            result = create_templates_for_all_logs(auto_trigger=True, job=job)
             print(f"[AUTO-TEMPLATE] {result}")
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"[AUTO-TEMPLATE] Error during bot ready template creation: {e}")
 
 @bot.event
 async def on_ready():
     # ... (existing on_ready logic)
-    threading.Thread(target=generate_templates_on_ready, daemon=True).start()
+    jobs.start('create_templates', generate_templates_on_ready)
 
-def generate_templates_on_ready():
+def generate_templates_on_ready(job=None):
     import time
     time.sleep(5)  # Wait a few seconds to ensure bot.guilds is populated
+    generate_templates(job)
+
+def generate_templates(job=None):
+    """Create templates for all guilds; the body of the 'create_templates' job."""
     try:
         print("[AUTO-TEMPLATE] Attempting to create templates for all guilds...")
         with app.app_context():
-            result = create_templates_for_all_logs(auto_trigger=True)
+            result = create_templates_for_all_logs(auto_trigger=True, job=job)
             print(f"[AUTO-TEMPLATE] {result}")
+            return result
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"[AUTO-TEMPLATE] Error during automatic template creation: {e}")
+        raise
+
+async def scan_owner_roles_for_all_guilds(job):
+    """Startup owner-role pass over every guild; the body of the 'owner_role_scan' job."""
+    guilds = list(bot.guilds)
+    job.progress(total=len(guilds))
+    for guild in guilds:
+        job.check_cancelled()
+        await scan_and_create_owner_role(guild)
+        job.advance(message=f"Checked {guild.name}")
 
 def initialize_timeout_settings():
+    # Existing entries were validated on load, so only guilds without an entry need defaults
     changed = False
     for guild in bot.guilds:
         gid = str(guild.id)
         if gid not in server_settings:
-            server_settings[gid] = {}
-        # Timeout settings
-        if 'timeout' not in server_settings[gid]:
-            server_settings[gid]['timeout'] = DEFAULT_TIMEOUT_DURATION
-            changed = True
-        if 'timeout_enabled' not in server_settings[gid] or not isinstance(server_settings[gid]['timeout_enabled'], bool):
-            server_settings[gid]['timeout_enabled'] = True
-            changed = True
-        # Automod settings
-        if 'automod_threshold' not in server_settings[gid]:
-            server_settings[gid]['automod_threshold'] = 5  # Default threshold
-            changed = True
-        if 'automod_time_window' not in server_settings[gid]:
-            server_settings[gid]['automod_time_window'] = 10  # Default time window in seconds
+            update_guild_settings(gid, {'timeout': DEFAULT_TIMEOUT_DURATION})
             changed = True
     if changed:
         save_server_settings(server_settings)
@@ -478,11 +878,11 @@ async def on_ready():
         for guild in bot.guilds:
             gid = str(guild.id)
             if gid not in server_settings:
-                server_settings[gid] = {
+                update_guild_settings(gid, {
                     "automod_enabled": False,
                     "blocked_keywords": [],
                     "regex_patterns": [],
-                }
+                })
                 missing_guilds.append(f"{guild.name} (ID: {guild.id})")
         if missing_guilds:
             save_server_settings(server_settings)
@@ -495,14 +895,13 @@ async def on_ready():
             print("Slash commands synchronized globally.")
         # Initialize timeout settings for all guilds
         initialize_timeout_settings()
-        # Assign Owner role to all members in all guilds at startup
-        for guild in bot.guilds:
-            await scan_and_create_owner_role(guild)
-        print("Owner roles assigned to all members in all guilds.")
+        # Assign Owner role to all members in all guilds at startup, as a background job
+        jobs.start_async('owner_role_scan', scan_owner_roles_for_all_guilds)
+        print("Owner role assignment started for all guilds.")
     except Exception as e:
         print(f"Error during on_ready: {e}")
-    # Start template generation in a background thread
-    threading.Thread(target=generate_templates_on_ready, daemon=True).start()
+    # Start template generation as a background job
+    jobs.start('create_templates', generate_templates_on_ready)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -520,15 +919,20 @@ def restore_guild_from_backup():
     if not guild_id:
         flash('Guild ID is required for restore.', 'danger')
         return redirect(url_for('index'))
-    backup_path = os.path.join(BACKUP_DIR, f'{guild_id}.json')
-    if not os.path.exists(backup_path):
+    backup_path = backup_engine.backup_path(guild_id, request.form.get('backup_id') or None)
+    if backup_path is None:
         flash(f'Backup file for guild {guild_id} not found.', 'danger')
         return redirect(url_for('index'))
     try:
-        with open(backup_path, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-        # Save to server_settings and persist
-        server_settings[str(guild_id)] = settings
+        settings = backup_engine.load(backup_path)
+        # Sectioned backups carry the settings entry beside the guild structure
+        if backup_engine.read_manifest(backup_path) is not None:
+            settings = settings.get('settings')
+            if not isinstance(settings, dict):
+                flash(f'Backup for guild {guild_id} does not include settings.', 'danger')
+                return redirect(url_for('index'))
+        # Validate, save to server_settings and persist
+        replace_guild_settings(guild_id, settings)
         save_server_settings(server_settings)
         flash(f'Successfully restored guild {guild_id} from backup.', 'success')
     except Exception as e:
@@ -553,9 +957,7 @@ def backup_guild():
         if not settings:
             flash(f'No settings found for guild {guild_id}.', 'danger')
             return redirect(url_for('index'))
-        backup_path = os.path.join(BACKUP_DIR, f'{guild_id}.json')
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            safe_json_dump(settings, f, indent=2, ensure_ascii=False)
+        backup_engine.backup_settings(guild_id, settings)
         flash(f'Successfully backed up guild {guild_id}.', 'success')
     except Exception as e:
         flash(f'Failed to back up: {e}', 'danger')
@@ -586,7 +988,7 @@ def restore_template():
     try:
         with open(template_path, 'r', encoding='utf-8') as f:
             settings = json.load(f)
-        server_settings[str(guild_id)] = settings
+        replace_guild_settings(guild_id, settings)
         save_server_settings(server_settings)
         flash(f'Successfully restored guild {guild_id} from template {template_name}.', 'success')
     except Exception as e:
@@ -628,7 +1030,7 @@ def reset_guild_template():
         "spam_threshold": 5,
         "spam_time_window": 10,
     }
-    server_settings[str(guild_id)] = default_settings.copy()
+    replace_guild_settings(guild_id, default_settings)
     save_server_settings(server_settings)
     flash(f'Reset settings for guild {guild_id} to default.', 'success')
     return redirect(url_for('portal'))
@@ -636,51 +1038,35 @@ def reset_guild_template():
 @app.route('/api/portal_guilds')
 def api_portal_guilds():
     """
-    Returns detailed info for all guilds the bot is in, for dynamic portal updates.
+    Returns detailed info for the bot's guilds that are in the caller's portal session
+    (the same guilds /api/portal_events streams), for dynamic portal updates.
     Includes: id, name, automod status, latest message, owner roles, etc.
+    Supports ETag/If-None-Match and ?since=<version> (see versioned_guilds_response).
     """
     if 'access_token' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
+    record = get_portal_session()
+    if record is None:
+        return jsonify({'error': 'Not authenticated'}), 401
+    return versioned_guilds_response('portal_guilds', _portal_guild_info, guild_ids=record.guild_status)
 
-    # Load settings and owner roles
-    settings = load_server_settings()
+def _portal_guild_info(guild):
+    settings = server_settings
     owner_roles = load_owner_roles()
-
-    # Gather guild info
-    guilds_data = []
-    for guild in bot.guilds:
-        gid = str(guild.id)
-        # Hide owner_id in API response (always hidden)
-        owner_id = "Hidden"
-        guild_info = {
-            'id': gid,
-            'name': guild.name,
-            'owner_id': 'Hidden',
-            'automod_enabled': settings.get(gid, {}).get('automod_enabled', False) if isinstance(settings.get(gid, {}), dict) else False,
-            'owner_roles': owner_roles.get(gid, {}),
-            'owner_name': str(guild.owner) if hasattr(guild, 'owner') else None,
-        }
-        # Latest message (if available in logs)
-        latest_message = None
-        log_path = os.path.join('discord_guild_backups', f'{gid}.json')
-        if os.path.exists(log_path):
-            try:
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    log_data = json.load(f)
-                    messages = log_data.get('messages', [])
-                    if messages:
-                        last = messages[-1]
-                        latest_message = {
-                            'author': last.get('author', 'Unknown'),
-                            'content': last.get('content', ''),
-                            'timestamp': last.get('timestamp', '')
-                        }
-            except Exception as e:
-                latest_message = None
-        guild_info['latest_message'] = latest_message
-        guilds_data.append(guild_info)
-    from utils import sanitize_for_json
-    return jsonify({'guilds': sanitize_for_json(guilds_data)})
+    gid = str(guild.id)
+    # Hide owner_id in API response (always hidden)
+    entry = settings.get(gid)
+    entry = entry if isinstance(entry, dict) else {}
+    return {
+        'id': gid,
+        'name': guild.name,
+        'owner_id': 'Hidden',
+        'automod_enabled': entry.get('automod_enabled', False),
+        'owner_roles': owner_roles.get(gid, {}),
+        'owner_name': str(guild.owner) if hasattr(guild, 'owner') else None,
+        # Latest message as recorded in memory by on_message
+        'latest_message': latest_guild_message(entry),
+    }
 
 from flask import send_from_directory
 
@@ -704,8 +1090,538 @@ def export_messages_route():
 
 @app.route('/discord_guild_backups/<path:filename>')
 def download_guild_backup(filename):
-    """Serve a backup JSON file from the discord_guild_backups directory."""
-    return send_from_directory(BACKUP_DIR, filename, as_attachment=True)
+    """Serve a backup JSON file from the discord_guild_backups directory, reassembled from its sections."""
+    from werkzeug.security import safe_join
+    path = safe_join(BACKUP_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return "Backup not found.", 404
+    if backup_engine.read_manifest(path) is None:
+        return send_from_directory(BACKUP_DIR, filename, as_attachment=True)
+    response = Response(safe_json_dumps(backup_engine.load(path), indent=2, ensure_ascii=False), mimetype='application/json')
+    response.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(path)}"'
+    return response
+
+# Fleet backups: guild state is snapshotted on the bot loop (cheap attribute reads),
+# then JSON encoding, optional gzip and the file writes run on a small thread pool so
+# the gateway keeps being serviced. BACKUP_CONCURRENCY bounds the guilds in flight.
+BACKUP_WORKERS = int(os.getenv('BACKUP_WORKERS', '4'))
+BACKUP_CONCURRENCY = int(os.getenv('BACKUP_CONCURRENCY', '8'))
+BACKUP_KEEP = 10
+BACKUP_COMPRESS = os.getenv('BACKUP_COMPRESS', '').lower() in ('1', 'true', 'yes')
+# Parts of a guild backup stored separately by content hash (see BackupEngine)
+BACKUP_SECTIONS = ('roles', 'channels', 'emojis', 'settings')
+
+def _backup_primitive(val, default):
+    """Return val if it's a JSON primitive, else default."""
+    if isinstance(val, (int, float, str, bool)) or val is None:
+        return val
+    return default
+
+# --- Guild snapshots ---
+# One structural snapshot per guild (roles, categories, channels with their overwrites,
+# emojis) serves backups, templates and the slash commands alike. It is built once and
+# reused until a channel, role, emoji or guild update event invalidates it; each
+# invalidation bumps the guild's snapshot version. Fields that change without those
+# events (member count, owner name) are read from the guild when a view is made.
+GUILD_SNAPSHOT_FORMAT = 1
+# Snapshots are rebuilt after this many seconds even without an invalidating event, in
+# case one was missed (e.g. while the gateway was disconnected)
+GUILD_SNAPSHOT_MAX_AGE = int(os.getenv('GUILD_SNAPSHOT_MAX_AGE', '300'))
+
+def build_guild_snapshot(guild, version):
+    """Serialize a guild's structure to primitives. Reads the guild cache, so run it on the bot loop."""
+    safe_primitive = _backup_primitive
+
+    def overwrites(channel):
+        return [
+            {
+                "id": target.id,
+                "name": str(target),
+                "role": isinstance(target, nextcord.Role),
+                "values": dict(overwrite._values),
+            }
+            for target, overwrite in getattr(channel, 'overwrites', {}).items() if hasattr(target, 'id')
+        ]
+
+    return {
+        "format": GUILD_SNAPSHOT_FORMAT,
+        "version": version,
+        "id": safe_primitive(getattr(guild, 'id', 0), 0),
+        "name": safe_primitive(getattr(guild, 'name', ''), ''),
+        "owner_id": safe_primitive(getattr(guild, 'owner_id', 0), 0),
+        "icon_url": safe_primitive(str(getattr(getattr(guild, 'icon', None), 'url', None)), None) if getattr(guild, 'icon', None) else None,
+        "features": [safe_primitive(str(f), '') for f in getattr(guild, 'features', [])],
+        "created_at": safe_primitive(str(getattr(guild, 'created_at', '')), ''),
+        "roles": [
+            {
+                "id": safe_primitive(getattr(role, 'id', 0), 0),
+                "name": safe_primitive(getattr(role, 'name', ''), ''),
+                "permissions": safe_primitive(getattr(getattr(role, 'permissions', None), 'value', 0), 0),
+                "color": safe_primitive(getattr(getattr(role, 'color', None), 'value', 0), 0),
+                "position": safe_primitive(getattr(role, 'position', 0), 0),
+                "mentionable": safe_primitive(getattr(role, 'mentionable', False), False),
+                "hoist": safe_primitive(getattr(role, 'hoist', False), False),
+                "managed": safe_primitive(getattr(role, 'managed', False), False)
+            }
+            for role in getattr(guild, 'roles', [])
+        ],
+        # In guild.categories order
+        "categories": [
+            {"id": category.id, "name": category.name, "position": category.position}
+            for category in getattr(guild, 'categories', [])
+        ],
+        "channels": [
+            {
+                "id": safe_primitive(getattr(channel, 'id', 0), 0),
+                "name": safe_primitive(getattr(channel, 'name', ''), ''),
+                "type": safe_primitive(str(getattr(channel, 'type', '')), ''),
+                "category": safe_primitive(str(getattr(getattr(channel, 'category', None), 'name', '')), None) if getattr(channel, 'category', None) else None,
+                "category_id": getattr(channel, 'category_id', None),
+                "position": safe_primitive(getattr(channel, 'position', 0), 0),
+                "overwrites": overwrites(channel),
+            }
+            for channel in getattr(guild, 'channels', [])
+        ],
+        "emojis": [
+            {
+                "id": safe_primitive(getattr(emoji, 'id', 0), 0),
+                "name": safe_primitive(getattr(emoji, 'name', ''), ''),
+                "animated": safe_primitive(getattr(emoji, 'animated', False), False)
+            }
+            for emoji in getattr(guild, 'emojis', [])
+        ]
+    }
+
+class GuildSnapshotCache:
+    """
+    Per-guild snapshots from build_guild_snapshot(), invalidated by the guild's update
+    events and rebuilt once older than `max_age` seconds. Call get() on the bot loop.
+    """
+
+    def __init__(self, max_age=GUILD_SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshots = {}  # guild id -> (monotonic build time, snapshot)
+        self._versions = {}  # guild id -> version, bumped on every invalidation
+
+    def get(self, guild):
+        """The guild's current snapshot; treat it as read-only."""
+        with self._lock:
+            cached = self._snapshots.get(guild.id)
+            version = self._versions.get(guild.id, 0)
+        if cached is not None and time.monotonic() - cached[0] < self.max_age:
+            return cached[1]
+        built_at = time.monotonic()
+        snapshot = build_guild_snapshot(guild, version)
+        with self._lock:
+            # A change that arrived while building makes this snapshot stale already
+            if self._versions.get(guild.id, 0) == version:
+                self._snapshots[guild.id] = (built_at, snapshot)
+        return snapshot
+
+    def invalidate(self, guild_id):
+        guild_id = int(guild_id)
+        with self._lock:
+            self._snapshots.pop(guild_id, None)
+            self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+
+    def discard(self, guild_id):
+        with self._lock:
+            self._snapshots.pop(int(guild_id), None)
+
+guild_snapshots = GuildSnapshotCache()
+
+async def guild_snapshot_on_loop(guild):
+    """guild_snapshots.get() for callers outside the bot loop (via bot_bridge.call)."""
+    return guild_snapshots.get(guild)
+
+def guild_template_view(guild, snapshot=None, overwrite_keys='name', positions=False):
+    """
+    The template form of a guild (roles, nested categories, standalone channels) from its
+    snapshot. Overwrites are keyed by target name (portable across guilds) or by ID;
+    `positions` adds category and channel positions.
+    """
+    snapshot = snapshot or guild_snapshots.get(guild)
+
+    def channel_entry(channel):
+        entry = {'name': channel['name'], 'type': 'text' if channel['type'] in ('text', 'news') else 'voice'}
+        if positions:
+            entry['position'] = channel['position']
+        entry['permissions'] = {
+            (str(o['id']) if overwrite_keys == 'id' else o['name']): dict(o['values']) for o in channel['overwrites']
+        }
+        return entry
+
+    by_category = {}
+    standalone = []
+    for channel in sorted(snapshot['channels'], key=lambda c: (c['position'], c['id'])):
+        if channel['type'] == 'category':
+            continue
+        if channel['category_id'] is None:
+            standalone.append(channel_entry(channel))
+        else:
+            by_category.setdefault(channel['category_id'], []).append(channel_entry(channel))
+    categories = []
+    for category in snapshot['categories']:
+        entry = {'name': category['name']}
+        if positions:
+            entry['position'] = category['position']
+        entry['channels'] = by_category.get(category['id'], [])
+        categories.append(entry)
+    return {
+        'name': snapshot['name'],
+        'id': snapshot['id'],
+        'member_count': guild.member_count,
+        'roles': [{'name': role['name'], 'permissions': role['permissions']} for role in snapshot['roles'] if not role['managed']],
+        'categories': categories,
+        'channels': standalone,
+        'owner_id': snapshot['owner_id'],
+        'owner': str(guild.owner),
+        'created_at': snapshot['created_at'],
+    }
+
+def snapshot_guild_backup(guild):
+    """
+    Build a fully serializable dict for a guild backup, with only primitive fields and
+    no references, from the guild's cached snapshot.
+    """
+    snapshot = guild_snapshots.get(guild)
+    settings = server_settings.get(str(snapshot['id']))
+    return {
+        "id": snapshot['id'],
+        "name": snapshot['name'],
+        "owner_id": snapshot['owner_id'],
+        "owner": _backup_primitive(str(getattr(guild, 'owner', None)), None) if getattr(guild, 'owner', None) else None,
+        "icon_url": snapshot['icon_url'],
+        "features": snapshot['features'],
+        "member_count": _backup_primitive(getattr(guild, 'member_count', 0), 0),
+        "created_at": snapshot['created_at'],
+        "roles": snapshot['roles'],
+        "channels": [
+            {key: channel[key] for key in ('id', 'name', 'type', 'category', 'position')}
+            for channel in snapshot['channels']
+        ],
+        "emojis": snapshot['emojis'],
+        # Settings entries are never modified once stored, so the worker can encode this one
+        "settings": settings if isinstance(settings, dict) else {},
+    }
+
+class BackupEngine:
+    """
+    Runs fleet backups: snapshots on the bot loop, serialization and file I/O on a
+    thread pool, with at most `concurrency` guilds between the two at a time.
+
+    Backups are stored by section: roles, channels, emojis and settings are each written
+    once to sections/<sha256>.json, and a small manifest ({backup id}.json, with the
+    newest copied to {guild id}.json) records the section hashes. Unchanged sections are
+    never rewritten, an unchanged guild adds no manifest, and sections no manifest
+    references are garbage-collected after pruning.
+
+    Every manifest is catalogued in index.json ({guild id: entries, oldest first}), so
+    listing, latest lookup, retention and garbage collection never scan the directory.
+    While changes are unsaved an index.json.dirty marker exists; if it survives a crash
+    the index is rebuilt from the manifests on the next start.
+    """
+
+    def __init__(self, directory, workers=BACKUP_WORKERS, concurrency=BACKUP_CONCURRENCY,
+                 keep=BACKUP_KEEP, compress=BACKUP_COMPRESS):
+        self.directory = directory
+        self.sections_dir = os.path.join(directory, 'sections')
+        os.makedirs(self.sections_dir, exist_ok=True)
+        self.index_path = os.path.join(directory, 'index.json')
+        self.concurrency = max(1, concurrency)
+        self.keep = keep
+        self.compress = compress
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='backup')
+        # Guards the index and the pins, and is held while a manifest is committed and while
+        # unreferenced sections are collected. Sections are encoded and written without it.
+        self._lock = threading.RLock()
+        self._pinned = Counter()  # section hash -> workers about to reference it
+        self._dirty = False
+        self._index = self._load_index()
+
+    # --- Catalog ---
+
+    @staticmethod
+    def _fingerprint(manifest):
+        """Hash of a manifest's content, ignoring when it was taken."""
+        content = {key: value for key, value in manifest.items() if key != 'backed_up_at'}
+        return hashlib.sha256(safe_json_dumps(content, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+    def _entry(self, backup_id, manifest, size):
+        return {
+            'backup_id': backup_id,
+            'guild_id': str(manifest.get('id', backup_id.split('_', 1)[0])),
+            'timestamp': manifest.get('backed_up_at'),
+            'size': size,
+            'hash': self._fingerprint(manifest),
+            'sections': dict(manifest['sections']),
+        }
+
+    def _load_index(self):
+        if os.path.exists(self.index_path + '.dirty'):
+            logging.warning("[BackupAllGuilds] Backup index was not saved cleanly; rebuilding it.")
+            return self._rebuild_index()
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)['guilds']
+        except FileNotFoundError:
+            return self._rebuild_index()
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"[BackupAllGuilds] Backup index unreadable ({e}); rebuilding it.")
+            return self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Catalog every manifest in the directory (startup only: first run or after a crash)."""
+        index = {}
+        with os.scandir(self.directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                match = re.fullmatch(r'(\d+_\d+)\.json', entry.name)
+                manifest = self.read_manifest(entry.path) if match else None
+                if manifest is not None:
+                    record = self._entry(match.group(1), manifest, entry.stat().st_size)
+                    index.setdefault(record['guild_id'], []).append(record)
+        self._dirty = True
+        self._save_index(index)
+        return index
+
+    def _mark_dirty(self):
+        if not self._dirty:
+            self._dirty = True
+            open(self.index_path + '.dirty', 'w').close()
+
+    def _save_index(self, index=None):
+        with self._lock:
+            if not self._dirty:
+                return
+            encoded = safe_json_dumps({'guilds': self._index if index is None else index}).encode('utf-8')
+            self._write_file(self.index_path, encoded)
+            self._dirty = False
+            try:
+                os.remove(self.index_path + '.dirty')
+            except FileNotFoundError:
+                pass
+
+    def backups(self, guild_id):
+        """Catalog entries for a guild's backups, newest first."""
+        with self._lock:
+            return list(reversed(self._index.get(str(guild_id), ())))
+
+    def latest(self, guild_id):
+        """The newest catalog entry for a guild, or None."""
+        with self._lock:
+            entries = self._index.get(str(guild_id))
+            return entries[-1] if entries else None
+
+    def backup_path(self, guild_id, backup_id=None):
+        """
+        Path of a guild's backup: the newest one, or `backup_id` if given. Returns None if
+        the catalog has no such backup (a guild with only an older full backup file still
+        resolves to {guild id}.json).
+        """
+        guild_id = str(guild_id)
+        if backup_id is None:
+            path = os.path.join(self.directory, f'{guild_id}.json')
+            return path if self.latest(guild_id) or os.path.exists(path) else None
+        with self._lock:
+            known = any(entry['backup_id'] == backup_id for entry in self._index.get(guild_id, ()))
+        return os.path.join(self.directory, f'{backup_id}.json') if known else None
+
+    # --- Storage ---
+
+    @staticmethod
+    def _write_file(path, data):
+        # Per-thread temp name: workers may store the same section at the same time
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _section_path(self, digest):
+        """Path of a stored section, whether or not it was written compressed."""
+        path = os.path.join(self.sections_dir, f'{digest}.json')
+        if not os.path.exists(path) and os.path.exists(path + '.gz'):
+            return path + '.gz'
+        return path
+
+    @staticmethod
+    def _encode_section(value):
+        """Return (content hash, encoded bytes) of a section."""
+        encoded = safe_json_dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest(), encoded
+
+    def store_section(self, value):
+        """Store a section by content hash (a no-op if it is already stored); returns the hash."""
+        digest, encoded = self._encode_section(value)
+        self._store_encoded(digest, encoded)
+        return digest
+
+    def _store_encoded(self, digest, encoded):
+        path = os.path.join(self.sections_dir, f'{digest}.json')
+        if not (os.path.exists(path) or os.path.exists(path + '.gz')):
+            if self.compress:
+                import gzip
+                self._write_file(path + '.gz', gzip.compress(encoded))
+            else:
+                self._write_file(path, encoded)
+
+    def load_section(self, digest):
+        path = self._section_path(digest)
+        if path.endswith('.gz'):
+            import gzip
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def read_manifest(path):
+        """The manifest stored at `path`, or None if it is missing or an older full backup."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) and isinstance(data.get('sections'), dict) else None
+
+    def load(self, path):
+        """
+        Read a backup file as one dict. Manifests are reassembled from their sections;
+        files written before sectioned backups are returned as stored.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not (isinstance(data, dict) and isinstance(data.get('sections'), dict)):
+            return data
+        backup = {key: value for key, value in data.items() if key not in ('sections', 'backed_up_at')}
+        for key, digest in data['sections'].items():
+            backup[key] = self.load_section(digest)
+        return backup
+
+    def _prune(self, entries):
+        """Drop the oldest catalogued backups so a new one stays within `keep`."""
+        while len(entries) >= self.keep:
+            old_file = os.path.join(self.directory, f"{entries.pop(0)['backup_id']}.json")
+            try:
+                os.remove(old_file)
+                logging.info(f"[BackupAllGuilds] Deleted old backup: {old_file}")
+            except FileNotFoundError:
+                pass
+            except Exception as del_exc:
+                logging.error(f"[BackupAllGuilds] Failed to delete old backup {old_file}: {del_exc}")
+
+    def _commit(self, guild_id, manifest):
+        """Write and catalog `manifest` unless it matches the latest one; returns (path, written)."""
+        latest_path = os.path.join(self.directory, f'{guild_id}.json')
+        entries = self._index.setdefault(guild_id, [])
+        if entries and entries[-1]['hash'] == self._fingerprint(manifest):
+            return latest_path, False
+        manifest = dict(manifest, backed_up_at=datetime.utcnow().isoformat())
+        encoded = safe_json_dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')
+        self._mark_dirty()
+        self._prune(entries)
+        backup_id = f"{guild_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+        self._write_file(os.path.join(self.directory, f'{backup_id}.json'), encoded)
+        self._write_file(latest_path, encoded)
+        entries.append(self._entry(backup_id, manifest, len(encoded)))
+        return latest_path, True
+
+    def _write(self, guild_data):
+        """
+        Worker thread: store the guild's sections and commit a manifest referencing them.
+        Only the commit holds the lock; the sections are pinned from before they are
+        written until then, so collect_garbage cannot remove them in between.
+        """
+        guild_id = str(guild_data['id'])
+        manifest = {key: value for key, value in guild_data.items() if key not in BACKUP_SECTIONS}
+        sections = {key: self._encode_section(guild_data[key]) for key in BACKUP_SECTIONS if key in guild_data}
+        pins = Counter(digest for digest, _ in sections.values())
+        with self._lock:
+            self._pinned.update(pins)
+        try:
+            for digest, encoded in sections.values():
+                self._store_encoded(digest, encoded)
+            manifest['sections'] = {key: digest for key, (digest, _) in sections.items()}
+            with self._lock:
+                return self._commit(guild_id, manifest)
+        finally:
+            with self._lock:
+                self._pinned -= pins
+
+    def backup_settings(self, guild_id, settings):
+        """
+        Back up just a guild's settings entry: the newest manifest is reused with only
+        its settings section replaced. Returns (path, written).
+        """
+        guild_id = str(guild_id)
+        with self._lock:
+            latest = self.read_manifest(os.path.join(self.directory, f'{guild_id}.json')) if self.latest(guild_id) else None
+            manifest = {key: value for key, value in (latest or {'id': guild_id}).items() if key != 'backed_up_at'}
+            manifest['sections'] = dict(manifest.get('sections', {}), settings=self.store_section(settings))
+            result = self._commit(guild_id, manifest)
+            self._save_index()
+        return result
+
+    def collect_garbage(self):
+        """Delete stored sections no catalogued backup references; returns how many were removed."""
+        with self._lock:
+            self._save_index()
+            referenced = {digest for entries in self._index.values() for entry in entries for digest in entry['sections'].values()}
+            referenced.update(self._pinned)
+            removed = 0
+            with os.scandir(self.sections_dir) as entries:
+                for entry in entries:
+                    digest = entry.name.split('.', 1)[0]
+                    if digest not in referenced and not entry.name.endswith('.tmp'):
+                        try:
+                            os.remove(entry.path)
+                            removed += 1
+                        except OSError as e:
+                            logging.error(f"[BackupAllGuilds] Failed to delete unreferenced section {entry.name}: {e}")
+        return removed
+
+    async def backup_guilds(self, guilds, job=None):
+        """
+        Back up `guilds` from the bot loop, reporting progress to `job` if given.
+        Returns {'ok': count, 'unchanged': count, 'failed': [guild ids], 'collected': sections removed}.
+        """
+        loop = asyncio.get_running_loop()
+        guilds = list(guilds)
+        slots = asyncio.Semaphore(self.concurrency)
+        failed = []
+        unchanged = []
+        if job is not None:
+            job.progress(total=len(guilds))
+
+        async def backup_one(guild):
+            async with slots:
+                if job is not None and job.cancel_requested:
+                    return
+                try:
+                    guild_data = snapshot_guild_backup(guild)
+                    backup_path, written = await loop.run_in_executor(self._pool, self._write, guild_data)
+                    if written:
+                        logging.info(f"[BackupAllGuilds] Successfully backed up guild: {guild.name} (ID: {guild.id}) to {backup_path}")
+                    else:
+                        unchanged.append(str(guild.id))
+                except Exception as guild_exc:
+                    failed.append(str(guild.id))
+                    logging.error(f"[BackupAllGuilds] Failed to back up guild: {guild.name} (ID: {guild.id}): {guild_exc}")
+                if job is not None:
+                    job.advance(ok=str(guild.id) not in failed)
+
+        started = time.monotonic()
+        logging.info("[BackupAllGuilds] Starting backup of all guilds. Total guilds: %d", len(guilds))
+        await asyncio.gather(*(backup_one(guild) for guild in guilds))
+        if job is not None:
+            job.check_cancelled()
+        # Saves the index first, so collection only trusts what is on disk
+        collected = await loop.run_in_executor(self._pool, self.collect_garbage)
+        logging.info("[BackupAllGuilds] Finished backup of %d guilds in %.2fs (%d unchanged, %d failed, %d sections collected).",
+                     len(guilds), time.monotonic() - started, len(unchanged), len(failed), collected)
+        return {'ok': len(guilds) - len(failed), 'unchanged': len(unchanged), 'failed': failed, 'collected': collected}
+
+backup_engine = BackupEngine(BACKUP_DIR)
 
 @app.route('/backup_all_guilds', methods=['POST'])
 def backup_all_guilds():
@@ -713,6 +1629,7 @@ def backup_all_guilds():
     Back up all Discord guild settings to JSON files.
     Only includes primitive fields (int, str, float, bool, None) or lists/dicts of primitives.
     This prevents circular references and ensures clean JSON output for every guild.
+    The work runs on backup_engine; this request only schedules it.
     """
     if 'access_token' not in session:
         return redirect(url_for('login'))
@@ -722,92 +1639,13 @@ def backup_all_guilds():
     if not discord_user:
         return redirect(url_for('login'))
     try:
-        def run_backup():
-            import asyncio
-            async def backup():
-                logging.info("[BackupAllGuilds] Starting backup of all guilds. Total guilds: %d", len(bot.guilds))
-                for guild in bot.guilds:
-                    try:
-                        logging.info(f"[BackupAllGuilds] Starting backup for guild: {guild.name} (ID: {guild.id})")
-                        # Build a fully serializable dict for backup, with only primitive fields and no references
-                        def safe_primitive(val, default):
-                            # Returns val if it's a primitive, else returns default
-                            if isinstance(val, (int, float, str, bool)) or val is None:
-                                return val
-                            return default
-
-                        guild_data = {
-                            "id": safe_primitive(getattr(guild, 'id', 0), 0),
-                            "name": safe_primitive(getattr(guild, 'name', ''), ''),
-                            "owner_id": safe_primitive(getattr(guild, 'owner_id', 0), 0),
-                            "owner": safe_primitive(str(getattr(guild, 'owner', None)), None) if getattr(guild, 'owner', None) else None,
-                            "icon_url": safe_primitive(str(getattr(getattr(guild, 'icon', None), 'url', None)), None) if getattr(guild, 'icon', None) else None,
-                            "features": [safe_primitive(str(f), '') for f in getattr(guild, 'features', [])],
-                            "member_count": safe_primitive(getattr(guild, 'member_count', 0), 0),
-                            "created_at": safe_primitive(str(getattr(guild, 'created_at', '')), ''),
-                            "roles": [
-                                {
-                                    "id": safe_primitive(getattr(role, 'id', 0), 0),
-                                    "name": safe_primitive(getattr(role, 'name', ''), ''),
-                                    "permissions": safe_primitive(getattr(getattr(role, 'permissions', None), 'value', 0), 0),
-                                    "color": safe_primitive(getattr(getattr(role, 'color', None), 'value', 0), 0),
-                                    "position": safe_primitive(getattr(role, 'position', 0), 0),
-                                    "mentionable": safe_primitive(getattr(role, 'mentionable', False), False),
-                                    "hoist": safe_primitive(getattr(role, 'hoist', False), False),
-                                    "managed": safe_primitive(getattr(role, 'managed', False), False)
-                                }
-                                for role in getattr(guild, 'roles', [])
-                            ],
-                            "channels": [
-                                {
-                                    "id": safe_primitive(getattr(channel, 'id', 0), 0),
-                                    "name": safe_primitive(getattr(channel, 'name', ''), ''),
-                                    "type": safe_primitive(str(getattr(channel, 'type', '')), ''),
-                                    "category": safe_primitive(str(getattr(getattr(channel, 'category', None), 'name', '')), None) if getattr(channel, 'category', None) else None,
-                                    "position": safe_primitive(getattr(channel, 'position', 0), 0)
-                                }
-                                for channel in getattr(guild, 'channels', [])
-                            ],
-                            "emojis": [
-                                {
-                                    "id": safe_primitive(getattr(emoji, 'id', 0), 0),
-                                    "name": safe_primitive(getattr(emoji, 'name', ''), ''),
-                                    "animated": safe_primitive(getattr(emoji, 'animated', False), False)
-                                }
-                                for emoji in getattr(guild, 'emojis', [])
-                            ]
-                        }  # No references, only primitives, always serializable.
-
-                        # --- Prune old backups for this guild (keep max 10) ---
-                        import glob
-                        import re
-                        guild_backup_pattern = os.path.join(BACKUP_DIR, f"{guild.id}*.json")
-                        backup_files = sorted(glob.glob(guild_backup_pattern), key=os.path.getmtime)
-                        max_backups = 10
-                        if len(backup_files) >= max_backups:
-                            for old_file in backup_files[:-max_backups+1]:
-                                try:
-                                    os.remove(old_file)
-                                    logging.info(f"[BackupAllGuilds] Deleted old backup: {old_file}")
-                                except Exception as del_exc:
-                                    logging.error(f"[BackupAllGuilds] Failed to delete old backup {old_file}: {del_exc}")
-                        backup_path = os.path.join(BACKUP_DIR, f"{guild.id}.json")
-                        try:
-                            with open(backup_path, "w", encoding="utf-8") as f:
-                                safe_json_dump(guild_data, f, indent=2, ensure_ascii=False)
-                            logging.info(f"[BackupAllGuilds] Successfully backed up guild: {guild.name} (ID: {guild.id}) to {backup_path}")
-                        except Exception as guild_exc:
-                            logging.error(f"[BackupAllGuilds] Failed to back up guild: {guild.name} (ID: {guild.id}): {guild_exc}")
-                    except Exception as outer_exc:
-                        logging.error(f"[BackupAllGuilds] Unexpected error for guild: {guild.name} (ID: {guild.id}): {outer_exc}")
-                    # End of per-guild backup
-                logging.info("[BackupAllGuilds] Finished backup of all guilds.")
-            asyncio.run_coroutine_threadsafe(backup(), bot_loop)
-        run_backup()
+        user_id = session.get('discord_user_id')
+        backup_job, created = jobs.start_async('backup_all_guilds', lambda job: backup_engine.backup_guilds(bot.guilds, job), user_id=user_id)
+        flash(job_started_message(backup_job, created, "Backup of all Discord guilds"), "success" if created else "info")
         # After backup, also create templates for all guilds
         try:
-            result = create_templates_for_all_logs(auto_trigger=True)
-            flash("Backup and template creation started for all Discord guilds. Files will appear in the 'discord_guild_backups' and 'templates' folders.", "success")
+            template_job, created = jobs.start('create_templates', generate_templates, user_id=user_id)
+            flash(job_started_message(template_job, created, "Template creation for all guilds") + " Files will appear in the 'discord_guild_backups' and 'templates' folders.", "success" if created else "info")
         except Exception as template_exc:
             logging.error(f"Error during template creation after backup: {template_exc}")
             flash(f"Backup finished, but template creation failed: {template_exc}", "danger")
@@ -827,8 +1665,6 @@ def list_guild_templates(guild_id):
     owner_id = str(guild.owner_id)
     owner_username = str(guild.owner)
     # Hide owner ID if privacy setting is enabled
-    global server_settings
-    server_settings = load_server_settings() if 'server_settings' not in globals() else server_settings
     if server_settings.get('hide_owner_id', False):
         owner_id = "Hidden"
     # Get current user ID from session
@@ -847,12 +1683,12 @@ def list_guild_templates(guild_id):
                 templates.append({'filename': fname})
     except Exception:
         pass
-    # Check for new backup file format in discord_guild_backups
-    backup_dir = BACKUP_DIR
-    backup_filename = f"{guild_id}.json"
-    backup_path = os.path.join(backup_dir, backup_filename)
-    if os.path.exists(backup_path):
-        templates.append({'filename': backup_filename, 'is_backup': True})
+    # Backups come from the backup catalog, newest first
+    for entry in backup_engine.backups(guild_id):
+        templates.append({'filename': f"{entry['backup_id']}.json", 'is_backup': True, 'created': entry['timestamp']})
+    if not backup_engine.latest(guild_id) and backup_engine.backup_path(guild_id):
+        # A full backup file from before the catalog
+        templates.append({'filename': f"{guild_id}.json", 'is_backup': True})
     no_templates_message = None
     if not templates:
         no_templates_message = "No templates found for this guild yet."
@@ -886,29 +1722,12 @@ def save_template(guild_id):
             template_path = os.path.join(template_dir, f'template_{guild_id}.json')
         else:
             template_path = os.path.join(template_dir, f'template_{guild_id}_{template_name}.json')
-        # Load the latest server settings
-        server_settings = load_server_settings()
-        settings = server_settings.get(str(guild_id), {})
         # Ensure automod_enabled and timeout_enabled are always True in the template
-        settings['automod_enabled'] = True
-        settings['timeout_enabled'] = True
-        # Sanitize 'timeout' before saving template
-        if 'timeout' not in settings or not isinstance(settings['timeout'], int) or (isinstance(settings['timeout'], str) and settings['timeout'].startswith('<circular')):
-            try:
-                settings['timeout'] = int(settings.get('timeout', 60))
-            except Exception:
-                settings['timeout'] = 60
-        # Ensure spam_threshold and spam_time_window are valid integers before saving template
-        if 'spam_threshold' in settings and not isinstance(settings['spam_threshold'], int):
-            try:
-                settings['spam_threshold'] = int(settings['spam_threshold'])
-            except Exception:
-                settings['spam_threshold'] = 5
-        if 'spam_time_window' in settings and not isinstance(settings['spam_time_window'], int):
-            try:
-                settings['spam_time_window'] = int(settings['spam_time_window'])
-            except Exception:
-                settings['spam_time_window'] = 10
+        settings = validate_guild_settings({
+            **server_settings.get(str(guild_id), {}),
+            'automod_enabled': True,
+            'timeout_enabled': True,
+        })
         with open(template_path, 'w') as f:
             safe_json_dump(settings, f, indent=2)
         return render_template('back_to_portal.html', message=f'Template "{template_name}" for guild {guild_id} saved successfully!')
@@ -931,58 +1750,18 @@ import logging
 def download_guild_settings(guild_id):
     """Download the current server settings for a guild as a JSON file."""
     try:
-        server_settings_dict = load_server_settings()
-        settings = server_settings_dict.get(str(guild_id))
+        settings = server_settings.get(str(guild_id))
         if not settings:
             flash(f"No settings found for guild {guild_id}.", "error")
             return redirect(url_for('list_guild_templates', guild_id=guild_id))
-        # Clean settings before download
-        cleaned_settings = settings.copy()
-        # Ensure automod_enabled is always True in the downloaded settings
-        cleaned_settings['automod_enabled'] = True
+        # Settings are already validated; ensure automod_enabled is always True in the download
+        cleaned_settings = dict(settings, automod_enabled=True)
         # Hide owner_id for privacy
         if 'owner_id' in cleaned_settings:
             cleaned_settings['owner_id'] = 'Hidden'
-        # Ensure spam_threshold and spam_time_window are valid integers
-        if 'spam_threshold' in cleaned_settings and not isinstance(cleaned_settings['spam_threshold'], int):
-            try:
-                cleaned_settings['spam_threshold'] = int(cleaned_settings['spam_threshold'])
-            except Exception:
-                cleaned_settings['spam_threshold'] = 5
-        if 'spam_time_window' in cleaned_settings and not isinstance(cleaned_settings['spam_time_window'], int):
-            try:
-                cleaned_settings['spam_time_window'] = int(cleaned_settings['spam_time_window'])
-            except Exception:
-                cleaned_settings['spam_time_window'] = 10
-        # Clean automod_enabled if present
-        if "automod_enabled" in cleaned_settings and not isinstance(cleaned_settings["automod_enabled"], bool):
-            cleaned_settings["automod_enabled"] = bool(cleaned_settings["automod_enabled"])
-        from utils import sanitize_for_json
-        cleaned_settings = sanitize_for_json(cleaned_settings)
-
-        # Sanitize automod_threshold, automod_time_window, spam_threshold, spam_time_window, and timeout for download
-        def sanitize_int_field(val, default):
-            if isinstance(val, (int, float)):
-                return int(val)
-            if isinstance(val, str) and val.startswith('<circular'):
-                return default
-            try:
-                return int(val)
-            except Exception:
-                return default
-        for field, default in [
-            ("automod_threshold", 5),
-            ("automod_time_window", 10),
-            ("spam_threshold", 5),
-            ("spam_time_window", 10),
-            ("timeout", 60)
-        ]:
-            if field in cleaned_settings:
-                cleaned_settings[field] = sanitize_int_field(cleaned_settings[field], default)
 
         from flask import Response
-        import json
-        response = Response(json.dumps(cleaned_settings, indent=2), mimetype='application/json')
+        response = Response(safe_json_dumps(cleaned_settings, indent=2), mimetype='application/json')
         response.headers['Content-Disposition'] = f'attachment; filename=guild_{guild_id}_settings.json'
         return response
     except Exception as e:
@@ -1016,22 +1795,22 @@ def apply_uploaded_template(guild_id):
         import tempfile
         import os
         import json
-        import asyncio
         # Save file to temp location and load JSON
         with tempfile.NamedTemporaryFile(delete=False, suffix='.json') as tmp:
             file.save(tmp)
             tmp_path = tmp.name
         with open(tmp_path, 'r', encoding='utf-8') as f:
-            server_settings = json.load(f)
+            template_data = json.load(f)
         os.unlink(tmp_path)
-        # Apply template to server (async)
-        loop = asyncio.get_event_loop()
-        asyncio.run_coroutine_threadsafe(apply_template_to_server(guild, server_settings), loop)
-        # Save to server_settings.json
-        server_settings_dict = load_server_settings()
-        server_settings_dict[str(guild.id)] = server_settings[str(guild.id)]
-        save_server_settings(server_settings_dict)
-        flash("Template applied from uploaded file!", "success")
+        # Apply template to server as a job; the request does not wait for it
+        job, created = start_template_job(guild, template_data)
+        if not created:
+            flash(job_started_message(job, created, "A template apply for this guild"), "error")
+            return redirect(url_for('list_guild_templates', guild_id=guild_id))
+        # Validate and save to server_settings.json
+        replace_guild_settings(guild.id, template_data.get(str(guild.id), template_data))
+        save_server_settings(server_settings)
+        flash(job_started_message(job, created, "Applying the uploaded template"), "success")
         return redirect(url_for('list_guild_templates', guild_id=guild_id))
     except Exception as e:
         logging.error(f"Error applying uploaded template: {e}")
@@ -1076,7 +1855,6 @@ def logged_guilds():
                 filename = os.path.basename(log_path)
                 guild_id = filename.replace('.json', '')
                 # Try to get guild name from server_settings, fallback to guild_id
-                server_settings = load_server_settings()
                 guild_name = server_settings.get(guild_id, {}).get('guild_name', f'Guild {guild_id}')
                 # Show guild_id instead of user_id in the portal
                 logged_guilds.append({'name': guild_name, 'id': guild_id, 'guild_id': guild_id, 'message_count': len(messages)})
@@ -1102,13 +1880,11 @@ def set_timeout(guild_id):
     """Set timeout enabled state and duration for a guild from the portal."""
     timeout_enabled = 'timeout_enabled' in request.form
     timeout_duration = request.form.get('timeout_duration', type=int)
-    server_settings = load_server_settings()
-    if guild_id not in server_settings:
-        server_settings[guild_id] = {}
-    server_settings[guild_id]['timeout_enabled'] = bool(timeout_enabled)
+    changes = {'timeout_enabled': timeout_enabled}
     if timeout_duration is not None:
-        server_settings[guild_id]['timeout_duration'] = timeout_duration
-    save_server_settings(server_settings)
+        changes['timeout_duration'] = timeout_duration
+    update_guild_settings(guild_id, changes)
+    persist_settings_changes({str(guild_id): list(changes)})
     flash(f'Timeout settings updated for guild {guild_id}!')
     return redirect(url_for('portal'))
 
@@ -1116,6 +1892,582 @@ DISCORD_CLIENT_SECRET = os.getenv('ClientSecret')  # Load ClientSecret from .env
 DISCORD_REDIRECT_URI = os.getenv('DISCORD_REDIRECT_URI', 'https://give-me-3.onrender.com/api/auth/discord/redirect')
 DISCORD_API_BASE_URL = os.getenv('DISCORD_API_BASE_URL', 'https://discord.com/api')
 
+# /users/@me and /users/@me/guilds responses are cached per access token this long
+DISCORD_CACHE_TTL = float(os.getenv('DISCORD_CACHE_TTL', '30'))
+DISCORD_CACHE_MAX_ENTRIES = 4096
+# Rate-limit bucket state for a route and token is forgotten after this long unused
+DISCORD_BUCKET_IDLE_TTL = 600
+
+# Snowflake path segments that are not a major parameter collapse into one route
+_ROUTE_ID_RE = re.compile(r'(?<!/guilds)(?<!/channels)(?<!/webhooks)/\d{15,21}')
+
+class DiscordRESTClient:
+    """
+    One long-lived aiohttp session, owned by the bot loop, for every portal-side
+    Discord REST call. Keeps connections alive, tracks rate-limit buckets per route
+    and token from the X-RateLimit-* headers, and retries 429s, 5xx responses and
+    connection errors a bounded number of times.
+    """
+
+    def __init__(self, base_url, timeout=10, max_retries=3, max_connections=50):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        # Upper bound for a whole call including retries, used by discord_api()
+        self.deadline = timeout * (max_retries + 1) + 5
+        self._session = None
+        # Keyed by token hash so live access tokens are not kept as dict keys
+        self._route_buckets = {}  # (method, route, token hash) -> (bucket hash from Discord, monotonic last use)
+        self._buckets = {}  # bucket key -> monotonic time it resets, while exhausted
+        self._next_bucket_prune = 0.0
+        self._global_reset = 0.0
+        self._cache = {}  # (path, token hash) -> (monotonic expiry, response)
+        self._inflight = {}  # (path, token hash) -> task shared by concurrent callers
+
+    def _session_for_loop(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def _bucket_key(self, method, route, token_key):
+        entry = self._route_buckets.get((method, route, token_key))
+        return (entry[0], route, token_key) if entry else (method, route, token_key)
+
+    async def _wait_for_bucket(self, key):
+        now = time.monotonic()
+        reset_at = max(self._buckets.get(key, 0.0), self._global_reset)
+        if reset_at > now:
+            await asyncio.sleep(reset_at - now)
+        self._buckets.pop(key, None)
+
+    def _record_limits(self, method, route, token_key, headers):
+        bucket = headers.get('X-RateLimit-Bucket')
+        if bucket:
+            self._route_buckets[(method, route, token_key)] = (bucket, time.monotonic())
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        if remaining == '0' and reset_after:
+            key = self._bucket_key(method, route, token_key)
+            self._buckets[key] = time.monotonic() + float(reset_after)
+
+    def _prune_buckets(self, now):
+        """Drop reset buckets and route mappings idle for DISCORD_BUCKET_IDLE_TTL (at most once a minute)."""
+        if now < self._next_bucket_prune:
+            return
+        self._next_bucket_prune = now + 60
+        for key in [k for k, reset_at in self._buckets.items() if reset_at <= now]:
+            del self._buckets[key]
+        for key in [k for k, (_, used) in self._route_buckets.items() if now - used > DISCORD_BUCKET_IDLE_TTL]:
+            del self._route_buckets[key]
+
+    async def request(self, method, path, *, token=None, headers=None, **kwargs):
+        """
+        Perform a request and return (status, parsed JSON or None, response text).
+        `path` is relative to the API base URL unless it is an absolute URL;
+        `token` is sent as a Bearer authorization header.
+        """
+        url = path if path.startswith(('http://', 'https://')) else f"{self.base_url}{path}"
+        route = _ROUTE_ID_RE.sub('/{id}', path.split('?', 1)[0])
+        headers = dict(headers or {})
+        token_key = None
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+            token_key = _token_hash(token)
+        self._prune_buckets(time.monotonic())
+        session = self._session_for_loop()
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_bucket(self._bucket_key(method, route, token_key))
+            try:
+                async with session.request(method, url, headers=headers, **kwargs) as response:
+                    text = await response.text()
+                    self._record_limits(method, route, token_key, response.headers)
+                    retry = attempt < self.max_retries
+                    if response.status == 429 and retry:
+                        retry_after = float(response.headers.get('Retry-After') or 1)
+                        if response.headers.get('X-RateLimit-Global'):
+                            self._global_reset = time.monotonic() + retry_after
+                        logging.warning(f"[DiscordREST] 429 on {method} {route}, retrying in {retry_after}s")
+                        await asyncio.sleep(retry_after)
+                        continue
+                    if response.status >= 500 and retry:
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+                        continue
+                    try:
+                        data = json.loads(text) if text else None
+                    except ValueError:
+                        data = None
+                    return response.status, data, text
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"[DiscordREST] {method} {route} failed ({e!r}), retrying")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    @staticmethod
+    def _cache_key(path, token):
+        return path, _token_hash(token) if token else None
+
+    async def get_cached(self, path, *, token=None, ttl=DISCORD_CACHE_TTL):
+        """
+        GET with a short per-token TTL cache. Concurrent callers for the same path and
+        token share one in-flight request; while Discord answers 429 the last good
+        response is served instead.
+        """
+        key = self._cache_key(path, token)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.request('GET', path, token=token))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        result = await asyncio.shield(task)
+        if result[0] == 200:
+            if len(self._cache) >= DISCORD_CACHE_MAX_ENTRIES:
+                self._prune_cache(now)
+            self._cache[key] = (time.monotonic() + ttl, result)
+        elif result[0] == 429 and cached:
+            logging.warning(f"[DiscordREST] Rate limited on {path}, serving cached response")
+            return cached[1]
+        return result
+
+    def _prune_cache(self, now):
+        for key in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+            del self._cache[key]
+        while len(self._cache) >= DISCORD_CACHE_MAX_ENTRIES:
+            self._cache.pop(next(iter(self._cache)))
+
+    def forget_token(self, token):
+        """Drop every cached response for `token` (e.g. on logout)."""
+        token_hash = self._cache_key('', token)[1]
+        for key in [k for k in self._cache if k[1] == token_hash]:
+            self._cache.pop(key, None)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+discord_rest = DiscordRESTClient(DISCORD_API_BASE_URL)
+
+# --- Flask thread -> bot loop bridge ---
+# Every route reaches nextcord through bot_bridge. Waiting calls and background jobs are
+# capped separately; past a cap the request is shed with 503 + Retry-After instead of
+# queueing behind the gateway.
+PORTAL_BRIDGE_MAX_WAITING = int(os.getenv('PORTAL_BRIDGE_MAX_WAITING', '16'))
+PORTAL_BRIDGE_MAX_JOBS = int(os.getenv('PORTAL_BRIDGE_MAX_JOBS', '8'))
+PORTAL_REQUEST_TIMEOUT = float(os.getenv('PORTAL_REQUEST_TIMEOUT', '30'))
+PORTAL_RETRY_AFTER = 5
+BRIDGE_LATENCY_SAMPLES = 256
+
+class BotLoopBusy(RuntimeError):
+    """Too many portal requests are already waiting on the bot loop."""
+
+class BotLoopTimeout(RuntimeError):
+    """The bot loop did not finish a bridged call within its deadline."""
+
+@app.before_request
+def _start_request_deadline():
+    g.deadline = time.monotonic() + PORTAL_REQUEST_TIMEOUT
+
+def request_time_left(timeout):
+    """`timeout`, capped by what is left of the current portal request's deadline."""
+    if has_request_context() and 'deadline' in g:
+        return max(0.0, min(timeout, g.deadline - time.monotonic()))
+    return timeout
+
+@dataclass(slots=True)
+class BridgeStats:
+    """Counters and recent latencies (seconds) for one kind of bridged call."""
+    ok: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    shed: int = 0
+    in_flight: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=BRIDGE_LATENCY_SAMPLES))
+
+    def summary(self):
+        ordered = sorted(self.latencies)
+        def ms(q):
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1) if ordered else None
+        return {'ok': self.ok, 'errors': self.errors, 'timeouts': self.timeouts, 'shed': self.shed,
+                'in_flight': self.in_flight, 'p50_ms': ms(0.5), 'p95_ms': ms(0.95), 'max_ms': ms(1.0)}
+
+class BotLoopBridge:
+    """
+    The one way Flask threads run coroutines on the bot loop. call() waits for the result
+    within a deadline; submit() starts a fire-and-forget job whose failure is logged.
+    Both are bounded by semaphores and raise BotLoopBusy when full; call() raises
+    BotLoopTimeout when the deadline passes. Latency is recorded
+    per call name (the coroutine's qualified name unless given).
+    """
+
+    def __init__(self, max_waiting=PORTAL_BRIDGE_MAX_WAITING, max_jobs=PORTAL_BRIDGE_MAX_JOBS):
+        self._waiting = threading.BoundedSemaphore(max_waiting)
+        self._jobs = threading.BoundedSemaphore(max_jobs)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def call(self, coro, timeout=PORTAL_REQUEST_TIMEOUT, name=None):
+        """Run `coro` on the bot loop and return its result; timeout is capped by the request deadline."""
+        name = name or coro.__qualname__
+        self._check_loop(coro, blocking=True)
+        self._acquire(self._waiting, coro, name)
+        started = time.monotonic()
+        outcome = 'errors'
+        try:
+            future = asyncio.run_coroutine_threadsafe(coro, bot_loop)
+            try:
+                result = future.result(timeout=request_time_left(timeout))
+            except concurrent.futures.TimeoutError:
+                if future.done():
+                    raise  # The coroutine's own TimeoutError, not the deadline
+                future.cancel()
+                outcome = 'timeouts'
+                raise BotLoopTimeout(f"bot loop did not answer in time ({name})") from None
+            outcome = 'ok'
+            return result
+        finally:
+            self._waiting.release()
+            self._finish(name, outcome, time.monotonic() - started)
+
+    def submit(self, coro, name=None):
+        """Start `coro` on the bot loop without waiting; returns its concurrent.futures.Future."""
+        name = name or coro.__qualname__
+        self._check_loop(coro, blocking=False)
+        self._acquire(self._jobs, coro, name)
+        started = time.monotonic()
+        future = asyncio.run_coroutine_threadsafe(coro, bot_loop)
+
+        def done(f):
+            self._jobs.release()
+            error = None if f.cancelled() else f.exception()
+            if error is not None:
+                logging.error(f"[Bridge] Job {name} failed: {error}")
+            self._finish(name, 'errors' if f.cancelled() or error else 'ok', time.monotonic() - started)
+
+        future.add_done_callback(done)
+        return future
+
+    def call_soon(self, callback, *args):
+        """Schedule a plain callback on the bot loop; a no-op before the loop is running."""
+        if bot_loop is not None:
+            bot_loop.call_soon_threadsafe(callback, *args)
+
+    def metrics(self):
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self._stats.items())}
+
+    def _check_loop(self, coro, blocking):
+        if bot_loop is None:
+            coro.close()
+            raise RuntimeError("Bot loop is not ready yet!")
+        if not blocking:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is bot_loop:
+            coro.close()
+            raise RuntimeError("bot_bridge.call() would block the bot loop; await the coroutine instead")
+
+    def _acquire(self, semaphore, coro, name):
+        with self._lock:
+            stats = self._stats.setdefault(name, BridgeStats())
+            if not semaphore.acquire(blocking=False):
+                stats.shed += 1
+                coro.close()
+                raise BotLoopBusy(f"bot loop bridge is saturated ({name})")
+            stats.in_flight += 1
+
+    def _finish(self, name, outcome, elapsed):
+        with self._lock:
+            stats = self._stats[name]
+            stats.in_flight -= 1
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            stats.latencies.append(elapsed)
+
+bot_bridge = BotLoopBridge()
+
+@app.errorhandler(BotLoopBusy)
+def _shed_bot_loop_busy(e):
+    logging.warning(f"[Portal] Shedding {request.path}: {e}")
+    return Response("The portal is busy, please retry shortly.", 503, mimetype='text/plain',
+                    headers={'Retry-After': str(PORTAL_RETRY_AFTER)})
+
+@app.errorhandler(BotLoopTimeout)
+def _bot_loop_timeout(e):
+    logging.warning(f"[Portal] Deadline exceeded waiting on the bot loop for {request.path}: {e}")
+    return Response("The bot did not answer in time, please retry.", 504, mimetype='text/plain',
+                    headers={'Retry-After': str(PORTAL_RETRY_AFTER)})
+
+@app.route('/api/bridge_metrics')
+def api_bridge_metrics():
+    """Per-call counters and latency percentiles of the bot loop bridge. Owner-only."""
+    discord_user_id = session.get('discord_user_id')
+    # Restrict to OWNER_ID from environment
+    if not discord_user_id or str(discord_user_id) != str(os.getenv('OWNER_ID')):
+        return jsonify({'success': False, 'error': 'Not authorized'}), 403
+    return jsonify(bot_bridge.metrics())
+
+# --- Background jobs ---
+# Long-running guild operations run as jobs: at most JOB_WORKERS at a time, one active
+# job per key (kind + guild), with progress and cancellation exposed at /api/jobs/<id>.
+# Job state is written to JOBS_FILE on every status change; jobs that were queued or
+# running when the bot stopped come back as 'interrupted'.
+JOBS_FILE = "jobs.json"
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_HISTORY = 200
+JOB_POLL_INTERVAL = 0.5
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested."""
+
+@dataclass(slots=True)
+class Job:
+    """State of one background job, as returned by GET /api/jobs/<id>."""
+    id: str
+    kind: str
+    key: str
+    guild_id: str = None
+    user_id: str = None
+    status: str = 'queued'  # queued, running, succeeded, failed, cancelled, interrupted
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    message: str = ''
+    error: str = None
+    result: object = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    cancel_requested: bool = False
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def progress(self, total=None, message=None):
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+    def advance(self, ok=True, message=None):
+        """Count one finished unit of work."""
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and keeps their state, deduplicated by key."""
+
+    def __init__(self, path=JOBS_FILE, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self._path = path
+        self._history = history
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._active = {}  # key -> queued or running Job
+        self._futures = {}  # id -> pool future
+        self._load()
+
+    def start(self, kind, target, guild_id=None, key=None, user_id=None):
+        """
+        Queue target(job) on the job pool. If a job with the same key (default: kind and
+        guild) is still queued or running, no new job is started. Returns (job, created).
+        """
+        guild_id = str(guild_id) if guild_id is not None else None
+        key = key or (f"{kind}:{guild_id}" if guild_id else kind)
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None:
+                return existing, False
+            job = Job(id=secrets.token_hex(8), kind=kind, key=key, guild_id=guild_id,
+                      user_id=str(user_id) if user_id is not None else None)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._trim()
+            self._futures[job.id] = self._pool.submit(self._run, job, target)
+        self._save()
+        return job, True
+
+    def start_async(self, kind, coro_factory, **kwargs):
+        """Like start(), for a coroutine coro_factory(job) that runs on the bot loop."""
+        return self.start(kind, lambda job: self._await_on_bot_loop(job, coro_factory), **kwargs)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; a queued job is cancelled at once, a running one at its next check."""
+        job = self._jobs.get(job_id)
+        if job is None or not job.active:
+            return job
+        job.cancel_requested = True
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._finish(job, 'cancelled')
+        return job
+
+    def _await_on_bot_loop(self, job, coro_factory):
+        while True:
+            job.check_cancelled()
+            try:
+                future = bot_bridge.submit(coro_factory(job), name=job.kind)
+                break
+            except BotLoopBusy:
+                time.sleep(PORTAL_RETRY_AFTER)
+        while True:
+            try:
+                return future.result(timeout=JOB_POLL_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                if future.done():
+                    raise  # Raised by the job itself, not the poll timeout
+                if job.cancel_requested:
+                    future.cancel()
+            except concurrent.futures.CancelledError:
+                raise JobCancelled(f"Job {job.id} was cancelled")
+
+    def _run(self, job, target):
+        job.status = 'running'
+        job.started_at = time.time()
+        self._save()
+        try:
+            job.check_cancelled()
+            job.result = target(job)
+            status = 'succeeded'
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            status = 'failed'
+            logging.error(f"[Jobs] {job.kind} job {job.id} failed: {e}")
+        self._finish(job, status)
+
+    def _finish(self, job, status):
+        with self._lock:
+            job.status = status
+            job.finished_at = time.time()
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._futures.pop(job.id, None)
+        self._save()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history limit."""
+        excess = len(self._jobs) - self._history
+        for job_id in [job_id for job_id, job in self._jobs.items() if not job.active][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _load(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.error(f"[Jobs] Could not read {self._path}: {e}")
+            return
+        for data in stored:
+            try:
+                job = Job(**data)
+            except TypeError:
+                continue
+            if job.active:
+                job.status = 'interrupted'
+                job.finished_at = job.finished_at or time.time()
+            self._jobs[job.id] = job
+
+    def _save(self):
+        with self._lock:
+            encoded = safe_json_dumps([job.to_dict() for job in self._jobs.values()])
+            try:
+                with open(self._path + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(encoded)
+                os.replace(self._path + '.tmp', self._path)
+            except OSError as e:
+                logging.error(f"[Jobs] Could not save {self._path}: {e}")
+
+jobs = JobManager()
+
+def job_started_message(job, created, what):
+    """Portal message for a job that was just started, or was already running."""
+    if created:
+        return f"{what} started (job {job.id}, progress at /api/jobs/{job.id})."
+    return f"{what} is already in progress (job {job.id}, progress at /api/jobs/{job.id})."
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """Status and progress of a background job."""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not _job_visible_to_session(job):
+        return jsonify({'error': 'Not authorized'}), 403
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """Cancel a job; allowed for the user who started it and the bot owner."""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not _job_visible_to_session(job):
+        return jsonify({'error': 'Not authorized'}), 403
+    return jsonify(jobs.cancel(job_id).to_dict()), 202
+
+def _job_visible_to_session(job):
+    """Whether the session user may read or cancel `job`: its starter or the bot owner."""
+    user_id = session.get('discord_user_id')
+    if not user_id:
+        return False
+    owner_id = os.getenv('OWNER_ID')
+    return (owner_id is not None and str(user_id) == str(owner_id)) or (job.user_id is not None and job.user_id == str(user_id))
+
+async def _apply_template_job(job, guild, template_data):
+    job.progress(message=f"Applying template to {guild.name}")
+    return await apply_template_to_server(guild, template_data, job)
+
+def start_template_job(guild, template_data, user_id=None):
+    """
+    Apply a template to a guild as a job; one apply per guild at a time. The job belongs
+    to `user_id`, by default the portal session's user. Returns (job, created).
+    """
+    if user_id is None and has_request_context():
+        user_id = session.get('discord_user_id')
+    return jobs.start_async('apply_template', lambda job: _apply_template_job(job, guild, template_data),
+                            guild_id=guild.id, user_id=user_id)
+
+def discord_api(method, path, cache_ttl=None, **kwargs):
+    """
+    Run a DiscordRESTClient request on the bot loop from a Flask thread and wait for it,
+    bounded by the client's deadline. Returns (status, data, text). With `cache_ttl`,
+    GETs go through the per-token response cache.
+    """
+    if cache_ttl is not None and method == 'GET':
+        coro = discord_rest.get_cached(path, ttl=cache_ttl, **kwargs)
+    else:
+        coro = discord_rest.request(method, path, **kwargs)
+    return bot_bridge.call(coro, discord_rest.deadline, name=f"discord_api {method}")
+
 # Secret key for Flask session
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'supersecretkey')
 
@@ -1136,16 +2488,7 @@ def dashboard():
     if not discord_user:
         return redirect(url_for('login'))
 
-    access_token = session.get('access_token')
-    headers = {'Authorization': f'Bearer {access_token}'}
-    async def fetch_guilds():
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers) as response:
-                guilds_json = await response.json()
-                text = await response.text()
-                return response.status, guilds_json, text
-    future = asyncio.run_coroutine_threadsafe(fetch_guilds(), bot_loop)
-    status, guilds_json, text = future.result()
+    status, guilds_json, text = get_user_guilds()
 
     if status != 200:
         logging.error(f"Failed to fetch user's guilds. Response: {text}")
@@ -1166,7 +2509,6 @@ def guild_messages(guild_id):
     logging.info(f"[Flask] /guild_messages/{guild_id} route accessed.")
     """Show messages for a guild, applying automod filtering using blocked keywords and regex patterns. Uses global automod_rules as fallback."""
     import re
-    server_settings = load_server_settings()
 
     # Helper to load global automod rules
     def load_global_automod_rules():
@@ -1212,25 +2554,12 @@ def guild_messages(guild_id):
     else:
         global_messages = []
 
-    # Load automod settings for this guild, ensure defaults
+    # Load automod settings for this guild, creating validated defaults if missing
     if str(guild_id) not in server_settings:
-        server_settings[str(guild_id)] = {
-            "automod_enabled": True,
-            "blocked_keywords": [],
-            "regex_patterns": []
-        }
+        update_guild_settings(guild_id, {"automod_enabled": True})
+        persist_settings_changes({str(guild_id): ["automod_enabled"]})
 
-    settings = server_settings.get(str(guild_id), {})
-    # Ensure automod_enabled is always a boolean
-    if "automod_enabled" not in settings or not isinstance(settings["automod_enabled"], bool):
-        settings["automod_enabled"] = True
-        server_settings[str(guild_id)] = settings
-        save_server_settings(server_settings)
-    # Ensure timeout_enabled is always a boolean (default True)
-    if "timeout_enabled" not in settings or not isinstance(settings["timeout_enabled"], bool):
-        settings["timeout_enabled"] = True
-        server_settings[str(guild_id)] = settings
-        save_server_settings(server_settings)
+    settings = server_settings[str(guild_id)]
     automod_enabled = settings["automod_enabled"]
     timeout_enabled = settings["timeout_enabled"]
 
@@ -1327,24 +2656,18 @@ def callback():
     # Log the request data (excluding sensitive information)
     logging.debug(f"OAuth2 Token Request: {data}")
 
-    async def post_token():
-        async with aiohttp.ClientSession() as session:
-            async with session.post(token_url, data=data, headers=headers) as response:
-                token_response = await response.json()
-                text = await response.text()
-                return response.status, token_response, text
-
     if bot_loop is None:
         logging.error("Bot loop is not ready yet!")
         return "Bot is not ready. Please try again in a moment.", 503
-    future = asyncio.run_coroutine_threadsafe(post_token(), bot_loop)
-    status, token_response, text = future.result()
+    status, token_response, text = discord_api('POST', token_url, data=data, headers=headers)
     logging.debug(f"OAuth2 Token Response: {text}")
 
     if status != 200:
         logging.error(f"Failed to get token: {text}")
         return None
     session['access_token'] = token_response['access_token']
+    # Resolve identity once; this also sets session['sid'] and session['discord_user_id']
+    get_portal_session()
     return redirect(url_for('portal'))  # Redirect to the portal page
 
 @app.route('/api/auth/discord/redirect')
@@ -1357,20 +2680,29 @@ def api_auth_discord_redirect():
 def logout():
     logging.info("[Flask] /logout route accessed.")
     """Log the user out by clearing the session."""
+    access_token = session.get('access_token')
+    if access_token:
+        # The response cache lives on the bot loop
+        bot_bridge.call_soon(discord_rest.forget_token, access_token)
+    if session.get('sid'):
+        portal_sessions.discard(session['sid'])
     session.clear()
     return redirect(url_for('home'))
 
 @app.route('/create_templates_for_all_logs', methods=['POST'])
-def create_templates_for_all_logs(auto_trigger=False):
+def create_templates_for_all_logs(auto_trigger=False, job=None):
     logging.info("[Flask] /create_templates_for_all_logs POST accessed.")
     """
     Create a template for each server the bot is in, using the backup logic.
     If auto_trigger=True, function can be called internally without rendering the portal.
+    Progress is reported to `job` when run as one (see generate_templates).
     """
     logs_dir = os.path.join(os.getcwd(), "logs")
     os.makedirs(logs_dir, exist_ok=True)
     owner_roles = load_owner_roles()
     created_count = 0
+    unchanged_count = 0
+    failed_count = 0
     print(f"[TEMPLATE GEN] bot.guilds: {getattr(bot, 'guilds', 'N/A')}")
     # Ensure all timeout and automod settings are initialized before creating templates
     initialize_timeout_settings()
@@ -1385,80 +2717,45 @@ def create_templates_for_all_logs(auto_trigger=False):
     if not guilds_to_process and not auto_trigger:
         flash('You do not own any guilds to save templates for.', 'warning')
         return redirect(url_for('portal'))
+    if job is not None:
+        job.progress(total=len(guilds_to_process))
     for guild in guilds_to_process:
-        print(f"[TEMPLATE GEN] Processing guild: {getattr(guild, 'id', 'N/A')} | {getattr(guild, 'name', 'N/A')}")
-        guild_id = str(guild.id)
-        guild_owner_roles = owner_roles.get(guild_id, {})
-        guild_settings = server_settings.get(guild_id, {})
-        log_file = os.path.join(logs_dir, f"{guild_id}.json")
-        recent_messages = []
-        if os.path.exists(log_file):
-            try:
-                with open(log_file, "r") as f:
-                    all_msgs = json.load(f)
-                    recent_messages = all_msgs[-100:] if len(all_msgs) > 100 else all_msgs
-            except Exception as e:
-                logging.warning(f"Could not load messages for backup: {e}")
-        server_settings_backup = {
-            'name': guild.name,
-            'id': guild.id,
-            'member_count': guild.member_count,
-            'roles': [{'name': role.name, 'permissions': role.permissions.value} for role in guild.roles if not role.managed],
-            'categories': [
-                {
-                    'name': category.name,
-                    'channels': [
-                        {
-                            'name': channel.name,
-                            'type': 'text' if isinstance(channel, nextcord.TextChannel) else 'voice',
-                            'permissions': {
-                                str(target): overwrite._values
-                                for target, overwrite in channel.overwrites.items()
-                            }
-                        }
-                        for channel in category.channels
-                    ]
-                }
-                for category in guild.categories
-            ],
-            'channels': [
-                {
-                    'name': channel.name,
-                    'type': 'text' if isinstance(channel, nextcord.TextChannel) else 'voice',
-                    'permissions': {
-                        str(target): overwrite._values
-                        for target, overwrite in channel.overwrites.items()
-                    }
-                }
-                for channel in guild.channels if channel.category is None
-            ],
-            'owner_id': guild.owner_id,
-            'owner': str(guild.owner),
-            'created_at': str(guild.created_at),
-            'automod_enabled': guild_settings.get("automod_enabled", True),
-            'blocked_keywords': guild_settings.get("blocked_keywords", []),
-            'regex_patterns': guild_settings.get("regex_patterns", []),
-            'timeout_enabled': guild_settings.get("timeout_enabled", True),
-            'timeout': guild_settings.get("timeout", DEFAULT_TIMEOUT_DURATION),
-            'automod_threshold': guild_settings.get("automod_threshold", 5),
-            'automod_time_window': guild_settings.get("automod_time_window", 10),
-            'custom_color': guild_settings.get("custom_color", "#7289da"),
-            'owner_roles': guild_owner_roles,
-            'recent_messages': recent_messages
-        }
-        # Force automod_enabled and timeout_enabled to True in the template
-        server_settings_backup['automod_enabled'] = True
-        server_settings_backup['timeout_enabled'] = True
-        template_name = f"{guild_id}_auto"
-        template_path = os.path.join(TEMPLATES_DIR, f"{template_name}.json")
-        # Backup existing auto template if it exists
-        if os.path.exists(template_path):
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_name = f"{guild_id}_auto_{timestamp}.json"
-            backup_path = os.path.join(TEMPLATES_DIR, backup_name)
-            os.rename(template_path, backup_path)
-            print(f"[TEMPLATE GEN] Backed up existing template to: {backup_path}")
-        with open(template_path, 'w') as template_file:
+        if job is not None:
+            job.check_cancelled()
+        ok = True
+        try:
+            print(f"[TEMPLATE GEN] Processing guild: {getattr(guild, 'id', 'N/A')} | {getattr(guild, 'name', 'N/A')}")
+            guild_id = str(guild.id)
+            guild_owner_roles = owner_roles.get(guild_id, {})
+            guild_settings = server_settings.get(guild_id, {})
+            log_file = os.path.join(logs_dir, f"{guild_id}.json")
+            recent_messages = []
+            if os.path.exists(log_file):
+                try:
+                    with open(log_file, "r") as f:
+                        all_msgs = json.load(f)
+                        recent_messages = all_msgs[-100:] if len(all_msgs) > 100 else all_msgs
+                except Exception as e:
+                    logging.warning(f"Could not load messages for backup: {e}")
+            # This runs on a job thread; the snapshot has to be read on the bot loop
+            snapshot = bot_bridge.call(guild_snapshot_on_loop(guild), name='guild_snapshot')
+            server_settings_backup = {
+                # Structure from the cached guild snapshot
+                **guild_template_view(guild, snapshot),
+                'automod_enabled': guild_settings.get("automod_enabled", True),
+                'blocked_keywords': guild_settings.get("blocked_keywords", []),
+                'regex_patterns': guild_settings.get("regex_patterns", []),
+                'timeout_enabled': guild_settings.get("timeout_enabled", True),
+                'timeout': guild_settings.get("timeout", DEFAULT_TIMEOUT_DURATION),
+                'automod_threshold': guild_settings.get("automod_threshold", 5),
+                'automod_time_window': guild_settings.get("automod_time_window", 10),
+                'custom_color': guild_settings.get("custom_color", "#7289da"),
+                'owner_roles': guild_owner_roles,
+                'recent_messages': recent_messages
+            }
+            # Force automod_enabled and timeout_enabled to True in the template
+            server_settings_backup['automod_enabled'] = True
+            server_settings_backup['timeout_enabled'] = True
             # Ensure spam_threshold and spam_time_window are always present and valid integers
             if 'spam_threshold' not in server_settings_backup or not isinstance(server_settings_backup['spam_threshold'], int):
                 try:
@@ -1476,37 +2773,278 @@ def create_templates_for_all_logs(auto_trigger=False):
                     server_settings_backup['timeout'] = int(server_settings_backup.get('timeout', 60))
                 except Exception:
                     server_settings_backup['timeout'] = 60
-            # Remove circular references before sending settings
-            from utils import sanitize_for_json, safe_json_dump
-            server_settings_backup = sanitize_for_json(server_settings_backup)
-            safe_json_dump(server_settings_backup, template_file, indent=2)
-        print(f"[TEMPLATE GEN] Created template: {template_path}")
-        created_count += 1
-    print(f"[TEMPLATE GEN] Created {created_count} templates for all guild logs.")
+            template_path = os.path.join(TEMPLATES_DIR, f"{guild_id}_auto.json")
+            if write_auto_template(guild_id, server_settings_backup):
+                print(f"[TEMPLATE GEN] Created template: {template_path}")
+                created_count += 1
+            else:
+                unchanged_count += 1
+        except Exception as e:
+            ok = False
+            failed_count += 1
+            logging.error(f"[TEMPLATE GEN] Failed to create template for guild {guild.id}: {e}")
+        if job is not None:
+            # Counted once the guild's template is written, so progress never runs ahead
+            job.advance(ok=ok)
+    result = f"Created {created_count} templates for all guild logs ({unchanged_count} unchanged, {failed_count} failed)."
+    print(f"[TEMPLATE GEN] {result}")
     # Render the portal page with a result message, unless auto_trigger
     if auto_trigger:
-        return f"Created {created_count} templates for all guild logs."
-    return redirect(url_for('portal', templates_creation_result=f"Created {created_count} templates for all guild logs."))
+        return result
+    return redirect(url_for('portal', templates_creation_result=result))
+
+# Auto templates are only rewritten when their content changes: the canonical hash of
+# the would-be template is compared with the current file's (cached per guild and
+# checked against the file's mtime). A replaced template is kept as
+# {guild}_auto_{timestamp}.json, at most AUTO_TEMPLATE_KEEP of them per guild.
+AUTO_TEMPLATE_KEEP = 5
+# Fields that change with chat activity rather than the guild's setup; they are written
+# but not hashed, so a new message or member alone does not rotate the template
+AUTO_TEMPLATE_VOLATILE_KEYS = frozenset(('recent_messages', 'member_count', 'owner'))
+_auto_template_hashes = {}  # guild id -> (mtime_ns, hash) of {guild}_auto.json
+
+def _template_hash(template):
+    if isinstance(template, dict):
+        template = {key: value for key, value in template.items() if key not in AUTO_TEMPLATE_VOLATILE_KEYS}
+    return hashlib.sha256(safe_json_dumps(template, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def write_auto_template(guild_id, template):
+    """Write {guild_id}_auto.json unless it already holds `template`; returns True if written."""
+    template_path = os.path.join(TEMPLATES_DIR, f"{guild_id}_auto.json")
+    new_hash = _template_hash(template)
+    try:
+        mtime = os.stat(template_path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime is not None:
+        cached = _auto_template_hashes.get(guild_id)
+        if cached is None or cached[0] != mtime:
+            try:
+                with open(template_path, 'r') as f:
+                    cached = (mtime, _template_hash(json.load(f)))
+            except ValueError:
+                cached = (mtime, None)
+            _auto_template_hashes[guild_id] = cached
+        if cached[1] == new_hash:
+            return False
+        # Backup existing auto template before replacing it
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_path = os.path.join(TEMPLATES_DIR, f"{guild_id}_auto_{timestamp}.json")
+        os.replace(template_path, backup_path)
+        print(f"[TEMPLATE GEN] Backed up existing template to: {backup_path}")
+        _prune_auto_templates(guild_id)
+    tmp_path = template_path + '.tmp'
+    with open(tmp_path, 'w') as template_file:
+        # safe_json_dump removes circular references while encoding
+        safe_json_dump(template, template_file, indent=2)
+    os.replace(tmp_path, template_path)
+    _auto_template_hashes[guild_id] = (os.stat(template_path).st_mtime_ns, new_hash)
+    return True
+
+def _prune_auto_templates(guild_id):
+    """Delete all but the newest AUTO_TEMPLATE_KEEP replaced auto templates of a guild."""
+    prefix = f"{guild_id}_auto_"
+    with os.scandir(TEMPLATES_DIR) as entries:
+        # The timestamp suffix sorts chronologically
+        rotated = sorted(entry.name for entry in entries if entry.name.startswith(prefix) and entry.name.endswith('.json'))
+    for name in rotated[:-AUTO_TEMPLATE_KEEP]:
+        try:
+            os.remove(os.path.join(TEMPLATES_DIR, name))
+        except OSError as e:
+            logging.error(f"[TEMPLATE GEN] Failed to delete old auto template {name}: {e}")
+
+# --- Server-side portal sessions ---
+# The cookie only carries a session id and the access token; the resolved identity and
+# guild membership live here and are refreshed in the background before they go stale.
+PORTAL_SESSION_TTL = float(os.getenv('PORTAL_SESSION_TTL', '300'))
+PORTAL_SESSION_REFRESH_MARGIN = 60
+# A session resolved while /users/@me/guilds was failing is only kept this long
+PORTAL_SESSION_RETRY_TTL = 10
+PORTAL_SESSION_MAX_IN_MEMORY = 2048
+# Optional SQLite file that sessions evicted from memory spill to
+PORTAL_SESSION_DB = os.getenv('PORTAL_SESSION_DB')
+# Discord permission bits
+PERMISSION_ADMINISTRATOR = 0x8
+PERMISSION_MANAGE_GUILD = 0x20
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+@dataclass(slots=True)
+class PortalSession:
+    token_hash: str
+    user: dict
+    guilds: list
+    # guild_id -> {"owner": bool, "permissions": int, "admin": bool}
+    guild_status: dict
+    expires_at: float
+    access_token: str = None  # memory only, needed for background refresh
+    refreshing: bool = False
+    portal_view: object = None  # PortalView, memory only
+
+    @classmethod
+    def resolve(cls, access_token, user, guilds, ttl=PORTAL_SESSION_TTL):
+        guild_status = {}
+        for guild in guilds or []:
+            permissions = int(guild.get('permissions') or 0)
+            guild_status[str(guild.get('id'))] = {
+                "owner": bool(guild.get('owner')),
+                "permissions": permissions,
+                "admin": bool(guild.get('owner')) or bool(permissions & (PERMISSION_ADMINISTRATOR | PERMISSION_MANAGE_GUILD)),
+            }
+        return cls(_token_hash(access_token), user, guilds or [], guild_status,
+                   time.monotonic() + ttl, access_token=access_token)
+
+    @property
+    def user_id(self):
+        return str(self.user.get('id'))
+
+class PortalSessionStore:
+    """In-memory LRU of PortalSession records, spilling evicted records to SQLite if configured."""
+
+    def __init__(self, max_in_memory=PORTAL_SESSION_MAX_IN_MEMORY, db_path=PORTAL_SESSION_DB):
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_in_memory = max_in_memory
+        self._db = None
+        if db_path:
+            import sqlite3
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS portal_sessions (sid TEXT PRIMARY KEY, data TEXT, expires_at REAL)")
+
+    def get(self, sid):
+        with self._lock:
+            record = self._sessions.get(sid)
+            if record is not None:
+                self._sessions.move_to_end(sid)
+                return record
+        return self._load_spilled(sid)
+
+    def put(self, sid, record):
+        with self._lock:
+            self._sessions[sid] = record
+            self._sessions.move_to_end(sid)
+            evicted = []
+            while len(self._sessions) > self.max_in_memory:
+                evicted.append(self._sessions.popitem(last=False))
+        for old_sid, old_record in evicted:
+            self._spill(old_sid, old_record)
+
+    def discard(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM portal_sessions WHERE sid = ?", (sid,))
+                self._db.commit()
+
+    def _spill(self, sid, record):
+        if self._db is None or record.expires_at <= time.monotonic():
+            return
+        # Access tokens never go to disk; the cookie supplies them again on the next request
+        data = json.dumps({"token_hash": record.token_hash, "user": record.user, "guilds": record.guilds,
+                           "guild_status": record.guild_status})
+        wall_expiry = time.time() + (record.expires_at - time.monotonic())
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO portal_sessions VALUES (?, ?, ?)", (sid, data, wall_expiry))
+            self._db.execute("DELETE FROM portal_sessions WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def _load_spilled(self, sid):
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT data, expires_at FROM portal_sessions WHERE sid = ?", (sid,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("DELETE FROM portal_sessions WHERE sid = ?", (sid,))
+            self._db.commit()
+        data, wall_expiry = row
+        if wall_expiry <= time.time():
+            return None
+        record = PortalSession(expires_at=time.monotonic() + (wall_expiry - time.time()), **json.loads(data))
+        self.put(sid, record)
+        return record
 
-def get_discord_user():
-    logging.info("[Discord] Fetching Discord user.")
-    """Fetch the authenticated user's Discord profile."""
+portal_sessions = PortalSessionStore()
+
+async def _fetch_portal_session(access_token, allow_partial=True):
+    """
+    Resolve identity and guilds for a token on the bot loop; None if Discord rejects it.
+    If only the guild list fails, the session has no guilds and is retried after
+    PORTAL_SESSION_RETRY_TTL, or it is None when `allow_partial` is false.
+    """
+    status, user, _ = await discord_rest.get_cached('/users/@me', token=access_token)
+    if status != 200 or not user:
+        return None
+    status, guilds, _ = await discord_rest.get_cached('/users/@me/guilds', token=access_token)
+    if status == 200:
+        return PortalSession.resolve(access_token, user, guilds)
+    logging.warning(f"[Session] Fetching guilds failed with status {status}")
+    if not allow_partial:
+        return None
+    return PortalSession.resolve(access_token, user, [], ttl=PORTAL_SESSION_RETRY_TTL)
+
+async def _refresh_portal_session(sid, record):
+    try:
+        # A failed refresh keeps the current record serving
+        fresh = await _fetch_portal_session(record.access_token, allow_partial=False)
+        if fresh is not None:
+            portal_sessions.put(sid, fresh)
+    except Exception as e:
+        logging.warning(f"[Session] Background refresh failed: {e}")
+    finally:
+        record.refreshing = False
+
+def get_portal_session():
+    """
+    Return the PortalSession for the current request, resolving it from Discord only
+    when there is none yet (or it expired). Sessions close to expiry are refreshed on
+    the bot loop while the current record keeps serving.
+    """
     access_token = session.get('access_token')
     if not access_token:
         return None
-    headers = {'Authorization': f'Bearer {access_token}'}
-    async def fetch():
-        async with aiohttp.ClientSession() as session_http:
-            async with session_http.get(f"{DISCORD_API_BASE_URL}/users/@me", headers=headers) as response:
-                user = await response.json()
-                if response.status == 200:
-                    return user
-        return None
+    sid = session.get('sid')
+    record = portal_sessions.get(sid) if sid else None
+    if record is not None and record.token_hash != _token_hash(access_token):
+        record = None
+    now = time.monotonic()
+    if record is not None and record.expires_at > now:
+        record.access_token = access_token
+        if record.expires_at - now < PORTAL_SESSION_REFRESH_MARGIN and not record.refreshing and bot_loop is not None:
+            record.refreshing = True
+            try:
+                bot_bridge.submit(_refresh_portal_session(sid, record))
+            except BotLoopBusy:
+                record.refreshing = False  # The current record keeps serving; retry next request
+        return record
     if bot_loop is None:
         logging.error("Bot loop is not ready yet!")
         return None
-    future = asyncio.run_coroutine_threadsafe(fetch(), bot_loop)
-    return future.result()
+    record = bot_bridge.call(_fetch_portal_session(access_token), discord_rest.deadline)
+    if record is None:
+        return None
+    if not sid:
+        sid = secrets.token_urlsafe(32)
+        session['sid'] = sid
+    session['discord_user_id'] = record.user_id
+    portal_sessions.put(sid, record)
+    return record
+
+def get_user_guilds():
+    """(status, guilds, text) for the logged-in user, served from the session store when possible."""
+    record = get_portal_session()
+    if record is not None:
+        return 200, record.guilds, ''
+    access_token = session.get('access_token')
+    return discord_api('GET', '/users/@me/guilds', token=access_token, cache_ttl=DISCORD_CACHE_TTL)
+
+def get_discord_user():
+    logging.info("[Discord] Fetching Discord user.")
+    """Return the authenticated user's Discord profile from the server-side session."""
+    record = get_portal_session()
+    return record.user if record is not None else None
 
 @app.route('/apply_template_web', methods=['POST'])
 def apply_template_web():
@@ -1530,21 +3068,103 @@ def apply_template_web():
 
     try:
         with open(template_path, 'r') as template_file:
-            server_settings = json.load(template_file)
-
-        # Create and set an event loop in the current thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.create_task(apply_template_to_server(server_settings))
-        loop.run_until_complete(asyncio.sleep(0))  # Run the event loop briefly
-        return f"Template {template_name} is being applied successfully!"
+            template_data = json.load(template_file)
+
+        guild = _template_target_guild(request.form.get('guild_id'), template_data)
+        if guild is None:
+            return f"No guild found to apply template {template_name} to.", 404
+        job, created = start_template_job(guild, template_data)
+        return job_started_message(job, created, f"Applying template {template_name}"), 200 if created else 409
     except Exception as e:
         logging.error(f"Error applying template {template_name}: {e}")
         return f"An error occurred: {e}", 500
 
+# --- Portal serving ---
+# PORTAL_SERVER=production serves the portal from a fixed pool of worker threads behind a
+# bounded queue; the default keeps Flask's debug server for local development.
+PORTAL_SERVER = os.getenv('PORTAL_SERVER', 'development').lower()
+PORTAL_WORKERS = int(os.getenv('PORTAL_WORKERS', '8'))
+PORTAL_QUEUE_SIZE = int(os.getenv('PORTAL_QUEUE_SIZE', '32'))
+PORTAL_SHUTDOWN_GRACE = float(os.getenv('PORTAL_SHUTDOWN_GRACE', '10'))
+
+class PortalWSGIServer(BaseWSGIServer):
+    """
+    Production WSGI server for the portal. Connections are served by `workers` threads;
+    up to `queue_size` more wait for a worker, and anything beyond that is answered with
+    503 + Retry-After on the accept thread instead of spawning another thread.
+    """
+
+    def __init__(self, host, port, app, workers=PORTAL_WORKERS, queue_size=PORTAL_QUEUE_SIZE):
+        super().__init__(host, port, app)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='portal')
+        self._slots = threading.Semaphore(workers + queue_size)
+        self._in_flight = 0
+        self._idle = threading.Condition()
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._shed(request)
+            return
+        with self._idle:
+            self._in_flight += 1
+        # Slow clients cannot hold a worker longer than a request may take
+        request.settimeout(PORTAL_REQUEST_TIMEOUT)
+        self._pool.submit(self._serve, request, client_address)
+
+    def _serve(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+
+    def _shed(self, request):
+        body = b"The portal is busy, please retry shortly."
+        head = (f"HTTP/1.1 503 Service Unavailable\r\nRetry-After: {PORTAL_RETRY_AFTER}\r\n"
+                f"Content-Type: text/plain\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        try:
+            request.sendall(head.encode() + body)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self, grace=PORTAL_SHUTDOWN_GRACE):
+        """Stop accepting connections, then wait up to `grace` seconds for queued and running requests."""
+        self.shutdown()
+        deadline = time.monotonic() + grace
+        with self._idle:
+            while self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning(f"[Portal] Shutting down with {self._in_flight} requests still in flight")
+                    break
+                self._idle.wait(remaining)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+portal_server = None
+
 def run_flask():
+    global portal_server
     port = int(os.environ.get('PORT', 1500))  # Use PORT environment variable
-    app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)  # Enable debug mode
+    if PORTAL_SERVER != 'production':
+        app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)  # Enable debug mode
+        return
+    portal_server = PortalWSGIServer('0.0.0.0', port, app)
+    logging.info(f"[Portal] Serving on port {port} with {PORTAL_WORKERS} workers (queue {PORTAL_QUEUE_SIZE})")
+    portal_server.serve_forever()
+
+def stop_flask():
+    """Drain the production portal server: SSE streams are closed so their workers free up."""
+    if portal_server is None:
+        return
+    guild_events.close_all()
+    portal_server.drain()
 
 # Directory to store templates
 TEMPLATES_DIR = "templates"
@@ -1559,15 +3179,12 @@ def list_guild_templates_redirect():
 
 @app.route('/api/guilds')
 def api_guilds():
-    guilds_data = []
-    for guild in bot.guilds:
-        guilds_data.append({
-            'id': str(guild.id),
-            'name': guild.name,
-            'owner': str(guild.owner),
-            'member_count': getattr(guild, 'member_count', 0)
-        })
-    return jsonify(guilds=guilds_data)
+    return versioned_guilds_response('guilds', lambda guild: {
+        'id': str(guild.id),
+        'name': guild.name,
+        'owner': str(guild.owner),
+        'member_count': getattr(guild, 'member_count', 0)
+    }, state=guild_list_state)
 
 @app.route('/guild/<guild_id>/templates')
 def list_guild_templates_portal(guild_id):
@@ -1594,7 +3211,6 @@ def list_guild_templates_portal(guild_id):
 @app.route('/guild/<guild_id>/apply_template/<template_name>', methods=['POST'])
 def apply_guild_template(guild_id, template_name):
     """Apply a template to the specified guild's messages channel and update Discord automatically."""
-    import asyncio
     template_path = os.path.join(TEMPLATES_DIR, template_name)
     if not os.path.exists(template_path):
         return f"Template {template_name} not found.", 404
@@ -1608,14 +3224,17 @@ def apply_guild_template(guild_id, template_name):
         if guild is None:
             logging.error(f"[TEMPLATE APPLY] Guild not found: {guild_id}")
             return f"Guild {guild_id} not found.", 404
+        if request.values.get('dry_run'):
+            return template_dry_run_response(guild, cleaned_template_data, template_name)
         # Schedule the coroutine on the bot's event loop
-        loop = bot.loop
         logging.info(f"[TEMPLATE APPLY] Applying template {template_name} to guild {guild_id}")
-        asyncio.run_coroutine_threadsafe(apply_template_to_server(guild, cleaned_template_data), loop)
-        # Update in-memory server_settings and persist to disk for automod and all other settings
-        server_settings[str(guild.id)] = cleaned_template_data
+        job, created = start_template_job(guild, cleaned_template_data)
+        if not created:
+            return job_started_message(job, created, f"A template apply for guild {guild_id}"), 409
+        # Validate and update in-memory server_settings, then persist for automod and all other settings
+        replace_guild_settings(guild.id, cleaned_template_data)
         save_server_settings(server_settings)
-        return f"Template {template_name} is being applied to guild {guild_id}!"
+        return job_started_message(job, created, f"Applying template {template_name} to guild {guild_id}")
     except Exception as e:
         logging.error(f"Error applying template {template_name} to guild {guild_id}: {e}")
         return f"An error occurred: {e}", 500
@@ -1631,69 +3250,408 @@ def apply_template(template_name):
 
         # Load the template file
         with open(template_path, 'r') as template_file:
-            server_settings = json.load(template_file)
+            template_data = json.load(template_file)
 
-        # Use asyncio to run the bot's restore functionality
-        asyncio.run(apply_template_to_server(server_settings))
-        return f"Template {template_name} has been applied successfully!"
+        guild = _template_target_guild(request.args.get('guild_id'), template_data)
+        if guild is None:
+            return f"No guild found to apply template {template_name} to.", 404
+        if request.args.get('dry_run'):
+            return template_dry_run_response(guild, template_data, template_name)
+        # Run the bot's restore functionality on its own loop, as a job
+        job, created = start_template_job(guild, template_data)
+        return job_started_message(job, created, f"Applying template {template_name}"), 200 if created else 409
     except Exception as e:
         logging.error(f"Error applying template {template_name}: {e}")
         return f"An error occurred: {e}", 500
 
-async def apply_template_to_server(guild, server_settings):
-    """Restore server settings from the provided template to the specified guild."""
-    # Restore server name
-    await guild.edit(name=server_settings['name'])
-
-    # Restore roles
-    for role_data in server_settings.get('roles', []):
-        existing_role = nextcord.utils.get(guild.roles, name=role_data['name'])
-        if existing_role is None:
-            await guild.create_role(name=role_data['name'], permissions=nextcord.Permissions(role_data['permissions']))
+def _template_target_guild(guild_id, template_data):
+    """The guild a template is applied to: the requested one, else the guild it was taken from."""
+    guild_id = guild_id or (template_data.get('id') if isinstance(template_data, dict) else None)
+    try:
+        return bot.get_guild(int(guild_id)) if guild_id else None
+    except (TypeError, ValueError):
+        return None
+
+# --- Template planning ---
+# Applying a template diffs it against the live guild first: plan_template() indexes the
+# guild's roles and channels by ID and name once and emits only the create, edit and move
+# operations needed, so re-applying a near-identical template costs almost no API calls.
+# Objects are created without positions; the final ordering is set afterwards by one bulk
+# role-position and one bulk channel-position call, so Discord reshuffles each list once.
+# The plan doubles as the dry-run output shown in the portal.
+
+@dataclass(slots=True)
+class TemplateOp:
+    """
+    One API operation of a template plan. A move is a bulk reorder: its changes hold
+    'positions', a list of {'id' (existing objects) or 'name' and 'parent', 'position'}.
+    """
+    action: str  # create, edit or move
+    kind: str  # guild, role, category or channel
+    name: str
+    target_id: int = None  # the existing object for edit
+    changes: dict = field(default_factory=dict)
+    parent: str = None  # category name for channels inside a category
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def _template_layout(template):
+    """
+    (categories, standalone channels) of a template. Templates nest channels under
+    'categories'; backups list channels flat with a 'category' name and category
+    channels as entries of type 'category'. Both are read into the nested form.
+    """
+    categories = {}
+    for category_data in template.get('categories', []):
+        entry = categories.setdefault(category_data['name'], {'name': category_data['name'], 'channels': []})
+        if 'position' in category_data:
+            entry['position'] = category_data['position']
+        entry['channels'].extend(category_data.get('channels', []))
+    standalone = []
+    for channel_data in template.get('channels', []):
+        if channel_data.get('type') == 'category':
+            entry = categories.setdefault(channel_data['name'], {'name': channel_data['name'], 'channels': []})
+            if 'position' in channel_data:
+                entry['position'] = channel_data['position']
+        elif channel_data.get('category'):
+            categories.setdefault(channel_data['category'], {'name': channel_data['category'], 'channels': []})['channels'].append(channel_data)
+        else:
+            standalone.append(channel_data)
+    return sorted(categories.values(), key=lambda c: c.get('position', 0)), standalone
+
+def plan_template(guild, template):
+    """
+    The minimal list of TemplateOps that makes `guild` match `template`. Roles are matched
+    by ID (backups of the same guild), then name; channels by name within their category.
+    Must run on the bot loop, which owns the guild cache.
+    """
+    plan = []
+    if template.get('name') and template['name'] != guild.name:
+        plan.append(TemplateOp('edit', 'guild', guild.name, guild.id, {'name': template['name']}))
+
+    roles_by_id = {role.id: role for role in guild.roles}
+    roles_by_name = {}
+    for role in guild.roles:
+        roles_by_name.setdefault(role.name, role)
+    # Roles at or above the bot's own top role can't be reordered by it
+    bot_top = guild.me.top_role.position if guild.me else 0
+    role_positions, roles_moved = [], False
+    for role_data in template.get('roles', []):
+        role = roles_by_id.get(role_data.get('id')) or roles_by_name.get(role_data['name'])
+        permissions = int(role_data.get('permissions', 0))
+        if role is None:
+            if role_data.get('managed'):
+                continue
+            plan.append(TemplateOp('create', 'role', role_data['name'], changes={'permissions': permissions}))
+        elif not role.managed and role.permissions.value != permissions:
+            plan.append(TemplateOp('edit', 'role', role.name, role.id, {'permissions': permissions}))
+        position = role_data.get('position')
+        if not position or (role is not None and (role.managed or role.id == guild.id)) or position >= bot_top:
+            continue
+        role_positions.append({'id': role.id} if role else {'name': role_data['name']})
+        role_positions[-1]['position'] = position
+        roles_moved = roles_moved or role is None or role.position != position
+
+    categories_by_name = {}
+    for category in guild.categories:
+        categories_by_name.setdefault(category.name, category)
+    channels_by_name = {}
+    for channel in guild.channels:
+        channels_by_name.setdefault(channel.name, channel)
+
+    channel_positions, channels_moved = [], False
+
+    def place(existing, name, parent, data):
+        nonlocal channels_moved
+        if 'position' not in data:
+            return
+        channel_positions.append({'id': existing.id} if existing else {'name': name, 'parent': parent})
+        channel_positions[-1]['position'] = data['position']
+        channels_moved = channels_moved or existing is None or existing.position != data['position']
+
+    def plan_channel(channel_data, existing, parent):
+        if existing is None:
+            if channel_data.get('type') not in ('text', 'voice'):
+                return
+            changes = {'type': channel_data['type'], 'permissions': channel_data.get('permissions', {})}
+            plan.append(TemplateOp('create', 'channel', channel_data['name'], changes=changes, parent=parent))
+        place(existing, channel_data['name'], parent, channel_data)
+
+    categories, standalone = _template_layout(template)
+    for category_data in categories:
+        category = categories_by_name.get(category_data['name'])
+        if category is None:
+            plan.append(TemplateOp('create', 'category', category_data['name']))
+        # Categories sit in the same position list as the channels
+        place(category, category_data['name'], None, category_data)
+    for category_data in categories:
+        category = categories_by_name.get(category_data['name'])
+        in_category = {}
+        for channel in (category.channels if category else ()):
+            in_category.setdefault(channel.name, channel)
+        for channel_data in sorted(category_data['channels'], key=lambda ch: ch.get('position', 0)):
+            plan_channel(channel_data, in_category.get(channel_data['name']), category_data['name'])
+    for channel_data in sorted(standalone, key=lambda ch: ch.get('position', 0)):
+        plan_channel(channel_data, channels_by_name.get(channel_data['name']), None)
+    if roles_moved:
+        plan.append(TemplateOp('move', 'role', 'role positions', changes={'positions': role_positions}))
+    if channels_moved:
+        plan.append(TemplateOp('move', 'channel', 'channel positions', changes={'positions': channel_positions}))
+    return plan
+
+async def move_bot_role_to_top(guild):
+    """
+    Put the bot's top role above every other role with one bulk role-position call.
+    Returns False without calling Discord when it is already there.
+    """
+    bot_role = guild.me.top_role
+    top = max(role.position for role in guild.roles)
+    if bot_role.position >= top:
+        return False
+    await guild.edit_role_positions(positions={bot_role: top})
+    return True
+
+async def edit_channel_positions(guild, positions, reason=None):
+    """
+    Set the positions of several channels ({channel: position}) with one request.
+
+    nextcord has a public bulk call for roles (Guild.edit_role_positions) but not for
+    channels: GuildChannel.edit(position=...) sends one request per channel. This is the
+    one place that uses the library's private HTTP client for the bulk endpoint; if an
+    upgrade removes it, channels are moved one at a time instead.
+    """
+    if not positions:
+        return
+    bulk_update = getattr(getattr(guild._state, 'http', None), 'bulk_channel_update', None)
+    if bulk_update is None:
+        logging.warning("[TEMPLATE APPLY] nextcord has no bulk_channel_update; moving channels one at a time.")
+        for channel, position in positions.items():
+            await channel.edit(position=position, reason=reason)
+        return
+    payload = [{'id': channel.id, 'position': position} for channel, position in positions.items()]
+    await bulk_update(guild.id, payload, reason=reason)
+
+def _template_overwrites(guild, permissions):
+    """
+    Permission overwrites from a template's channel 'permissions'. Keys are role or member
+    IDs or role names mapping to overwrite values; a flat {permission: value} dict is the
+    older form and applies to @everyone.
+    """
+    if not permissions:
+        return {}
+    if all(not isinstance(value, dict) for value in permissions.values()):
+        return {guild.default_role: nextcord.PermissionOverwrite(**permissions)}
+    overwrites = {}
+    for target_key, values in permissions.items():
+        if str(target_key).isdigit():
+            target = guild.get_role(int(target_key)) or guild.get_member(int(target_key))
         else:
-            if not existing_role.managed:
-                await existing_role.edit(permissions=nextcord.Permissions(role_data['permissions']))
-
-    # --- Restore categories and channels ---
-    # First, create all categories
-    category_map = {}
-    for category_data in sorted(server_settings.get('categories', []), key=lambda c: c.get('position', 0)):
-        existing_category = nextcord.utils.get(guild.categories, name=category_data['name'])
-        if existing_category is None:
-            category = await guild.create_category(name=category_data['name'], position=category_data.get('position', 0))
+            target = nextcord.utils.get(guild.roles, name=target_key)
+        overwrites[target or guild.default_role] = nextcord.PermissionOverwrite(**values)
+    return overwrites
+
+def summarize_template_plan(plan):
+    """{'create': n, 'edit': n, 'move': n} for a plan."""
+    summary = {'create': 0, 'edit': 0, 'move': 0}
+    for op in plan:
+        summary[op.action] += 1
+    return summary
+
+# Plans are executed phase by phase (guild, roles, categories, then every category's
+# channels), running the operations of a phase concurrently within a per-route budget.
+# 429s pause the whole route for Retry-After; 429s and 5xx are retried with backoff.
+TEMPLATE_ROUTE_CONCURRENCY = {'guild': 1, 'role': 4, 'category': 2, 'channel': 4}
+TEMPLATE_MAX_RETRIES = 3
+# An apply in progress keeps its template here, so one interrupted by a restart is
+# re-planned and finished on the next start (see resume_template_applies)
+TEMPLATE_CHECKPOINT_DIR = "template_checkpoints"
+os.makedirs(TEMPLATE_CHECKPOINT_DIR, exist_ok=True)
+
+class TemplatePlanError(Exception):
+    """Some operations of a template plan failed; the rest were applied."""
+
+    def __init__(self, summary, errors):
+        super().__init__(f"{len(errors)} template operation(s) failed: " + "; ".join(errors[:5]))
+        self.summary = summary
+        self.errors = errors
+
+class TemplatePlanExecutor:
+    """Applies one plan from plan_template() to a guild on the bot loop."""
+
+    def __init__(self, guild, plan, job=None, route_concurrency=None, max_retries=TEMPLATE_MAX_RETRIES):
+        self.guild = guild
+        self.plan = plan
+        self.job = job
+        self.max_retries = max_retries
+        limits = route_concurrency or TEMPLATE_ROUTE_CONCURRENCY
+        self._slots = {route: asyncio.Semaphore(limit) for route, limit in limits.items()}
+        self._paused_until = {}  # route -> monotonic time a 429 lifts
+        self._categories = {category.name: category for category in guild.categories}
+        self._created = {}  # (kind, parent, name) -> object created by this plan
+        self.errors = []
+
+    async def run(self):
+        if self.job is not None:
+            self.job.progress(total=len(self.plan))
+        moves = [op for op in self.plan if op.action == 'move']
+        phases = [[op for op in self.plan if op.kind == kind and op.action != 'move'] for kind in ('guild', 'role', 'category')]
+        by_parent = {}
+        for op in self.plan:
+            if op.kind == 'channel' and op.action != 'move':
+                by_parent.setdefault(op.parent, []).append(op)
+        for ops in phases:
+            await asyncio.gather(*(self._run_op(op) for op in ops))
+        # Categories exist now; each category's channels go in parallel with the others'
+        await asyncio.gather(*(self._run_op(op) for ops in by_parent.values() for op in ops))
+        # Everything exists; set the final order of roles and channels in one call each
+        await asyncio.gather(*(self._run_op(op) for op in moves))
+        if self.job is not None:
+            self.job.check_cancelled()
+        summary = summarize_template_plan(self.plan)
+        summary['failed'] = len(self.errors)
+        if self.errors:
+            raise TemplatePlanError(summary, self.errors)
+        return summary
+
+    async def _run_op(self, op):
+        if self.job is not None and self.job.cancel_requested:
+            return
+        ok = True
+        try:
+            await self._with_retries(op)
+        except Exception as e:
+            ok = False
+            self.errors.append(f"{op.action} {op.kind} {op.name}: {e}")
+            logging.error(f"[TEMPLATE APPLY] {op.action} {op.kind} {op.name} failed in guild {self.guild.id}: {e}")
+        if self.job is not None:
+            self.job.advance(ok=ok, message=f"{op.action} {op.kind} {op.name}")
+
+    async def _with_retries(self, op):
+        route = op.kind
+        async with self._slots[route]:
+            for attempt in range(self.max_retries + 1):
+                delay = self._paused_until.get(route, 0.0) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    return await self._call(op)
+                except nextcord.HTTPException as e:
+                    status = getattr(e, 'status', 0)
+                    if attempt == self.max_retries or not (status == 429 or status >= 500):
+                        raise
+                    if status == 429:
+                        headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+                        retry_after = float(getattr(e, 'retry_after', None) or headers.get('Retry-After') or 1)
+                        self._paused_until[route] = time.monotonic() + retry_after
+                        logging.warning(f"[TEMPLATE APPLY] 429 on {route} operations, pausing {retry_after}s")
+                    else:
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def _call(self, op):
+        guild = self.guild
+        if op.kind == 'guild':
+            await guild.edit(**op.changes)
+        elif op.action == 'move':
+            await self._reorder(op)
+        elif op.kind == 'role':
+            permissions = nextcord.Permissions(op.changes['permissions'])
+            if op.action == 'create':
+                self._created[('role', None, op.name)] = await guild.create_role(name=op.name, permissions=permissions)
+            else:
+                await guild.get_role(op.target_id).edit(permissions=permissions)
+        elif op.kind == 'category':
+            category = await guild.create_category(name=op.name)
+            self._categories[op.name] = self._created[('channel', None, op.name)] = category
         else:
-            category = existing_category
-        category_map[category_data['name']] = category
-
-    # Then, create all channels within categories
-    for category_data in server_settings.get('categories', []):
-        category = category_map.get(category_data['name'])
-        for channel_data in sorted(category_data.get('channels', []), key=lambda ch: ch.get('position', 0)):
-            existing_channel = nextcord.utils.get(category.channels, name=channel_data['name'])
-            overwrites = {}
-            for target_id, perms in channel_data.get('permissions', {}).items():
-                target = guild.get_role(int(target_id)) or guild.get_member(int(target_id)) or guild.default_role
-                if target:
-                    overwrites[target] = nextcord.PermissionOverwrite(**perms)
-            if existing_channel is None:
-                if channel_data['type'] == 'text':
-                    await category.create_text_channel(name=channel_data['name'], position=channel_data.get('position', 0), overwrites=overwrites)
-                elif channel_data['type'] == 'voice':
-                    await category.create_voice_channel(name=channel_data['name'], position=channel_data.get('position', 0), overwrites=overwrites)
-
-    # Restore standalone channels (not in categories)
-    for channel_data in sorted(server_settings.get('channels', []), key=lambda ch: ch.get('position', 0)):
-        existing_channel = nextcord.utils.get(guild.channels, name=channel_data['name'])
-        overwrites = {}
-        for target_id, perms in channel_data.get('permissions', {}).items():
-            target = guild.get_role(int(target_id)) or guild.get_member(int(target_id)) or guild.default_role
-            if target:
-                overwrites[target] = nextcord.PermissionOverwrite(**perms)
-        if existing_channel is None:
-            if channel_data['type'] == 'text':
-                await guild.create_text_channel(name=channel_data['name'], position=channel_data.get('position', 0), overwrites=overwrites)
-            elif channel_data['type'] == 'voice':
-                await guild.create_voice_channel(name=channel_data['name'], position=channel_data.get('position', 0), overwrites=overwrites)
+            owner = self._categories.get(op.parent) if op.parent else guild
+            if owner is None:
+                raise RuntimeError(f"category {op.parent} does not exist")
+            create = owner.create_text_channel if op.changes['type'] == 'text' else owner.create_voice_channel
+            self._created[('channel', op.parent, op.name)] = await create(
+                name=op.name, overwrites=_template_overwrites(guild, op.changes['permissions']))
+
+    async def _reorder(self, op):
+        """One bulk position update for the roles or channels of a move op that are out of place."""
+        guild = self.guild
+        lookup = guild.get_role if op.kind == 'role' else guild.get_channel
+        moved = {}
+        for entry in op.changes['positions']:
+            if 'id' in entry:
+                target = lookup(entry['id'])
+            else:
+                target = self._created.get((op.kind, entry.get('parent'), entry['name']))
+            if target is not None and target.position != entry['position']:
+                moved[target] = entry['position']
+        if not moved:
+            return
+        if op.kind == 'role':
+            await guild.edit_role_positions(positions=moved)
+        else:
+            await edit_channel_positions(guild, moved, reason="Template apply")
+
+async def execute_template_plan(guild, plan, job=None):
+    """
+    Carry out a plan from plan_template(), reporting each operation to `job` if given.
+    Failed operations don't stop the others; they are raised together as TemplatePlanError.
+    """
+    return await TemplatePlanExecutor(guild, plan, job).run()
+
+def _template_checkpoint_path(guild_id):
+    return os.path.join(TEMPLATE_CHECKPOINT_DIR, f"{guild_id}.json")
+
+def resume_template_applies():
+    """Restart template applies that a shutdown interrupted; each is re-planned against the guild."""
+    for fname in os.listdir(TEMPLATE_CHECKPOINT_DIR):
+        path = os.path.join(TEMPLATE_CHECKPOINT_DIR, fname)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            guild = bot.get_guild(int(checkpoint['guild_id']))
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"[TEMPLATE APPLY] Unreadable checkpoint {fname}: {e}")
+            continue
+        if guild is None:
+            os.remove(path)
+            continue
+        job, created = start_template_job(guild, checkpoint['template'])
+        if created:
+            logging.info(f"[TEMPLATE APPLY] Resuming interrupted template apply for guild {guild.id} as job {job.id}")
+
+async def plan_template_on_loop(guild, template):
+    """plan_template() for callers outside the bot loop (via bot_bridge.call)."""
+    return plan_template(guild, template)
+
+async def apply_template_to_server(guild, server_settings, job=None):
+    """Restore server settings from the provided template to the specified guild."""
+    checkpoint = _template_checkpoint_path(guild.id)
+    with open(checkpoint, 'w', encoding='utf-8') as f:
+        safe_json_dump({'guild_id': str(guild.id), 'template': server_settings, 'started_at': time.time()}, f)
+    try:
+        plan = plan_template(guild, server_settings)
+        summary = await execute_template_plan(guild, plan, job)
+    except asyncio.CancelledError:
+        # A shutdown cancels the apply too; only a cancelled job gives up its checkpoint
+        if job is not None and job.cancel_requested:
+            os.remove(checkpoint)
+        raise
+    except Exception:
+        # Failed operations are reported, not retried on the next start
+        os.remove(checkpoint)
+        raise
+    os.remove(checkpoint)
+    logging.info(f"[TEMPLATE APPLY] Applied template to guild {guild.name} (ID: {guild.id}): {summary}")
+    return summary
+
+def template_dry_run_response(guild, template_data, template_name):
+    """The JSON plan a template would apply to `guild`, without changing anything."""
+    plan = bot_bridge.call(plan_template_on_loop(guild, template_data), name='plan_template')
+    return jsonify({
+        'guild_id': str(guild.id),
+        'template': template_name,
+        'summary': summarize_template_plan(plan),
+        'operations': [op.to_dict() for op in plan],
+    })
 
 
 # Define regex patterns for automod globally
@@ -1717,6 +3675,313 @@ async def periodic_task():
 # Initialize server_settings at the top of the file
 SERVER_SETTINGS_FILE = "server_settings.json"
 
+# --- Guild settings schema ---
+# Values are validated once, when they enter server_settings from a portal route,
+# a slash command or a template. Everything held in memory is therefore already
+# valid and save_server_settings() can write it in a single pass.
+
+def _coerce_bool(val, default):
+    if isinstance(val, bool):
+        return val
+    if val is None or (isinstance(val, str) and val.startswith('<circular')):
+        return default
+    if isinstance(val, str):
+        val = val.strip().lower()
+        if val in ('true', '1', 'yes', 'on', 'enabled'):
+            return True
+        if val in ('false', '0', 'no', 'off', 'disabled'):
+            return False
+        return default
+    return bool(val)
+
+def _coerce_int(val, default):
+    if isinstance(val, bool):
+        return default
+    if isinstance(val, (int, float)):
+        return int(val)
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return default
+
+def _coerce_str_list(val, default):
+    if isinstance(val, str):
+        val = val.split(',')
+    if not isinstance(val, (list, tuple)):
+        return list(default)
+    return [str(item).strip() for item in val if str(item).strip()]
+
+# field name -> (coercion function, default)
+GUILD_SETTINGS_RULES = {
+    "automod_enabled": (_coerce_bool, False),
+    "blocked_keywords": (_coerce_str_list, ()),
+    "regex_patterns": (_coerce_str_list, ()),
+    "timeout_enabled": (_coerce_bool, True),
+    "timeout_duration": (_coerce_int, 60),
+    "timeout": (_coerce_int, 60),
+    "automod_threshold": (_coerce_int, 5),
+    "automod_time_window": (_coerce_int, 10),
+    "spam_threshold": (_coerce_int, 5),
+    "spam_time_window": (_coerce_int, 10),
+}
+
+@dataclass(slots=True)
+class GuildSettings:
+    """
+    Typed view of one guild's entry in server_settings.json.
+    Known automod/timeout fields are coerced to their proper types; anything else
+    (owner info, members, message history, ...) is carried through untouched in `extra`.
+    """
+    automod_enabled: bool = False
+    blocked_keywords: list = field(default_factory=list)
+    regex_patterns: list = field(default_factory=list)
+    timeout_enabled: bool = True
+    timeout_duration: int = 60
+    timeout: int = 60
+    automod_threshold: int = 5
+    automod_time_window: int = 10
+    spam_threshold: int = 5
+    spam_time_window: int = 10
+    extra: dict = field(default_factory=dict)
+
+    @staticmethod
+    def coerce_field(name, value):
+        """Validate a single field; unknown fields are returned unchanged."""
+        rule = GUILD_SETTINGS_RULES.get(name)
+        if rule is None:
+            return value
+        coerce, default = rule
+        return coerce(value, default)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data) if isinstance(data, dict) else {}
+        known = {name: cls.coerce_field(name, data.pop(name, None)) for name in GUILD_SETTINGS_RULES}
+        return cls(extra=data, **known)
+
+    def to_dict(self):
+        out = {name: getattr(self, name) for name in GUILD_SETTINGS_RULES}
+        out.update(self.extra)
+        return out
+
+def validate_guild_settings(data):
+    """Return a validated plain-dict copy of a whole guild settings entry."""
+    return GuildSettings.from_dict(data).to_dict()
+
+# Settings change notification: server_settings is shared by the Flask thread and the
+# bot loop, so caches derived from it subscribe here instead of re-reading the file.
+_settings_subscribers = []
+
+def on_settings_changed(callback):
+    """
+    Register callback(guild_id, keys) to run after server_settings changes.
+    guild_id is None for top-level (non-guild) settings; keys is a frozenset of
+    changed keys, or None when the whole entry may have changed.
+    """
+    _settings_subscribers.append(callback)
+    return callback
+
+def publish_settings_change(guild_id, keys=None):
+    """Notify subscribers that `keys` of `guild_id` changed in server_settings."""
+    if keys is not None:
+        keys = frozenset(keys)
+        if not keys:
+            return
+    guild_id = None if guild_id is None else str(guild_id)
+    for callback in list(_settings_subscribers):
+        try:
+            callback(guild_id, keys)
+        except Exception as e:
+            logging.error(f"Settings subscriber {callback.__name__} failed for guild {guild_id}: {e}")
+
+# server_settings is copy-on-write: a stored guild entry is never modified again.
+# Writers build a new entry and swap in a new top-level dict under _settings_write_lock.
+# Readers on the Flask thread or the bot loop take `server_settings` once and get a
+# consistent view without locking.
+_settings_write_lock = threading.RLock()
+_settings_file_lock = threading.Lock()
+# Every versioned swap bumps the generation; a guild's settings version is the generation
+# of its last change to keys a patch may touch, so logged messages and member updates do
+# not fail If-Match writes. Seeded from the clock so versions never repeat across restarts.
+_settings_generation = int(time.time() * 1000)
+_SETTINGS_BASE_VERSION = _settings_generation
+_settings_versions = {}
+
+def _swap_settings(changes, versioned=True):
+    """
+    Publish a new server_settings with `changes` ({key: new value}) applied. Pass
+    versioned=False when only PATCH_PROTECTED_KEYS changed.
+    """
+    global server_settings, _settings_generation
+    snapshot = dict(server_settings)
+    snapshot.update(changes)
+    if versioned:
+        _settings_generation += 1
+        for key in changes:
+            _settings_versions[key] = _settings_generation
+    server_settings = snapshot
+    return snapshot
+
+def guild_settings_version(guild_id):
+    """Version of a guild's settings entry, for conditional updates (If-Match)."""
+    return _settings_versions.get(str(guild_id), _SETTINGS_BASE_VERSION)
+
+class SettingsVersionConflict(Exception):
+    """A settings patch was based on an outdated version of the guild's entry."""
+
+    def __init__(self, guild_id, version):
+        super().__init__(f"Settings for guild {guild_id} were changed by someone else (now version {version}).")
+        self.guild_id = guild_id
+        self.version = version
+
+def _guild_entry_copy(gid):
+    """Return (a private copy of the guild's entry, whether it had to be created)."""
+    current = server_settings.get(gid)
+    if isinstance(current, dict):
+        return dict(current), False
+    return validate_guild_settings({}), True
+
+def update_guild_settings(guild_id, changes):
+    """
+    Validate `changes` and publish them as a new settings entry for `guild_id`,
+    creating a default entry for unknown guilds. Returns the new entry, which must
+    not be modified. Persist the keys with persist_settings_changes() afterwards.
+    """
+    gid = str(guild_id)
+    with _settings_write_lock:
+        entry, created = _guild_entry_copy(gid)
+        changed = []
+        for key, value in changes.items():
+            value = GuildSettings.coerce_field(key, value)
+            if key not in entry or entry[key] != value:
+                changed.append(key)
+            entry[key] = value
+        if created or changed:
+            _swap_settings({gid: entry}, versioned=created or not PATCH_PROTECTED_KEYS.issuperset(changed))
+        else:
+            entry = server_settings[gid]
+    publish_settings_change(gid, None if created else changed)
+    return entry
+
+def replace_guild_settings(guild_id, data):
+    """Validate `data` and publish it as the complete settings entry for `guild_id`."""
+    gid = str(guild_id)
+    entry = validate_guild_settings(data)
+    with _settings_write_lock:
+        _swap_settings({gid: entry})
+    publish_settings_change(gid)
+    return entry
+
+# Keys a settings patch may not touch: authorization data and bot-maintained history
+PATCH_PROTECTED_KEYS = frozenset(("owner_id", "owner_name", "members", "messages", "latest_message"))
+
+def protected_patch_keys(entry, patch):
+    """Protected keys that `patch` would change; round-tripped unchanged values are allowed."""
+    entry = entry if isinstance(entry, dict) else {}
+    return sorted(key for key in PATCH_PROTECTED_KEYS.intersection(patch) if patch[key] != entry.get(key))
+
+def _changed_keys(old, new):
+    return [key for key in old.keys() | new.keys() if key not in old or key not in new or old[key] != new[key]]
+
+def patch_guilds_settings(patches, expected_versions=None):
+    """
+    Apply JSON merge patches (RFC 7386) to several guilds as a single change.
+    `patches` is [(guild_id, patch)] applied in order; every resulting entry is
+    validated before one swap publishes them all. With `expected_versions`
+    ({guild_id: version}) nothing is applied unless every guild is still at that
+    version (SettingsVersionConflict otherwise). Returns {guild_id: changed keys}
+    for the guilds that actually changed; persist them with persist_settings_changes().
+    """
+    with _settings_write_lock:
+        for gid, expected in (expected_versions or {}).items():
+            current = guild_settings_version(gid)
+            if expected != current:
+                raise SettingsVersionConflict(str(gid), current)
+        originals, entries = {}, {}
+        for guild_id, patch in patches:
+            gid = str(guild_id)
+            if gid not in entries:
+                current = server_settings.get(gid)
+                originals[gid] = current if isinstance(current, dict) else {}
+                entries[gid] = originals[gid]
+            entries[gid] = validate_guild_settings(json_merge_patch(entries[gid], patch))
+        changed = {gid: _changed_keys(originals[gid], entry) for gid, entry in entries.items()}
+        changed = {gid: keys for gid, keys in changed.items() if keys}
+        if changed:
+            _swap_settings({gid: entries[gid] for gid in changed})
+    # One notification per guild, so derived caches (automod rulesets, portal state) rebuild once
+    for gid, keys in changed.items():
+        publish_settings_change(gid, keys)
+    return changed
+
+def persist_settings_changes(changed):
+    """
+    Persist {guild_id: changed keys} by appending just those keys to the settings journal
+    instead of rewriting server_settings.json. Falls back to a full save once the journal
+    has grown past SETTINGS_JOURNAL_MAX_BYTES.
+    """
+    if not changed:
+        return
+    try:
+        # Records are built and appended under the file lock (always taken before the
+        # write lock), so a full save can never land between the two and be overwritten
+        # at replay by values older than the ones it wrote
+        with _settings_file_lock:
+            with _settings_write_lock:
+                snapshot = server_settings
+                records = []
+                for gid, keys in changed.items():
+                    gid = str(gid)
+                    entry = snapshot.get(gid)
+                    entry = entry if isinstance(entry, dict) else {}
+                    records.append({
+                        "gen": guild_settings_version(gid),
+                        "guild_id": gid,
+                        "set": {key: entry[key] for key in keys if key in entry},
+                        "unset": [key for key in keys if key not in entry],
+                    })
+            with open(SETTINGS_JOURNAL_FILE, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(safe_json_dumps(record) + "\n")
+            journal_size = os.path.getsize(SETTINGS_JOURNAL_FILE)
+        if journal_size > SETTINGS_JOURNAL_MAX_BYTES:
+            save_server_settings(server_settings)
+    except Exception as e:
+        logging.error(f"Error journaling settings changes, writing the full file instead: {e}")
+        save_server_settings(server_settings)
+
+def update_member_settings(guild_id, member_id, changes):
+    """Publish `changes` for one member under the guild's "members" entry."""
+    gid, mid = str(guild_id), str(member_id)
+    with _settings_write_lock:
+        entry, created = _guild_entry_copy(gid)
+        members = dict(entry.get("members") or {})
+        members[mid] = {**(members.get(mid) or {}), **changes}
+        entry["members"] = members
+        _swap_settings({gid: entry}, versioned=created)
+    publish_settings_change(gid, None if created else ("members",))
+    return entry
+
+def record_guild_message(guild_id, msg, limit=50):
+    """Publish `msg` as the guild's latest message and append it to the last `limit` messages."""
+    gid = str(guild_id)
+    with _settings_write_lock:
+        entry, created = _guild_entry_copy(gid)
+        messages = entry.get("messages")
+        messages = list(messages[-(limit - 1):]) if isinstance(messages, list) else []
+        messages.append(msg)
+        entry["latest_message"] = dict(msg)
+        entry["messages"] = messages
+        _swap_settings({gid: entry}, versioned=created)
+    publish_settings_change(gid, None if created else ("latest_message", "messages"))
+    return entry
+
+def set_global_setting(key, value):
+    """Publish a top-level (non-guild) setting such as hide_owner_id."""
+    with _settings_write_lock:
+        _swap_settings({key: value})
+    publish_settings_change(None, (key,))
+
 def migrate_server_settings(data):
     """
     Ensure server_settings is a dict of dicts keyed by guild ID.
@@ -1728,22 +3993,54 @@ def migrate_server_settings(data):
     if all(isinstance(v, (str, bool, int, float, list)) for v in data.values()):
         # Only global settings, not per-guild
         return {}
-    # If keys are guild IDs and values are dicts, it's valid
-    for k, v in data.items():
-        if not isinstance(v, dict):
-            data[k] = {}  # Reset any non-dict entry
-    return data
+    # If keys are guild IDs and values are dicts, validate them through the schema
+    return {
+        k: validate_guild_settings(v) if isinstance(v, dict) else {}  # Reset any non-dict entry
+        for k, v in data.items()
+    }
+
+# Settings journal: merge-patch edits append only the keys they changed (see
+# persist_settings_changes). It is replayed over the file at startup and emptied by
+# every full save, which folds it back into server_settings.json.
+SETTINGS_JOURNAL_FILE = SERVER_SETTINGS_FILE + ".journal"
+SETTINGS_JOURNAL_MAX_BYTES = 1024 * 1024
+
+def _replay_settings_journal(data):
+    """Apply journaled changes on top of the loaded file; returns (data, records applied)."""
+    try:
+        with open(SETTINGS_JOURNAL_FILE, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return data, 0
+    if not isinstance(data, dict):
+        return data, 0
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # Only an append cut short by a crash can leave a partial line
+            logging.warning("Skipping an incomplete settings journal record.")
+    # Appends are serialized with the snapshot they were built from, so file order is change order
+    for record in records:
+        gid = str(record.get("guild_id"))
+        entry = dict(data[gid]) if isinstance(data.get(gid), dict) else {}
+        entry.update(record.get("set") or {})
+        for key in record.get("unset") or ():
+            entry.pop(key, None)
+        data[gid] = entry
+    return data, len(records)
 
 def load_server_settings():
-    """Load server-specific settings from the JSON file."""
+    """Load server-specific settings from the JSON file, validating every guild entry once."""
     try:
         with open(SERVER_SETTINGS_FILE, "r") as f:
             data = json.load(f)
+        data, replayed = _replay_settings_journal(data)
         migrated = migrate_server_settings(data)
-        # If migration changed the structure, save it back
-        if migrated != data:
-            with open(SERVER_SETTINGS_FILE, "w") as f:
-                json.dump(migrated, f, indent=2)
+        # If the journal, migration or validation changed anything, save it back
+        if replayed or migrated != data:
+            save_server_settings(migrated)
         return migrated
     except FileNotFoundError:
         logging.warning(f"{SERVER_SETTINGS_FILE} not found. Creating a new one.")
@@ -1752,17 +4049,28 @@ def load_server_settings():
         return {}
 
 def save_server_settings(settings):
-    """Save server-specific settings to the JSON file, cleaning circular references and fixing known field issues."""
+    """
+    Save server-specific settings to the JSON file in a single pass.
+    Guild entries are validated by GuildSettings when values enter server_settings,
+    so nothing is re-read or cleaned after the write. Once settings are loaded the
+    latest published snapshot is written, so journal records appended meanwhile are
+    included before the journal is emptied.
+    """
     try:
-        with open(SERVER_SETTINGS_FILE, "w") as f:
-            safe_json_dump(settings, f, indent=2)
-        # Automatically clean circular reference fields after every save
-        clean_server_settings_file()
-        logging.info("Server settings saved and cleaned successfully.")
+        # Snapshots are immutable, so only concurrent writes to the file need serializing
+        with _settings_file_lock:
+            if server_settings is not None:
+                settings = server_settings
+            with open(SERVER_SETTINGS_FILE, "w") as f:
+                safe_json_dump(settings, f, indent=2)
+            if os.path.exists(SETTINGS_JOURNAL_FILE):
+                open(SETTINGS_JOURNAL_FILE, "w").close()
+        logging.info("Server settings saved successfully.")
     except Exception as e:
         logging.error(f"Error saving server settings: {e}")
 
 # Load server settings at startup
+server_settings = None
 server_settings = load_server_settings()
 
 # Ensure server_settings has a default structure
@@ -1771,6 +4079,161 @@ for guild_id, settings in server_settings.items():
         if "members" not in settings:
             settings["members"] = {}  # Add a members key if missing
 
+# --- Live portal feed (Server-Sent Events) ---
+# Guild events are pushed to connected portal/dashboard tabs as they happen, instead of
+# every tab polling the full guild list every 10 seconds.
+PORTAL_EVENT_BACKLOG = 256
+PORTAL_EVENT_QUEUE_SIZE = 100
+PORTAL_EVENT_HEARTBEAT = 15
+# In production every open stream holds a worker thread, so at most half the pool streams
+PORTAL_EVENT_MAX_STREAMS = max(1, PORTAL_WORKERS // 2) if PORTAL_SERVER == 'production' else None
+_stream_slots = threading.Semaphore(PORTAL_EVENT_MAX_STREAMS) if PORTAL_EVENT_MAX_STREAMS else None
+
+class GuildEventHub:
+    """
+    Thread-safe fan-out of guild events to SSE subscribers, each of which only receives
+    events for the guilds it subscribed with. Recent events are kept so a reconnecting
+    browser can replay from its Last-Event-ID; slow subscribers are dropped and resync
+    when they reconnect.
+    """
+
+    def __init__(self, backlog=PORTAL_EVENT_BACKLOG):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # queue -> guild ids (str) it may see
+        self._backlog = deque(maxlen=backlog)
+        self._next_id = 1
+
+    def publish(self, event_type, guild_id, data=None):
+        guild_id = str(guild_id)
+        with self._lock:
+            event = (self._next_id, event_type, safe_json_dumps({'guild_id': guild_id, **(data or {})}), guild_id)
+            self._next_id += 1
+            self._backlog.append(event)
+            subscribers = [q for q, guild_ids in self._subscribers.items() if guild_id in guild_ids]
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                self._drop(q)
+
+    def _drop(self, q):
+        """Close a subscriber that fell behind; it replays from the backlog when it reconnects."""
+        self.unsubscribe(q)
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def subscribe(self, guild_ids, last_event_id=None):
+        """Return (queue, replay events, whether the client must resync) for events of `guild_ids`."""
+        q = queue.Queue(maxsize=PORTAL_EVENT_QUEUE_SIZE)
+        guild_ids = frozenset(str(guild_id) for guild_id in guild_ids)
+        with self._lock:
+            self._subscribers[q] = guild_ids
+            replay, resync = [], False
+            if last_event_id is not None:
+                replay = [e for e in self._backlog if e[0] > last_event_id and e[3] in guild_ids]
+                oldest = self._backlog[0][0] if self._backlog else self._next_id
+                resync = last_event_id + 1 < oldest
+        return q, replay, resync
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(q, None)
+
+    def close_all(self):
+        """End every open stream (used on shutdown)."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            self._drop(q)
+
+guild_events = GuildEventHub()
+
+@on_settings_changed
+def _bump_portal_state(guild_id, keys):
+    if guild_id is not None and not (keys is not None and keys <= {'members'}):
+        portal_state.bump(guild_id)
+
+@on_settings_changed
+def _publish_settings_event(guild_id, keys):
+    if guild_id is None:
+        return
+    entry = server_settings.get(guild_id)
+    if not isinstance(entry, dict):
+        return
+    if keys is not None and keys <= {'latest_message', 'messages'}:
+        if 'latest_message' in keys:
+            guild_events.publish('message', guild_id, {'latest_message': entry.get('latest_message')})
+        return
+    if keys is not None and keys <= {'members'}:
+        return
+    guild_events.publish('settings', guild_id, {'automod_enabled': bool(entry.get('automod_enabled', False))})
+
+def _format_sse(event):
+    event_id, event_type, data, _ = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+@app.route('/api/portal_events')
+def api_portal_events():
+    """
+    Stream guild events (message, automod_block, settings, guild_join, guild_remove) as SSE,
+    limited to the guilds in the caller's portal session.
+    """
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    record = get_portal_session()
+    if record is None:
+        return jsonify({'error': 'Not authenticated'}), 401
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    if _stream_slots is not None and not _stream_slots.acquire(blocking=False):
+        # The page falls back to polling when its stream is refused
+        return Response("Too many live streams, please retry shortly.", 503, mimetype='text/plain',
+                        headers={'Retry-After': str(PORTAL_RETRY_AFTER)})
+    q, replay, resync = guild_events.subscribe(record.guild_status, last_event_id)
+
+    def stream():
+        yield "retry: 5000\n\n"
+        if resync:
+            yield "event: resync\ndata: {}\n\n"
+        for event in replay:
+            yield _format_sse(event)
+        while True:
+            try:
+                event = q.get(timeout=PORTAL_EVENT_HEARTBEAT)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            yield _format_sse(event)
+
+    def close():
+        guild_events.unsubscribe(q)
+        if _stream_slots is not None:
+            _stream_slots.release()
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(close)
+    return response
+
+@bot.event
+async def on_guild_remove(guild):
+    guild_snapshots.discard(guild.id)
+    portal_state.bump(guild.id)
+    guild_list_state.bump(guild.id)
+    guild_events.publish('guild_remove', guild.id)
+
 @bot.event
 async def on_message(message):
     # Skip messages from bots
@@ -1853,7 +4316,6 @@ async def on_message(message):
 
     # --- Automod: Blocked Keywords & Regex Patterns ---
     # Only apply automod logic AFTER logging the message, so all messages are always logged
-    server_settings = load_server_settings()
     guild_id = str(message.guild.id)
     settings = server_settings.get(guild_id, {})
     blocked_keywords = settings.get("blocked_keywords", [])
@@ -1884,6 +4346,9 @@ async def on_ready():
     """Triggered when the bot is ready."""
     set_bot_loop(asyncio.get_running_loop())
     logging.info(f'Logged in as {bot.user}')
+    # The guild list is complete now
+    portal_state.bump()
+    guild_list_state.bump()
     try:
         # Synchronize slash commands globally
         await bot.tree.sync()
@@ -1892,7 +4357,7 @@ async def on_ready():
         for guild in bot.guilds:
             guild_id = str(guild.id)
             if guild_id not in server_settings:
-                server_settings[guild_id] = {
+                update_guild_settings(guild_id, {
                     "automod_enabled": True,
                     "blocked_keywords": [],
                     "regex_patterns": [],
@@ -1900,7 +4365,7 @@ async def on_ready():
                     "spam_time_window": 10,
                     "owner_id": (getattr(guild, 'owner', None).id if getattr(guild, 'owner', None) else None),
                     "owner_name": (getattr(guild, 'owner', None).name if getattr(guild, 'owner', None) else "Unknown"),
-                }
+                })
 
         # Save updated settings to ensure persistence
         save_server_settings(server_settings)
@@ -1913,11 +4378,11 @@ async def on_ready():
             # Ensure default settings for each guild
             guild_id = str(guild.id)
             if guild_id not in server_settings:
-                server_settings[guild_id] = {
+                update_guild_settings(guild_id, {
                     "automod_enabled": True,
                     "blocked_keywords": [],
                     "regex_patterns": [],
-                }
+                })
         save_server_settings(server_settings)
 
         # Synchronize slash commands globally
@@ -1925,6 +4390,11 @@ async def on_ready():
         logging.info("Slash commands synchronized globally.")
     except Exception as e:
         logging.error(f"Error during on_ready: {e}")
+    # Finish template applies a shutdown interrupted (checkpoints in TEMPLATE_CHECKPOINT_DIR)
+    try:
+        resume_template_applies()
+    except Exception as e:
+        logging.error(f"Error resuming interrupted template applies: {e}")
 
 @bot.event
 async def on_guild_join(guild):
@@ -1984,174 +4454,37 @@ async def load_and_assign_roles(guild):
 
         # Ensure the bot's role is always on top
         bot_role = bot_member.top_role
-        await bot_role.edit(position=guild.roles[-1].position)
-        logging.info(f"Bot's role '{bot_role.name}' moved to the top in guild {guild.name} (ID: {guild.id}).")
+        if await move_bot_role_to_top(guild):
+            logging.info(f"Bot's role '{bot_role.name}' moved to the top in guild {guild.name} (ID: {guild.id}).")
     except Exception as e:
         logging.error(f"An error occurred: {e}")
         logging.error(f"Error in load_and_assign_roles for guild {guild.name} (ID: {guild.id}): {e}")
 
 @app.route('/portal')
 def portal():
-    global server_settings  # must be at the top before any use
-    # Always reload server_settings and hide owner ID for every guild for privacy
-    server_settings = load_server_settings()
-    for gid in server_settings:
-        pass
-        pass
-    # --- CANONICAL GUILD ID LOGIC ---
-    # The canonical source of guild IDs is bot.guilds, as populated on_ready and updated on_guild_join.
-    # All portal logic below will only use guilds present in bot.guilds.
-    # This guarantees that the portal always reflects the actual servers the bot is in, and prevents mismatches.
-    logging.debug(f"Canonical guild IDs (bot.guilds): {[str(guild.id) for guild in bot.guilds]}")
-    templates_creation_result = request.args.get('templates_creation_result')
+    """Display the portal page with the list of servers and their settings."""
     if 'access_token' not in session:
         return redirect(url_for('login'))
+    if bot_loop is None:
+        logging.error("Bot loop is not ready yet!")
+        return "Bot is not ready. Please try again in a moment.", 503
 
-    # Always fetch the Discord user after checking for access_token, before try block
-    discord_user = get_discord_user()
-    if not discord_user:
+    record = get_portal_session()
+    if record is None:
         return redirect(url_for('login'))
 
     try:
-        # Fetch the authenticated user's guilds
-        access_token = session.get('access_token')
-        headers = {'Authorization': f'Bearer {access_token}'}
-        # Fetch the authenticated user's guilds asynchronously using aiohttp
-        async def fetch_guilds():
-            async with aiohttp.ClientSession() as session_http:
-                async with session_http.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers) as response:
-                    guilds_json = await response.json()
-                    text = await response.text()
-                    return response.status, guilds_json, text
-        if bot_loop is None:
-            logging.error("Bot loop is not ready yet!")
-            return "Bot is not ready. Please try again in a moment.", 503
-        status, user_guilds, text = asyncio.run_coroutine_threadsafe(fetch_guilds(), bot_loop).result()
-
-        if status != 200:
-            logging.error(f"Failed to fetch user's guilds. Response: {text}")
-            return render_template('error.html', message="Failed to fetch your guilds. Please try logging in again.")
-
-        # Log all user guilds
-        logging.info("User's guilds fetched from Discord API:")
-        for guild in user_guilds:
-            logging.info(f"Guild Name: {guild['name']}, Guild ID: {guild['id']}")
-
-        # Load owner roles and server settings
-        owner_roles = load_owner_roles()
-
-        # Pre-load server IDs and related information into memory
-        memory_cache = {}
-        for guild in bot.guilds:
-            guild_id = str(guild.id)
-            default_settings = {
-                "automod_enabled": False,
-                "blocked_keywords": [],
-                "regex_patterns": [],
-                "spam_threshold": 5,
-                "spam_time_window": 10,
-                "owner_id": (getattr(guild, 'owner', None).id if getattr(guild, 'owner', None) else None),
-                "owner_name": (getattr(guild, 'owner', None).name if getattr(guild, 'owner', None) else "Unknown"),
-            }
-            if guild_id not in server_settings or not isinstance(server_settings[guild_id], dict):
-                server_settings[guild_id] = default_settings.copy()
-
-            # Cache guild information in memory
-            memory_cache[guild_id] = {
-                "name": guild.name,
-                "owner_name": (getattr(guild, 'owner', None).name if getattr(guild, 'owner', None) else "Unknown"),
-                "owner_id": guild.owner.id if guild.owner else "Unknown",
-                "automod_enabled": server_settings[guild_id].get("automod_enabled", False),
-                "blocked_keywords": server_settings[guild_id].get("blocked_keywords", []),
-                "regex_patterns": server_settings[guild_id].get("regex_patterns", []),
-                "spam_threshold": server_settings[guild_id].get("spam_threshold", 5),
-                "spam_time_window": server_settings[guild_id].get("spam_time_window", 10),
-                "bot_role_top": server_settings[guild_id].get("bot_role_top", False),
-            }
-
-        # Save updated settings to ensure persistence
-        save_server_settings(server_settings)
-
-        # Separate guilds into those the bot is in and those it can be added to
-        bot_guild_ids = {str(guild.id) for guild in bot.guilds}
-        user_guilds_with_permissions = []
-
-        for guild in user_guilds:
-            guild_id = guild.get('id')
-            if not guild_id:
-                continue
-            if guild_id not in bot_guild_ids and guild.get('permissions', 0) & 0x20:  # Check for 'Manage Server' permission
-                owner_role = owner_roles.get(guild_id, {}).get("role_name", f"Role ID: {owner_roles.get(guild_id, {}).get('role_id', 'Unknown')}")
-                user_guilds_with_permissions.append({
-                    'id': guild_id,
-                    'name': guild.get('name', 'Unknown'),
-                    'icon': guild.get('icon', None),
-                    'owner_role': owner_role or 'Unknown'
-                })
-
-        # Get the list of guilds the bot is already in
-        bot_guilds = []
-        for guild_id, data in memory_cache.items():
-            # Fetch owner role from owner_roles.json if available
-            owner_role_name = None
-            if guild_id in owner_roles:
-                owner_role_name = owner_roles[guild_id].get("role_name")
-            # Determine if the current user is the owner
-            user_is_owner = str(discord_user.get("id")) == str(data.get("owner_id", ""))
-            # Determine if the current user has the owner role (API call, fallback to owner check)
-            try:
-                user_has_owner_role = user_has_owner_role(guild_id, discord_user.id, session.get('access_token'))
-            except Exception as e:
-                user_has_owner_role = False
-            bot_guilds.append({
-                'id': guild_id,
-                'name': data.get("name", "Unknown"),
-                'owner_name': data.get("owner_name", "Unknown"),
-                'owner_id': data.get("owner_id", "Unknown"),
-                'automod_enabled': data.get("automod_enabled", True),
-                'blocked_keywords': data.get("blocked_keywords", []),
-                'regex_patterns': data.get("regex_patterns", []),
-                'spam_threshold': data.get("spam_threshold", 5),
-                'spam_time_window': data.get("spam_time_window", 10),
-                'bot_role_top': data.get("bot_role_top", False),
-                'owner_role_name': owner_role_name or 'Not Set',
-                'user_is_owner': user_is_owner,
-                'user_has_owner_role': user_has_owner_role,
-            })
-
-        # Fetch the Discord user
-        discord_user = get_discord_user()
-        if not discord_user:
-            return redirect(url_for('login'))
-
-        # Build a list of all logged guilds from server_settings (even if not in bot_guilds)
-        logged_guilds = []
-        for gid, guild_data in server_settings.items():
-            if not isinstance(guild_data, dict):
-                continue  # Skip non-dict entries
-            if not str(gid).isdigit():
-                continue  # Skip non-numeric keys (not real guilds)
-            logged_guilds.append({
-                'id': gid,
-                'name': guild_data.get('name', f'Guild {gid}'),
-                'owner_name': guild_data.get('owner_name', 'Unknown'),
-                'owner_id': guild_data.get('owner_id', 'Unknown'),
-                'automod_enabled': guild_data.get('automod_enabled', True),
-                'blocked_keywords': guild_data.get('blocked_keywords', []),
-                'regex_patterns': guild_data.get('regex_patterns', []),
-                'spam_threshold': guild_data.get('spam_threshold', 5),
-                'spam_time_window': guild_data.get('spam_time_window', 10),
-                'latest_message': guild_data.get('latest_message', {}),
-            })
-
+        # Read-only: rows come from the in-memory guild index, never from a settings save
+        view = build_portal_view(record)
         return render_template(
             'portal.html',
-            bot_guilds=bot_guilds,
-            user_guilds_with_permissions=user_guilds_with_permissions,
-            discord_user=discord_user,
-            server_settings=server_settings,  # Pass server_settings to the template
-            templates_creation_result=templates_creation_result,
-            logged_guilds=logged_guilds
+            bot_guilds=view.bot_guilds,
+            logged_guilds=view.logged_guilds,
+            user_guilds_with_permissions=view.user_guilds_with_permissions,
+            discord_user=record.user,
+            server_settings=view.settings,  # Pass per-guild settings to the template
+            guilds_user_in_not_owner=view.guilds_user_in_not_owner,
+            templates_creation_result=request.args.get('templates_creation_result'),
         )
     except Exception as e:
         import traceback
@@ -2199,8 +4532,8 @@ async def scan_and_create_owner_role(guild):
 
         # Ensure the bot's role is always on top
         bot_role = bot_member.top_role
-        await bot_role.edit(position=guild.roles[-1].position)
-        logging.info(f"Bot's role '{bot_role.name}' moved to the top in guild {guild.name} (ID: {guild.id}).")
+        if await move_bot_role_to_top(guild):
+            logging.info(f"Bot's role '{bot_role.name}' moved to the top in guild {guild.name} (ID: {guild.id}).")
     except Exception as e:
         logging.error(f"Error in scan_and_create_owner_role for guild {guild.name} (ID: {guild.id}): {e}")
 
@@ -2244,15 +4577,9 @@ def set_owner_role_web():
         if not role:
             return f"Role '{role_name}' not found in guild '{guild.name}'.", 404
         if bot_top_role.position <= role.position:
-            # Attempt to move the bot's role to the top if possible using asyncio.run_coroutine_threadsafe
-            import asyncio
+            # Attempt to move the bot's role to the top if possible
             try:
-                loop = getattr(bot, 'loop', None) or asyncio.get_event_loop()
-                future = asyncio.run_coroutine_threadsafe(
-                    bot_top_role.edit(position=guild.roles[-1].position),
-                    loop
-                )
-                future.result()  # Wait for the result or raise exception if failed
+                bot_bridge.call(move_bot_role_to_top(guild), name='move_bot_role')
                 # Re-fetch bot's member and top_role after edit
                 bot_member = guild.me
                 bot_top_role = bot_member.top_role
@@ -2276,11 +4603,8 @@ def set_owner_role_web():
         save_owner_roles(owner_roles)
 
         # Update the owner_id in server_settings
-        if str(guild_id) not in server_settings:
-            server_settings[str(guild_id)] = {}
-        server_settings[str(guild_id)]["owner_id"] = guild.owner.id
-        server_settings[str(guild_id)]["owner_name"] = guild.owner.name
-        save_server_settings(server_settings)
+        update_guild_settings(guild_id, {"owner_id": guild.owner.id, "owner_name": guild.owner.name})
+        persist_settings_changes({str(guild_id): ["owner_id", "owner_name"]})
 
         logging.info(f"Owner role for guild {guild_id} set to role '{role.name}', and owner_id updated.")
         return redirect(url_for('portal'))
@@ -2326,14 +4650,14 @@ def toggle_automod():
         if not member:
             return "You are not a member of this guild.", 403
 
-        owner_role_id = load_owner_roles().get(str(guild_id), {}).get("role_id")
+        owner_role_id = get_owner_role_id(guild_id)
         if not owner_role_id or owner_role_id not in [role.id for role in member.roles]:
             return "Only users with the owner role can toggle automod.", 403
 
         # Update automod settings
         if str(guild_id) in server_settings:
-            server_settings[str(guild_id)]["automod_enabled"] = automod_enabled
-            save_server_settings(server_settings)
+            update_guild_settings(guild_id, {"automod_enabled": automod_enabled})
+            persist_settings_changes({str(guild_id): ["automod_enabled"]})
             logging.info(f"Automod for guild {guild_id} set to {automod_enabled}.")
             return {"message": f"Automod for guild {guild_id} has been {'enabled' if automod_enabled else 'disabled'}."}, 200
         else:
@@ -2373,13 +4697,8 @@ def toggle_timeout_user():
 
         # Update timeout settings
         if guild_id in server_settings:
-            if "members" not in server_settings[guild_id]:
-                server_settings[guild_id]["members"] = {}
-            if user_id not in server_settings[guild_id]["members"]:
-                server_settings[guild_id]["members"][user_id] = {}
-
-            server_settings[guild_id]["members"][user_id]["timeout_enabled"] = timeout_enabled
-            save_server_settings(server_settings)
+            update_member_settings(guild_id, user_id, {"timeout_enabled": timeout_enabled})
+            persist_settings_changes({str(guild_id): ["members"]})
             logging.info(f"Timeout for user {user_id} in guild {guild_id} set to {'enabled' if timeout_enabled else 'disabled'}.")
             return redirect(url_for('portal'))
         else:
@@ -2417,8 +4736,8 @@ def update_keywords():
         return "Only members with the owner role or the guild owner can update blocked keywords.", 403
     try:
         if guild_id in server_settings:
-            server_settings[guild_id]["blocked_keywords"] = keywords
-            save_server_settings(server_settings)
+            update_guild_settings(guild_id, {"blocked_keywords": keywords})
+            persist_settings_changes({str(guild_id): ["blocked_keywords"]})
             logging.info(f"Blocked keywords for guild {guild_id} updated: {keywords}")
             return redirect(url_for('portal'))
         else:
@@ -2456,8 +4775,8 @@ def update_regex():
         return "Only members with the owner role or the guild owner can update regex patterns.", 403
     try:
         if guild_id in server_settings:
-            server_settings[guild_id]["regex_patterns"] = regex_patterns
-            save_server_settings(server_settings)
+            update_guild_settings(guild_id, {"regex_patterns": regex_patterns})
+            persist_settings_changes({str(guild_id): ["regex_patterns"]})
             logging.info(f"Regex patterns for guild {guild_id} updated: {regex_patterns}")
             return redirect(url_for('portal'))
         else:
@@ -2466,6 +4785,56 @@ def update_regex():
         logging.error(f"Error updating regex patterns for guild {guild_id}: {e}")
         return f"An error occurred: {e}", 500
 
+@app.route('/api/settings/batch', methods=['POST'])
+def api_settings_batch():
+    """
+    Apply settings changes to many guilds in one request. Body:
+    {"operations": [{"guild_id": "...", "patch": {<JSON merge patch>}}, ...]}.
+    Every operation is checked and authorized first; if any fails nothing is applied.
+    Otherwise all patches are published together and the settings file is written once.
+    """
+    if 'access_token' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    discord_user = get_discord_user()
+    if not discord_user:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'error': "Expected {'operations': [{'guild_id': ..., 'patch': {...}}, ...]}."}), 400
+
+    access_token = session.get('access_token')
+    patches, errors, forbidden, authorized = [], [], 0, {}
+    for index, op in enumerate(operations):
+        guild_id = str(op.get('guild_id', '')) if isinstance(op, dict) else ''
+        patch = op.get('patch') if isinstance(op, dict) else None
+        if not guild_id or not isinstance(patch, dict):
+            errors.append({'index': index, 'error': 'Each operation needs a guild_id and an object patch.'})
+            continue
+        if guild_id not in server_settings:
+            errors.append({'index': index, 'guild_id': guild_id, 'error': 'Guild not found in server settings.'})
+            continue
+        protected = protected_patch_keys(server_settings.get(guild_id), patch)
+        if protected:
+            errors.append({'index': index, 'guild_id': guild_id, 'error': f"Keys cannot be patched: {', '.join(protected)}"})
+            continue
+        # One authorization decision per guild, however many operations target it
+        if guild_id not in authorized:
+            authorized[guild_id] = user_has_owner_role(guild_id, discord_user['id'], access_token)
+        if not authorized[guild_id]:
+            errors.append({'index': index, 'guild_id': guild_id, 'error': 'Only the guild owner or owner role can change settings.'})
+            forbidden += 1
+            continue
+        patches.append((guild_id, patch))
+    if errors:
+        return jsonify({'success': False, 'errors': errors}), 403 if forbidden == len(errors) else 400
+
+    changed = patch_guilds_settings(patches)
+    persist_settings_changes(changed)
+    logging.info(f"[Settings] Batch of {len(patches)} operations changed {len(changed)} guilds")
+    return jsonify({'success': True, 'applied': len(patches), 'changed': {gid: sorted(keys) for gid, keys in changed.items()}})
+
 @app.route('/toggle_automod_server', methods=['POST'])
 def toggle_automod_server():
     """Toggle the automod feature for a specific server."""
@@ -2487,15 +4856,7 @@ def toggle_automod_server():
         enabled = data['enabled']
 
         # Fetch the user's guilds from Discord API
-        access_token = session.get('access_token')
-        headers = {'Authorization': f'Bearer {access_token}'}
-        async def fetch_guilds():
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers) as response:
-                    guilds_json = await response.json()
-                    text = await response.text()
-                    return response.status, guilds_json, text
-        status, user_guilds, text = asyncio.run(fetch_guilds())
+        status, user_guilds, text = get_user_guilds()
 
         if status != 200:
             logging.error(f"Failed to fetch user's guilds. Response: {text}")
@@ -2507,11 +4868,9 @@ def toggle_automod_server():
             logging.warning(f"User does not own the guild with ID {guild_id}.")
             return {"error": "You can only modify automod settings for servers you own."}, 403
 
-        # Update the automod state for the specified server
-        if guild_id not in server_settings:
-            server_settings[guild_id] = {}
-        server_settings[guild_id]["automod_enabled"] = enabled
-        save_server_settings(server_settings)
+        # Validate and update the automod state for the specified server
+        enabled = update_guild_settings(guild_id, {"automod_enabled": enabled})["automod_enabled"]
+        persist_settings_changes({str(guild_id): ["automod_enabled"]})
 
         state = "enabled" if enabled else "disabled"
         logging.info(f"Automod for server {guild_id} has been {state}.")
@@ -2528,13 +4887,16 @@ async def on_guild_join(guild):
         # Initialize default settings for the new guild
         guild_id = str(guild.id)
         if guild_id not in server_settings:
-            server_settings[guild_id] = {
+            update_guild_settings(guild_id, {
                 "automod_enabled": False,  # Default automod state is now disabled
                 "blocked_keywords": [],  # Default blocked keywords
                 "regex_patterns": [],  # Default regex patterns
-            }
-            save_server_settings(server_settings)
+            })
+            persist_settings_changes({guild_id: ["automod_enabled", "blocked_keywords", "regex_patterns"]})
             logging.info(f"Default settings created for guild {guild.name} (ID: {guild.id}).")
+        portal_state.bump(guild_id)
+        guild_list_state.bump(guild_id)
+        guild_events.publish('guild_join', guild_id, {'name': guild.name})
 
         # Ensure a log file exists for this guild
         logs_dir = os.path.join(os.getcwd(), "discord_guild_backups")
@@ -2571,12 +4933,12 @@ def get_or_create_server_settings(guild_id):
     try:
         if guild_id not in server_settings:
             # Create default settings if they don't exist
-            server_settings[guild_id] = {
+            update_guild_settings(guild_id, {
                 "automod_enabled": True,
                 "blocked_keywords": [],
                 "regex_patterns": [],
-            }
-            save_server_settings(server_settings)
+            })
+            persist_settings_changes({str(guild_id): ["automod_enabled", "blocked_keywords", "regex_patterns"]})
             logging.info(f"Default settings created for guild {guild_id}.")
 
         settings = server_settings[guild_id]
@@ -2603,7 +4965,7 @@ def set_owner_role_api():
 
     try:
         owner_roles = load_owner_roles()
-        owner_roles[guild_id] = int(role_id)
+        owner_roles[guild_id] = {"type": "server", "role_id": int(role_id)}
         save_owner_roles(owner_roles)
         logging.info(f"Owner role for guild {guild_id} set to role {role_id}.")
         return redirect(url_for('portal'))
@@ -2729,41 +5091,8 @@ async def backup_slash(interaction: nextcord.Interaction):
                 logging.warning(f"Could not load messages for backup: {e}")
 
         server_settings_backup = {
-            'name': guild.name,
-            'id': guild.id,
-            'member_count': guild.member_count,
-            'roles': [{'name': role.name, 'permissions': role.permissions.value} for role in guild.roles if not role.managed],
-            'categories': [
-                {
-                    'name': category.name,
-                    'channels': [
-                        {
-                            'name': channel.name,
-                            'type': 'text' if isinstance(channel, nextcord.TextChannel) else 'voice',
-                            'permissions': {
-                                str(target): overwrite._values
-                                for target, overwrite in channel.overwrites.items()
-                            }
-                        }
-                        for channel in category.channels
-                    ]
-                }
-                for category in guild.categories
-            ],
-            'channels': [
-                {
-                    'name': channel.name,
-                    'type': 'text' if isinstance(channel, nextcord.TextChannel) else 'voice',
-                    'permissions': {
-                        str(target): overwrite._values
-                        for target, overwrite in channel.overwrites.items()
-                    }
-                }
-                for channel in guild.channels if channel.category is None
-            ],
-            'owner_id': guild.owner_id,
-            'owner': str(guild.owner),
-            'created_at': str(guild.created_at),
+            # Structure from the cached guild snapshot
+            **guild_template_view(guild),
             # All automod, timeout, color, and custom settings
             'automod_enabled': guild_settings.get("automod_enabled", True),
             'blocked_keywords': guild_settings.get("blocked_keywords", []),
@@ -2816,13 +5145,14 @@ async def restore_slash(interaction: nextcord.Interaction, backup_filename: str
         await interaction.followup.send("This command can only be used in a server.")
         return
 
-    # Default filename logic
+    # Default to the newest catalogued backup; a catalogued backup ID is also accepted
     if backup_filename is None or backup_filename.strip() == "":
-        backup_filename = f"discord_guild_backups/{guild.id}.json"
+        backup_filename = backup_engine.backup_path(guild.id) or f"discord_guild_backups/{guild.id}.json"
+    else:
+        backup_filename = backup_engine.backup_path(guild.id, backup_filename.strip().removesuffix('.json')) or backup_filename
 
     try:
-        with open(backup_filename, 'r', encoding='utf-8') as backup_file:
-            server_settings = json.load(backup_file)
+        server_settings = backup_engine.load(backup_filename)
     except FileNotFoundError:
         await interaction.followup.send(f"Backup file `{backup_filename}` not found. Please make sure a backup exists for this server.")
         return
@@ -2831,54 +5161,10 @@ async def restore_slash(interaction: nextcord.Interaction, backup_filename: str
         return
 
     try:
-        # Restore server name (optional, can be commented out if not desired)
-        if 'name' in server_settings:
-            await guild.edit(name=server_settings['name'])
-
-        # Restore roles
-        for role_data in server_settings.get('roles', []):
-            existing_role = nextcord.utils.get(guild.roles, name=role_data['name'])
-            if existing_role is None:
-                await guild.create_role(name=role_data['name'], permissions=nextcord.Permissions(role_data['permissions']))
-            else:
-                if not existing_role.managed:
-                    await existing_role.edit(permissions=nextcord.Permissions(role_data['permissions']))
-
-        # Restore categories and channels
-        for category_data in server_settings.get('categories', []):
-            existing_category = nextcord.utils.get(guild.categories, name=category_data['name'])
-            if existing_category is None:
-                category = await guild.create_category(name=category_data['name'])
-            else:
-                category = existing_category
-
-            # Restore channels within the category
-            for channel_data in category_data.get('channels', []):
-                existing_channel = nextcord.utils.get(category.channels, name=channel_data['name'])
-                if existing_channel is None:
-                    if channel_data['type'] == 'text':
-                        await category.create_text_channel(name=channel_data['name'], overwrites={
-                            guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                        })
-                    elif channel_data['type'] == 'voice':
-                        await category.create_voice_channel(name=channel_data['name'], overwrites={
-                            guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                        })
-
-        # Restore standalone channels (not in categories)
-        for channel_data in server_settings.get('channels', []):
-            existing_channel = nextcord.utils.get(guild.channels, name=channel_data['name'])
-            if existing_channel is None:
-                if channel_data['type'] == 'text':
-                    await guild.create_text_channel(name=channel_data['name'], overwrites={
-                        guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                    })
-                elif channel_data['type'] == 'voice':
-                    await guild.create_voice_channel(name=channel_data['name'], overwrites={
-                        guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                    })
-
-        await interaction.followup.send(f"✅ Server settings restored from `{backup_filename}`.")
+        # Only the differences between the backup and the guild are applied, as a job, so
+        # it is deduplicated with portal applies and resumed from its checkpoint after a restart
+        job, created = start_template_job(guild, server_settings, user_id=interaction.user.id)
+        await interaction.followup.send(job_started_message(job, created, f"Restoring `{backup_filename}`"))
     except Exception as e:
         await interaction.followup.send(f"An error occurred while restoring the backup: {e}")
 
@@ -2897,67 +5183,26 @@ async def use_template(interaction: nextcord.Interaction, template_name: str):
 
         # Load the template file
         with open(template_path, 'r') as template_file:
-            server_settings = json.load(template_file)
+            template_data = json.load(template_file)
 
         guild = interaction.guild
 
-        # Restore server name
-        await guild.edit(name=server_settings['name'])
-
-        # Restore roles
-        for role_data in server_settings.get('roles', []):
-            existing_role = nextcord.utils.get(guild.roles, name=role_data['name'])
-            if existing_role is None:
-                await guild.create_role(name=role_data['name'], permissions=nextcord.Permissions(role_data['permissions']))
-            else:
-                if not existing_role.managed:
-                    await existing_role.edit(permissions=nextcord.Permissions(role_data['permissions']))
-
-        # Restore categories and channels
-        for category_data in server_settings.get('categories', []):
-            existing_category = nextcord.utils.get(guild.categories, name=category_data['name'])
-            if existing_category is None:
-                category = await guild.create_category(name=category_data['name'])
-            else:
-                category = existing_category
-
-            # Restore channels within the category
-            for channel_data in category_data.get('channels', []):
-                existing_channel = nextcord.utils.get(category.channels, name=channel_data['name'])
-                if existing_channel is None:
-                    if channel_data['type'] == 'text':
-                        await category.create_text_channel(name=channel_data['name'], overwrites={
-                            guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                        })
-                    elif channel_data['type'] == 'voice':
-                        await category.create_voice_channel(name=channel_data['name'], overwrites={
-                            guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                        })
-
-        # Restore standalone channels (not in categories)
-        for channel_data in server_settings.get('channels', []):
-            existing_channel = nextcord.utils.get(guild.channels, name=channel_data['name'])
-            if existing_channel is None:
-                if channel_data['type'] == 'text':
-                    await guild.create_text_channel(name=channel_data['name'], overwrites={
-                        guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                    })
-                elif channel_data['type'] == 'voice':
-                    await guild.create_voice_channel(name=channel_data['name'], overwrites={
-                        guild.default_role: nextcord.PermissionOverwrite(**channel_data['permissions'])
-                    })
-
-        # Restore automod settings
-        guild_id = str(guild.id)
-        server_settings[guild_id] = {
-            "automod_enabled": server_settings.get("automod_enabled", True),
-            "blocked_keywords": server_settings.get("blocked_keywords", []),
-            "regex_patterns": server_settings.get("regex_patterns", []),
-        }
-        save_server_settings(server_settings)
+        # Only the differences between the template and the guild are applied, as a job
+        job, created = start_template_job(guild, template_data, user_id=interaction.user.id)
+        if not created:
+            await interaction.followup.send(job_started_message(job, created, "A template apply"))
+            return
 
-        logging.info(f"Server settings restored for guild {guild.name} (ID: {guild.id}) from template `{template_name}`.")
-        await interaction.followup.send(f"Server settings restored from template `{template_name}`.")
+        # Restore automod settings (validated on the way in)
+        update_guild_settings(guild.id, {
+            "automod_enabled": template_data.get("automod_enabled", True),
+            "blocked_keywords": template_data.get("blocked_keywords", []),
+            "regex_patterns": template_data.get("regex_patterns", []),
+        })
+        persist_settings_changes({str(guild.id): ["automod_enabled", "blocked_keywords", "regex_patterns"]})
+
+        logging.info(f"Restoring template `{template_name}` to guild {guild.name} (ID: {guild.id}) as job {job.id}.")
+        await interaction.followup.send(job_started_message(job, created, f"Restoring template `{template_name}`"))
     except Exception as e:
         logging.error(f"Error restoring template `{template_name}`: {e}")
         await interaction.followup.send(f"An error occurred while restoring the template: {e}")
@@ -3002,44 +5247,8 @@ async def create_template(interaction: nextcord.Interaction, template_name: str)
     await interaction.response.defer()  # Acknowledge the interaction immediately
 
     guild = interaction.guild
-    server_settings = {
-        'name': guild.name,
-        'id': guild.id,
-        'member_count': guild.member_count,
-        'roles': [{'name': role.name, 'permissions': role.permissions.value} for role in guild.roles if not role.managed],
-        'categories': [
-            {
-                'name': category.name,
-                'position': category.position,
-                'channels': [
-                    {
-                        'name': channel.name,
-                        'type': 'text' if isinstance(channel, nextcord.TextChannel) else 'voice',
-                        'position': channel.position,
-                        'permissions': {
-                            str(target.id): overwrite._values for target, overwrite in channel.overwrites.items() if hasattr(target, 'id')
-                        }
-                    }
-                    for channel in category.channels
-                ]
-            }
-            for category in guild.categories
-        ],
-        'channels': [
-            {
-                'name': channel.name,
-                'type': 'text' if isinstance(channel, nextcord.TextChannel) else 'voice',
-                'position': channel.position,
-                'permissions': {
-                    str(target.id): overwrite._values for target, overwrite in channel.overwrites.items() if hasattr(target, 'id')
-                }
-            }
-            for channel in guild.channels if channel.category is None
-        ],
-        'owner_id': guild.owner_id,
-        'owner': str(guild.owner),
-        'created_at': str(guild.created_at),
-    }
+    # Overwrites keyed by ID and positions included, from the cached guild snapshot
+    server_settings = guild_template_view(guild, overwrite_keys='id', positions=True)
 
     # Save the template to a file
     template_filename = f"{template_name}.json"
@@ -3155,9 +5364,7 @@ async def tempban(interaction: nextcord.Interaction, member: nextcord.Member, du
     guild_id = str(guild.id)
     # Permission check: admin, owner role, or allowed role name
     is_admin = author.guild_permissions.administrator
-    owner_role_id = None
-    if 'owner_roles' in globals():
-        owner_role_id = owner_roles.get(guild_id, {}).get('role_id')
+    owner_role_id = get_owner_role_id(guild_id)
     has_owner_role = owner_role_id and nextcord.utils.get(author.roles, id=int(owner_role_id))
     has_allowed_name = has_allowed_role_name(author)
     if not (is_admin or has_owner_role or has_allowed_name):
@@ -3204,7 +5411,6 @@ server_automod_states = {}
 async def create_templates_for_all(interaction: nextcord.Interaction):
     import os
     try:
-        server_settings = load_server_settings()
         templates_dir = "templates"
         os.makedirs(templates_dir, exist_ok=True)
         for guild_id, settings in server_settings.items():
@@ -3227,45 +5433,6 @@ SPAM_THRESHOLD = 5  # Number of messages allowed within the time window
 SPAM_TIME_WINDOW = 10  # Time window in seconds
 SPAM_TIMEOUT_DURATION = timedelta(minutes=5)  # Timeout duration for spamming
 
-SERVER_SETTINGS_FILE = "server_settings.json"
-
-def load_server_settings():
-    """Load server-specific settings from the JSON file."""
-    try:
-        with open(SERVER_SETTINGS_FILE, "r") as f:
-            data = json.load(f)
-        migrated = migrate_server_settings(data)
-        # If migration changed the structure, save it back
-        if migrated != data:
-            with open(SERVER_SETTINGS_FILE, "w") as f:
-                json.dump(migrated, f, indent=2)
-        return migrated
-    except FileNotFoundError:
-        logging.warning(f"{SERVER_SETTINGS_FILE} not found. Creating a new one.")
-        with open(SERVER_SETTINGS_FILE, "w") as f:
-            json.dump({}, f)
-        return {}
-
-def save_server_settings(settings):
-    """Save server-specific settings to the JSON file, cleaning circular references and fixing known field issues."""
-    try:
-        with open(SERVER_SETTINGS_FILE, "w") as f:
-            safe_json_dump(settings, f, indent=2)
-        # Automatically clean circular reference fields after every save
-        clean_server_settings_file()
-        logging.info("Server settings saved and cleaned successfully.")
-    except Exception as e:
-        logging.error(f"Error saving server settings: {e}")
-
-# Load server settings at startup
-server_settings = load_server_settings()
-
-# Ensure server_settings has a default structure
-for guild_id, settings in server_settings.items():
-    if isinstance(settings, dict):
-        if "members" not in settings:
-            settings["members"] = {}  # Add a members key if missing
-
 @app.route('/update_server_settings', methods=['POST'])
 def update_server_settings():
     """Update automod settings for a specific server, restricted to users with the Automod role."""
@@ -3282,49 +5449,62 @@ def update_server_settings():
         access_token = session.get('access_token')
         if not access_token:
             return False
-        headers = {'Authorization': f'Bearer {access_token}'}
-        # Get user's member info for the guild
-        import requests
-        member_url = f"https://discord.com/api/v10/users/@me/guilds/{guild_id}/member"
-        resp = requests.get(member_url, headers=headers)
-        if resp.status_code != 200:
-            return False
-        member = resp.json()
-        # Get guild roles
-        roles_url = f"https://discord.com/api/v10/guilds/{guild_id}/roles"
-        roles_resp = requests.get(roles_url, headers=headers)
-        if roles_resp.status_code != 200:
-            return False
-        all_roles = roles_resp.json()
-        role_id_to_name = {r['id']: r['name'] for r in all_roles}
-        # Check if any of the member's roles is named 'Automod' (case-insensitive)
-        for rid in member.get('roles', []):
-            if role_id_to_name.get(rid, '').lower() == 'automod':
-                return True
-        return False
+        # A role named 'Automod' (case-insensitive), answered from the gateway cache
+        return guild_authorizer.has_role(guild_id, discord_user['id'], role_name='automod', access_token=access_token)
 
     try:
         data = request.json
-        if not data or 'guild_id' not in data or 'settings' not in data:
-            return "Invalid or missing JSON payload. Expected {'guild_id': <id>, 'settings': {...}}.", 400
+        if not data or 'guild_id' not in data or not ('patch' in data or 'settings' in data):
+            return "Invalid or missing JSON payload. Expected {'guild_id': <id>, 'patch': {...}}.", 400
 
         guild_id = str(data['guild_id'])
-        new_settings = data['settings']
 
         # Restrict: Only allow users with Automod role
         if not user_has_automod_role(guild_id):
             return {"error": "Forbidden: You must have the Automod role in this server to change settings."}, 403
 
-        # Update the settings for the specified server
-        server_settings[guild_id] = new_settings
-        save_server_settings(server_settings)
-
-        logging.info(f"Updated settings for guild {guild_id}: {new_settings}")
-        return {"message": f"Settings for guild {guild_id} updated successfully."}, 200
+        return apply_settings_patch_request(guild_id, data)
     except Exception as e:
         logging.error(f"Error updating server settings: {e}")
         return {"error": f"An error occurred: {e}"}, 500
 
+def apply_settings_patch_request(guild_id, data):
+    """
+    Shared body of the /update_server_settings routes. data['patch'] is an RFC 7386 merge
+    patch for the guild's entry; the older data['settings'] object is applied the same
+    way, except that protected keys it echoes back (often stale members or messages) are
+    ignored rather than rejected. A version from If-Match or data['version'] makes the
+    update conditional (409 if it moved on). Only the changed keys are written, to the
+    settings journal.
+    """
+    legacy = 'patch' not in data
+    patch = data.get('settings') if legacy else data['patch']
+    if not isinstance(patch, dict):
+        return {"error": "The patch must be a JSON object."}, 400
+    if legacy:
+        patch = {key: value for key, value in patch.items() if key not in PATCH_PROTECTED_KEYS}
+    else:
+        protected = protected_patch_keys(server_settings.get(guild_id), patch)
+        if protected:
+            return {"error": f"Keys cannot be patched: {', '.join(protected)}"}, 400
+    expected = request.headers.get('If-Match', data.get('version'))
+    expected_versions = None
+    if expected is not None:
+        try:
+            expected_versions = {guild_id: int(str(expected).removeprefix('W/').strip('"'))}
+        except ValueError:
+            return {"error": "The expected version must be an integer."}, 400
+    try:
+        changed = patch_guilds_settings([(guild_id, patch)], expected_versions)
+    except SettingsVersionConflict as e:
+        return {"error": str(e), "version": e.version}, 409
+    persist_settings_changes(changed)
+    version = guild_settings_version(guild_id)
+    keys = sorted(changed.get(guild_id, ()))
+    logging.info(f"Patched settings for guild {guild_id}: {keys}")
+    return ({"message": f"Settings for guild {guild_id} updated successfully.", "version": version, "changed": keys},
+            200, {'ETag': f'"{version}"'})
+
 @app.route('/fix_bot_role_position', methods=['POST'])
 def fix_bot_role_position():
     """Fix the bot's role position in a specific server."""
@@ -3349,30 +5529,28 @@ def fix_bot_role_position():
             # Check if the bot's role is already at the top
             if bot_role.position == max(role.position for role in guild.roles):
                 logging.info(f"Bot's role '{bot_role.name}' is already at the top in guild {guild.name} (ID: {guild.id}).")
-                server_settings[str(guild.id)]["bot_role_top"] = True
-                save_server_settings(server_settings)
+                update_guild_settings(guild.id, {"bot_role_top": True})
+                persist_settings_changes({str(guild.id): ["bot_role_top"]})
                 return
 
             # Move the bot's role to the top
-            await bot_role.edit(position=max(role.position for role in guild.roles))
+            await move_bot_role_to_top(guild)
             logging.info(f"Bot's role '{bot_role.name}' moved to the top in guild {guild.name} (ID: {guild.id}).")
-            server_settings[str(guild.id)]["bot_role_top"] = True
-            save_server_settings(server_settings)
+            update_guild_settings(guild.id, {"bot_role_top": True})
+            persist_settings_changes({str(guild.id): ["bot_role_top"]})
 
         except Exception as e:
             logging.error(f"Error fixing bot role position for guild {guild_id}: {e}")
 
     try:
-        # Create and set an event loop in the current thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(fix_role_position())  # Run the coroutine
+        # The role edit must run on the bot's own loop, where its HTTP session lives
+        result = bot_bridge.call(fix_role_position())
+        if result:
+            return result
         return redirect(url_for('portal'))
     except Exception as e:
         logging.error(f"Error scheduling fix_bot_role_position: {e}")
         return f"An error occurred: {e}", 500
-    finally:
-        loop.close()  # Ensure the loop is closed after execution
 
 @app.route('/apply_default_automod_rules', methods=['POST'])
 def apply_default_automod_rules():
@@ -3383,10 +5561,12 @@ def apply_default_automod_rules():
 
     try:
         if guild_id in server_settings:
-            server_settings[guild_id]["automod_enabled"] = True
-            server_settings[guild_id]["blocked_keywords"] = automod_rules["blocked_keywords"]
-            server_settings[guild_id]["regex_patterns"] = automod_rules["regex_patterns"]
-            save_server_settings(server_settings)
+            update_guild_settings(guild_id, {
+                "automod_enabled": True,
+                "blocked_keywords": automod_rules["blocked_keywords"],
+                "regex_patterns": automod_rules["regex_patterns"],
+            })
+            persist_settings_changes({str(guild_id): ["automod_enabled", "blocked_keywords", "regex_patterns"]})
             logging.info(f"Default automod rules applied to guild {guild_id}.")
             return redirect(url_for('portal'))
         else:
@@ -3425,9 +5605,8 @@ def update_spam_settings():
         return render_template('back_to_portal.html', error=msg), 403
     try:
         if guild_id in server_settings:
-            server_settings[guild_id]["spam_threshold"] = spam_threshold
-            server_settings[guild_id]["spam_time_window"] = spam_time_window
-            save_server_settings(server_settings)
+            update_guild_settings(guild_id, {"spam_threshold": spam_threshold, "spam_time_window": spam_time_window})
+            persist_settings_changes({str(guild_id): ["spam_threshold", "spam_time_window"]})
             logging.info(f"Spam settings updated for guild {guild_id}: threshold={spam_threshold}, time_window={spam_time_window}")
             logging.info("[SUMMARY] Spam settings update succeeded. Session was valid. If you ever get redirected to login again, your session likely expired—just log in again to continue.")
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.accept_mimetypes['application/json']:
@@ -3468,13 +5647,8 @@ def toggle_timeout():
 
     try:
         if guild_id in server_settings:
-            if "members" not in server_settings[guild_id]:
-                server_settings[guild_id]["members"] = {}
-            if user_id not in server_settings[guild_id]["members"]:
-                server_settings[guild_id]["members"][user_id] = {}
-
-            server_settings[guild_id]["members"][user_id]["timeout_enabled"] = timeout_enabled
-            save_server_settings(server_settings)
+            update_member_settings(guild_id, user_id, {"timeout_enabled": timeout_enabled})
+            persist_settings_changes({str(guild_id): ["members"]})
             logging.info(f"Timeout for user {user_id} in guild {guild_id} set to {'enabled' if timeout_enabled else 'disabled'}.")
             return redirect(url_for('portal'))
         else:
@@ -3502,8 +5676,8 @@ def update_timeout_duration():
 
     try:
         if guild_id in server_settings:
-            server_settings[guild_id]["timeout_duration"] = timeout_duration
-            save_server_settings(server_settings)
+            update_guild_settings(guild_id, {"timeout_duration": timeout_duration})
+            persist_settings_changes({str(guild_id): ["timeout_duration"]})
             logging.info(f"Timeout duration for guild {guild_id} updated to {timeout_duration} seconds.")
             return redirect(url_for('portal'))
         else:
@@ -3512,12 +5686,52 @@ def update_timeout_duration():
         logging.error(f"Error updating timeout duration for guild {guild_id}: {e}")
         return f"An error occurred: {e}", 500
 
+# Compiled automod rules per guild; dropped when the guild's automod settings or the
+# global automod_rules (published with guild_id None) change
+_automod_rulesets = {}
+_AUTOMOD_RULE_KEYS = frozenset(("automod_enabled", "blocked_keywords", "regex_patterns"))
+
+@on_settings_changed
+def _drop_automod_ruleset(guild_id, keys):
+    if keys is not None and not keys & _AUTOMOD_RULE_KEYS:
+        return
+    if guild_id is None:
+        # Any guild may fall back to the global rules
+        _automod_rulesets.clear()
+    else:
+        _automod_rulesets.pop(guild_id, None)
+
+def get_automod_ruleset(guild_id):
+    """
+    Return (automod_enabled, [(keyword, lowered keyword)], [compiled regex]) for a guild,
+    built from server_settings once and reused until the settings change.
+    """
+    ruleset = _automod_rulesets.get(guild_id)
+    if ruleset is not None:
+        return ruleset
+    guild_settings = server_settings.get(guild_id)
+    if isinstance(guild_settings, dict):
+        automod_enabled = guild_settings.get("automod_enabled", True)
+        blocked_keywords = guild_settings.get("blocked_keywords", automod_rules["blocked_keywords"])
+        regex_patterns = guild_settings.get("regex_patterns", automod_rules["regex_patterns"])
+    else:
+        automod_enabled = True  # Default to enabled if no settings exist
+        blocked_keywords = automod_rules["blocked_keywords"]
+        regex_patterns = automod_rules["regex_patterns"]
+    compiled = []
+    for pattern in regex_patterns:
+        try:
+            compiled.append(re.compile(pattern))
+        except re.error as e:
+            logging.warning(f"Skipping invalid regex pattern {pattern!r} for guild {guild_id}: {e}")
+    ruleset = (automod_enabled, [(keyword, keyword.lower()) for keyword in blocked_keywords], compiled)
+    _automod_rulesets[guild_id] = ruleset
+    return ruleset
+
 @bot.event
 async def on_message(message):
     """Handle messages, detect spam, and apply automod rules dynamically per user."""
     global last_message_time
-    global server_settings
-    server_settings = load_server_settings()
     reason = None  # Ensure 'reason' is always defined
 
     # Ignore messages from the bot itself
@@ -3529,21 +5743,10 @@ async def on_message(message):
     if not message.guild:
         print("Guild object: None (message in DM)")
         return
-    if guild_id and guild_id in server_settings:
-        guild_settings = server_settings[guild_id]
-        # Ensure guild_settings is a dict
-        if not isinstance(guild_settings, dict):
-            logging.warning(f"Guild settings for {guild_id} corrupted or not a dict. Resetting.")
-            guild_settings = {}
-            server_settings[guild_id] = guild_settings
-            save_server_settings(server_settings)
-        automod_enabled = guild_settings.get("automod_enabled", True)
-        blocked_keywords = guild_settings.get("blocked_keywords", automod_rules["blocked_keywords"])
-        regex_patterns = guild_settings.get("regex_patterns", automod_rules["regex_patterns"])
-    else:
-        automod_enabled = True  # Default to enabled if no settings exist
-        blocked_keywords = automod_rules["blocked_keywords"]
-        regex_patterns = automod_rules["regex_patterns"]
+    guild_settings = server_settings.get(guild_id)
+    if not isinstance(guild_settings, dict):
+        guild_settings = {}
+    automod_enabled, blocked_keywords, regex_patterns = get_automod_ruleset(guild_id)
 
     # Skip automod checks if disabled for the server
     if not automod_enabled:
@@ -3607,12 +5810,13 @@ async def on_message(message):
     message_blocked = False
 
     # Check for regex patterns
-    if any(re.search(pattern, message.content) for pattern in regex_patterns):
+    if any(pattern.search(message.content) for pattern in regex_patterns):
         message_blocked = True
         reason = "inappropriate content (regex)"
 
     # Check for blocked keywords
-    blocked_words = [keyword for keyword in blocked_keywords if keyword.lower() in message.content.lower()]
+    content_lower = message.content.lower()
+    blocked_words = [keyword for keyword, lowered in blocked_keywords if lowered in content_lower]
     if blocked_words:
         message_blocked = True
         reason = "prohibited keywords"
@@ -3646,6 +5850,7 @@ async def on_message(message):
         try:
             await message.delete()
             logging.info(f"Blocked message ({reason}) from {message.author}: {message.content}")
+            guild_events.publish('automod_block', guild_id, {'author': str(message.author), 'reason': reason})
             await message.channel.send(
                 f"{message.author.mention}, your message was blocked due to {reason}.",
                 delete_after=5
@@ -3709,27 +5914,14 @@ async def on_message(message):
     # Store latest message content per guild (existing logic)
     if message.guild:
         guild_id = str(message.guild.id)
-        if guild_id not in server_settings:
-            server_settings[guild_id] = {}
-        server_settings[guild_id]['latest_message'] = {
-            'author': str(message.author),
-            'content': message.content,
-            'timestamp': datetime.utcnow().isoformat()
-        }
+        # Defensive: ensure author/content are strings (prevents circular refs)
         msg = {
             'author': str(message.author),
             'content': str(message.content),
             'timestamp': datetime.utcnow().isoformat()
         }
-        if 'messages' not in server_settings[guild_id]:
-            server_settings[guild_id]['messages'] = []
-        # Defensive: ensure author/content are strings (prevents circular refs)
-        msg['author'] = str(msg.get('author', ''))
-        msg['content'] = str(msg.get('content', ''))
-        server_settings[guild_id]['messages'].append(msg)
-        if len(server_settings[guild_id]['messages']) > 50:
-            server_settings[guild_id]['messages'] = server_settings[guild_id]['messages'][-50:]
-        save_server_settings(server_settings)
+        record_guild_message(guild_id, msg)
+        persist_settings_changes({str(guild_id): ["latest_message", "messages"]})
 
         # --- Persistent logging for portal ---
         logs_dir = os.path.join(os.getcwd(), "logs")
@@ -3782,8 +5974,10 @@ def get_server_settings(guild_id):
         return redirect(url_for('login'))
 
     try:
-        settings = load_server_settings().get(guild_id, {})
-        return {"guild_id": guild_id, "settings": settings}, 200
+        settings = server_settings.get(guild_id, {})
+        version = guild_settings_version(guild_id)
+        # The version (also sent as the ETag) makes a later patch conditional via If-Match
+        return {"guild_id": guild_id, "settings": settings, "version": version}, 200, {'ETag': f'"{version}"'}
     except Exception as e:
         logging.error(f"Error retrieving settings for guild {guild_id}: {e}")
         return {"error": f"An error occurred: {e}"}, 500
@@ -3793,18 +5987,12 @@ BASE_URL = "https://give-me-3.onrender.com/templates"
 @app.route('/fetch_template/<template_name>', methods=['GET'])
 def fetch_template(template_name):
     """Fetch a template from the base_url and save it locally."""
-    async def fetch():
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{BASE_URL}/{template_name}.json") as response:
-                template_data = await response.json()
-                text = await response.text()
-                return response.status, template_data, text
     try:
         if bot_loop is None:
             logging.error("Bot loop is not ready yet!")
             return None
-        future = asyncio.run_coroutine_threadsafe(fetch(), bot_loop)
-        status, template_data, text = future.result()
+        # Not a Discord URL, but it still shares the pooled session
+        status, template_data, text = discord_api('GET', f"{BASE_URL}/{template_name}.json")
         if status == 200:
             template_path = os.path.join(TEMPLATES_DIR, f"{template_name}.json")
             with open(template_path, 'w') as template_file:
@@ -3837,15 +6025,7 @@ def block_messages():
 
     try:
         # Fetch the user's guilds from Discord API
-        access_token = session.get('access_token')
-        headers = {'Authorization': f'Bearer {access_token}'}
-        async def fetch_guilds():
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers) as response:
-                    guilds = await response.json()
-                    text = await response.text()
-                    return response.status, guilds, text
-        status, user_guilds, text = asyncio.run(fetch_guilds())
+        status, user_guilds, text = get_user_guilds()
 
         if status != 200:
             logging.error(f"Failed to fetch guilds: {text}")
@@ -3888,6 +6068,7 @@ def update_automod():
         # Update automod rules dynamically
         global automod_rules
         automod_rules.update(new_settings)
+        publish_settings_change(None, new_settings.keys())
         logging.info(f"Automod settings updated: {new_settings}")
         return "Automod settings updated successfully.", 200
     except Exception as e:
@@ -3918,7 +6099,10 @@ if __name__ == "__main__":
     flask_thread = threading.Thread(target=run_flask)
     flask_thread.start()
     # Start the Discord bot (blocking, manages its own event loop)
-    bot.run(DISCORD_TOKEN)
+    try:
+        bot.run(DISCORD_TOKEN)
+    finally:
+        stop_flask()
 
 @bot.command()
 @commands.has_permissions(administrator=True)
@@ -3948,10 +6132,7 @@ async def set_owner_role(ctx, role: nextcord.Role, target: str = "server"):
             save_owner_roles(owner_roles)
 
             # Update the owner information in server_settings
-            if guild_id not in server_settings:
-                server_settings[guild_id] = {}
-            server_settings[guild_id]["owner_id"] = guild.owner.id
-            server_settings[guild_id]["owner_name"] = guild.owner.name
+            update_guild_settings(guild_id, {"owner_id": guild.owner.id, "owner_name": guild.owner.name})
             save_server_settings(server_settings)
 
             await ctx.send(f"The owner role has been set to {role.name} for all members in the server.")
@@ -3977,8 +6158,8 @@ async def set_owner_role(ctx, role: nextcord.Role, target: str = "server"):
 
         # Ensure the bot's role is always on top
         bot_role = bot_member.top_role
-        await bot_role.edit(position=guild.roles[-1].position)
-        logging.info(f"Bot's role '{bot_role.name}' moved to the top.")
+        if await move_bot_role_to_top(guild):
+            logging.info(f"Bot's role '{bot_role.name}' moved to the top.")
     except Exception as e:
         logging.error(f"Error setting owner role: {e}")
         await ctx.send(f"An error occurred while setting the owner role: {e}")
@@ -3992,26 +6173,20 @@ async def on_member_update(before, after):
         member_id = str(after.id)
 
         # Check if the member has the owner role
-        owner_role_id = owner_roles.get(guild_id, {}).get("role_id")
+        owner_role_id = get_owner_role_id(guild_id)
         if owner_role_id and owner_role_id in [role.id for role in after.roles]:
             logging.info(f"Member {after.name} (ID: {after.id}) has the owner role in guild {after.guild.name} (ID: {after.guild.id}).")
 
-        # Ensure the guild and member exist in server_settings
-        if guild_id not in server_settings:
-            server_settings[guild_id] = {"members": {}}
-        if "members" not in server_settings[guild_id]:
-            server_settings[guild_id]["members"] = {}
-        member_id = str(after.id)  # Define member_id
-        member_id = str(after.id)  # Define member_id
-        member_id = str(after.id)  # Define member_id
-        member_id = str(after.id)  # Define member_id
-        if member_id not in server_settings[guild_id]["members"]:
-            server_settings[guild_id]["members"][member_id] = {}
-
-        # Update member-specific settings
-        server_settings[guild_id]["members"][member_id]["roles"] = [role.id for role in after.roles]
-        server_settings[guild_id]["members"][member_id]["nickname"] = after.nick
-        server_settings[guild_id]["members"][member_id]["status"] = str(after.status)
+        guild_authorizer.invalidate(guild_id, member_id)
+        if before.roles != after.roles:
+            portal_state.bump(guild_id)  # owner-role flags on the portal
+
+        # Update member-specific settings (creates the guild and member entries if missing)
+        update_member_settings(guild_id, member_id, {
+            "roles": [role.id for role in after.roles],
+            "nickname": after.nick,
+            "status": str(after.status),
+        })
 
         # Save the updated settings
         save_server_settings(server_settings)
@@ -4041,44 +6216,6 @@ async def member_info(ctx, member: nextcord.Member):
     else:
         await ctx.send(f"No data found for member {member.name}.")
 
-OWNER_ROLES_FILE = "owner_roles.json"
-
-def load_owner_roles():
-    """Load owner roles from the JSON file."""
-    try:
-        with open(OWNER_ROLES_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logging.warning(f"{OWNER_ROLES_FILE} not found. Creating a new one.")
-        with open(OWNER_ROLES_FILE, "w") as f:
-            json.dump({}, f)
-        return {}
-
-def save_owner_roles(owner_roles):
-    """Save owner roles and additional settings to the JSON file."""
-    try:
-        # Add additional settings to the owner roles structure
-        for guild_id, data in owner_roles.items():
-            if "additional_settings" not in data:
-                data["additional_settings"] = {
-                    "automod_enabled": False,
-                    "blocked_keywords": [],
-                    "regex_patterns": [],
-                    "permissions": {
-                        "manage_roles": True,
-                        "manage_channels": True
-                    }
-                }
-
-        # Save the updated owner roles to the JSON file
-        with open(OWNER_ROLES_FILE, "w") as f:
-            json.dump(owner_roles, f, indent=2)
-        logging.info("Owner roles and settings saved successfully.")
-    except Exception as e:
-        logging.error(f"Error saving owner roles: {e}")
-
-# Load owner roles at startup
-owner_roles = load_owner_roles()
 
 @bot.command()
 @commands.has_permissions(administrator=True)
@@ -4140,8 +6277,8 @@ async def set_owner_role(ctx, role: nextcord.Role, target: str = "server"):
             await ctx.send("This command can only be used in a server.")
             print("Guild object: None (command used in DM)")
             return
-        await bot_role.edit(position=ctx.guild.roles[-1].position)
-        logging.info(f"Bot's role '{bot_role.name}' moved to the top.")
+        if await move_bot_role_to_top(ctx.guild):
+            logging.info(f"Bot's role '{bot_role.name}' moved to the top.")
     except Exception as e:
         logging.error(f"Error setting owner role: {e}")
         await ctx.send(f"An error occurred while setting the owner role: {e}")
@@ -4154,22 +6291,20 @@ async def on_member_update(before, after):
         member_id = str(after.id)
 
         # Check if the member has the owner role
-        owner_role_id = owner_roles.get(guild_id, {}).get("role_id")
+        owner_role_id = get_owner_role_id(guild_id)
         if owner_role_id and owner_role_id in [role.id for role in after.roles]:
             logging.info(f"Member {after.name} (ID: {after.id}) has the owner role in guild {after.guild.name} (ID: {after.guild.id}).")
 
-        # Ensure the guild and member exist in server_settings
-        if guild_id not in server_settings:
-            server_settings[guild_id] = {"members": {}}
-        if "members" not in server_settings[guild_id]:
-            server_settings[guild_id]["members"] = {}
-        if member_id not in server_settings[guild_id]["members"]:
-            server_settings[guild_id]["members"][member_id] = {}
+        guild_authorizer.invalidate(guild_id, member_id)
+        if before.roles != after.roles:
+            portal_state.bump(guild_id)  # owner-role flags on the portal
 
-        # Update member-specific settings
-        server_settings[guild_id]["members"][member_id]["roles"] = [role.id for role in after.roles]
-        server_settings[guild_id]["members"][member_id]["nickname"] = after.nick
-        server_settings[guild_id]["members"][member_id]["status"] = str(after.status)
+        # Update member-specific settings (creates the guild and member entries if missing)
+        update_member_settings(guild_id, member_id, {
+            "roles": [role.id for role in after.roles],
+            "nickname": after.nick,
+            "status": str(after.status),
+        })
 
         # Save the updated settings
         save_server_settings(server_settings)
@@ -4203,12 +6338,12 @@ def get_or_create_server_settings(guild_id):
 
         if guild_id not in server_settings:
             # Create default settings if they don't exist
-            server_settings[guild_id] = {
+            update_guild_settings(guild_id, {
                 "owner_id": owner_id,
                 "automod_enabled": False,
                 "blocked_keywords": [],
                 "regex_patterns": [],
-            }
+            })
             save_server_settings(server_settings)
             logging.info(f"Default settings created for guild {guild_id} with owner {owner_id}.")
 
@@ -4231,11 +6366,10 @@ def update_server_settings():
 
     try:
         data = request.json
-        if not data or 'guild_id' not in data or 'settings' not in data:
-            return "Invalid or missing JSON payload. Expected {'guild_id': <id>, 'settings': {...}}.", 400
+        if not data or 'guild_id' not in data or not ('patch' in data or 'settings' in data):
+            return "Invalid or missing JSON payload. Expected {'guild_id': <id>, 'patch': {...}}.", 400
 
         guild_id = str(data['guild_id'])
-        new_settings = data['settings']
 
         # Ensure the settings are tied to the correct owner
         owner_id = get_server_owner(guild_id)
@@ -4243,13 +6377,10 @@ def update_server_settings():
             return f"Unable to fetch owner for guild {guild_id}.", 404
 
         if guild_id not in server_settings:
-            server_settings[guild_id] = {"owner_id": owner_id}
-
-        server_settings[guild_id].update(new_settings)
-        save_server_settings(server_settings)
+            update_guild_settings(guild_id, {"owner_id": owner_id})
+            save_server_settings(server_settings)
 
-        logging.info(f"Updated settings for guild {guild_id} with owner {owner_id}: {new_settings}")
-        return {"message": f"Settings for guild {guild_id} updated successfully."}, 200
+        return apply_settings_patch_request(guild_id, data)
     except Exception as e:
         logging.error(f"Error updating server settings: {e}")
         return {"error": f"An error occurred: {e}"}, 500
@@ -4275,7 +6406,6 @@ def get_owner_settings(guild_id):
             return f"Settings for guild {guild_id} do not match the owner.", 403
 
         # Hide owner_id in API response if privacy is enabled
-        global_server_settings = load_server_settings()
         owner_id_to_return = "Hidden"
         return {"guild_id": guild_id, "owner_id": owner_id_to_return, "settings": settings}, 200
     except Exception as e:
@@ -4293,26 +6423,20 @@ async def set_portal_settings(ctx, setting: str, *args):
     try:
         guild_id = str(ctx.guild.id)
 
-        if guild_id not in server_settings:
-            server_settings[guild_id] = {}
-
         if setting.lower() == "automod":
             value = args[0].lower() == "enabled"
-            server_settings[guild_id]["automod_enabled"] = value
+            update_guild_settings(guild_id, {"automod_enabled": value})
             await ctx.send(f"Automod has been {'enabled' if value else 'disabled'} for this server.")
         elif setting.lower() == "blocked_keywords":
-            keywords = list(args)
-            server_settings[guild_id]["blocked_keywords"] = keywords
+            keywords = update_guild_settings(guild_id, {"blocked_keywords": list(args)})["blocked_keywords"]
             await ctx.send(f"Blocked keywords updated: {', '.join(keywords)}")
         elif setting.lower() == "regex_patterns":
-            patterns = list(args)
-            server_settings[guild_id]["regex_patterns"] = patterns
+            patterns = update_guild_settings(guild_id, {"regex_patterns": list(args)})["regex_patterns"]
             await ctx.send(f"Regex patterns updated: {', '.join(patterns)}")
         elif setting.lower() == "spam_settings":
             spam_threshold = int(args[0])
             spam_time_window = int(args[1])
-            server_settings[guild_id]["spam_threshold"] = spam_threshold
-            server_settings[guild_id]["spam_time_window"] = spam_time_window
+            update_guild_settings(guild_id, {"spam_threshold": spam_threshold, "spam_time_window": spam_time_window})
             await ctx.send(f"Spam settings updated: Threshold={spam_threshold}, Time Window={spam_time_window}s")
         else:
             await ctx.send("Invalid setting. Available settings: automod, blocked_keywords, regex_patterns, spam_settings.")
@@ -4323,343 +6447,6 @@ async def set_portal_settings(ctx, setting: str, *args):
         logging.error(f"Error setting portal settings: {e}")
         await ctx.send(f"An error occurred: {e}")
 
-@app.route('/portal')
-def portal():
-    # Always reload server_settings and owner_roles from disk at the start of each request
-    server_settings = load_server_settings()
-    owner_roles = load_owner_roles()
-    """Display the portal page with the list of servers and their settings."""
-    if 'access_token' not in session:
-        return redirect(url_for('login'))
-
-    # Always fetch the Discord user after checking for access_token, before try block
-    discord_user = get_discord_user()
-    if not discord_user:
-        return redirect(url_for('login'))
-
-    try:
-        # Fetch the authenticated user's guilds
-        access_token = session.get('access_token')
-        headers = {'Authorization': f'Bearer {access_token}'}
-        # Fetch the authenticated user's guilds asynchronously using aiohttp
-        async def fetch_guilds():
-            async with aiohttp.ClientSession() as session_http:
-                async with session_http.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers) as response:
-                    guilds_json = await response.json()
-                    text = await response.text()
-                    return response.status, guilds_json, text
-        if bot_loop is None:
-            logging.error("Bot loop is not ready yet!")
-            return "Bot is not ready. Please try again in a moment.", 503
-        status, user_guilds, text = asyncio.run_coroutine_threadsafe(fetch_guilds(), bot_loop).result()
-
-        if status != 200:
-            logging.error(f"Failed to fetch user's guilds. Response: {text}")
-            return render_template('error.html', message="Failed to fetch your guilds. Please try logging in again.")
-
-        # Log all user guilds
-        logging.info("User's guilds fetched from Discord API:")
-        for guild in user_guilds:
-            logging.info(f"Guild Name: {guild['name']}, Guild ID: {guild['id']}")
-
-        # Ensure default settings for all guilds the bot is in
-        for guild in bot.guilds:
-            guild_id = str(guild.id)
-            if guild_id not in server_settings:
-                server_settings[guild_id] = {
-                    "automod_enabled": True,
-                    "blocked_keywords": [],
-                    "regex_patterns": [],
-                    "spam_threshold": 5,
-                    "spam_time_window": 10,
-                    "owner_id": (getattr(guild, 'owner', None).id if getattr(guild, 'owner', None) else None),
-                    "owner_name": (getattr(guild, 'owner', None).name if getattr(guild, 'owner', None) else "Unknown"),
-                }
-
-        # Save updated settings to ensure persistence
-        save_server_settings(server_settings)
-
-        # Update stored memory of roles, guild IDs, and owner settings
-        for guild in bot.guilds:
-            guild_id = str(guild.id)
-            if guild_id not in server_settings:
-                server_settings[guild_id] = {
-                    "automod_enabled": True,
-                    "blocked_keywords": [],
-                    "regex_patterns": [],
-                    "spam_threshold": 5,
-                    "spam_time_window": 10,
-                }
-            if guild_id not in owner_roles:
-                owner_roles[guild_id] = {"type": "server", "role_id": None}
-            if "owner_id" not in server_settings[guild_id]:
-                server_settings[guild_id]["owner_id"] = (getattr(guild, 'owner', None).id if getattr(guild, 'owner', None) else None)
-                server_settings[guild_id]["owner_name"] = (getattr(guild, 'owner', None).name if getattr(guild, 'owner', None) else "Unknown")
-
-        # Save updated settings
-        save_server_settings(server_settings)
-        save_owner_roles(owner_roles)
-
-        # Log server settings for debugging
-        logging.info("Current server settings:")
-        for guild_id, settings in server_settings.items():
-            logging.info(f"Guild ID: {guild_id}, Settings: {settings}")
-
-        # Separate guilds into those the bot is in and those it can be added to
-        bot_guild_ids = {str(guild.id) for guild in bot.guilds}
-        user_guilds_with_permissions = []
-
-        for guild in user_guilds:
-            guild_id = guild.get('id')
-            if not guild_id:
-                continue  # Skip invalid guild data
-            if guild_id not in bot_guild_ids and guild.get('permissions', 0) & 0x20:  # Check for 'Manage Server' permission
-                user_guilds_with_permissions.append({
-                    'id': guild_id,
-                    'name': guild.get('name', 'Unknown'),
-                    'icon': guild.get('icon', None),
-                    'owner_role': owner_roles.get(guild_id, {}).get("role_name", f"Role ID: {owner_roles.get(guild_id, {}).get('role_id', 'Unknown')}")
-                })
-
-        # Get the list of guilds the bot is already in
-        bot_guilds = []
-        for guild in bot.guilds:
-            guild_id = str(guild.id)
-            settings = server_settings.get(guild_id, {"automod_enabled": False})
-            owner_role_name = owner_roles.get(guild_id, {}).get("role_name", None)
-
-            # Always ensure automod_enabled is present and True by default in the guild dict
-            automod_enabled = settings.get("automod_enabled", True)
-
-            bot_guilds.append({
-                'id': guild.id,
-                'name': guild.name,
-                'owner_name': (getattr(guild, 'owner', None).name if getattr(guild, 'owner', None) else "Unknown"),
-                'owner_id': guild.owner.id if guild.owner else "Unknown",
-                'owner_role_name': owner_role_name,
-                'automod_enabled': automod_enabled,
-                'blocked_keywords': settings.get("blocked_keywords", []),
-                'regex_patterns': settings.get("regex_patterns", []),
-                'spam_threshold': settings.get("spam_threshold", 5),
-                'spam_time_window': settings.get("spam_time_window", 10),
-                'bot_role_top': settings.get("bot_role_top", False),
-            })
-
-        # Include all logged guilds from server_settings
-        logged_guilds = []
-        for guild_id, settings in server_settings.items():
-            if guild_id not in bot_guild_ids:  # Include guilds the bot is no longer in
-                logged_guilds.append({
-                    'id': guild_id,
-                    'name': settings.get("name", "Unknown"),
-                    'owner_name': settings.get("owner_name", "Unknown"),
-                    'owner_id': settings.get("owner_id", "Unknown"),
-                    'owner_role_name': settings.get("owner_role_name", "Unknown"),
-                    'automod_enabled': settings.get("automod_enabled", True),
-                    'blocked_keywords': settings.get("blocked_keywords", []),
-                    'regex_patterns': settings.get("regex_patterns", []),
-                    'spam_threshold': settings.get("spam_threshold", 5),
-                    'spam_time_window': settings.get("spam_time_window", 10),
-                    'bot_role_top': settings.get("bot_role_top", False),
-                    'latest_message': settings.get('latest_message', {'author': '', 'content': '', 'timestamp': ''}),
-                })
-
-        # Fetch the Discord user
-        discord_user = get_discord_user()
-        if not discord_user:
-            return redirect(url_for('login'))
-
-        # Identify guilds the user is in but does not own (among bot_guilds)
-        user_id = str(discord_user['id']) if discord_user and 'id' in discord_user else None
-        guilds_user_in_not_owner = []
-        if user_id:
-            for guild in bot_guilds:
-                if str(guild.get('owner_id')) != user_id:
-                    # Check if user is a member of the guild (from user_guilds)
-                    if any(g['id'] == str(guild['id']) for g in user_guilds):
-                        guilds_user_in_not_owner.append(guild)
-
-        return render_template(
-            'portal.html',
-            bot_guilds=bot_guilds,
-            logged_guilds=logged_guilds,
-            user_guilds_with_permissions=user_guilds_with_permissions,
-            discord_user=discord_user,
-            server_settings=server_settings,  # Pass server_settings to the template
-            guilds_user_in_not_owner=guilds_user_in_not_owner
-        )
-    except Exception as e:
-        import traceback
-        logging.error(f"Error loading portal: {e}\n{traceback.format_exc()}")
-        return render_template('error.html', message="An unexpected error occurred. Please try again later.")
-
-@app.route('/portal')
-def portal():
-    # Always reload server_settings and hide owner ID for every guild for privacy
-    global server_settings
-    server_settings = load_server_settings()
-    
-    """Display the portal page with the list of servers and their settings."""
-    if 'access_token' not in session:
-        return redirect(url_for('login'))
-
-    # Always fetch the Discord user after checking for access_token, before try block
-    discord_user = get_discord_user()
-    if not discord_user:
-        return redirect(url_for('login'))
-
-    try:
-        # Fetch the authenticated user's guilds
-        access_token = session.get('access_token')
-        headers = {'Authorization': f'Bearer {access_token}'}
-        async def fetch_guilds():
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers) as response:
-                    guilds_json = await response.json()
-                    text = await response.text()
-                    return response.status, guilds_json, text
-        status, user_guilds, text = asyncio.run(fetch_guilds())
-
-        if status != 200:
-            logging.error(f"Failed to fetch user's guilds. Response: {text}")
-            return render_template('error.html', message="Failed to fetch your guilds. Please try logging in again.")
-
-    except Exception as e:
-        logging.error(f"Error fetching user's guilds: {e}")
-        return render_template('error.html', message="An unexpected error occurred. Please try again later.")
-    
-    # Get the list of guilds the bot is already in
-    bot_guild_ids = [guild.id for guild in bot.guilds]
-    for guild in user_guilds:
-        if guild['id'] in bot_guild_ids:memory_cache = {}
-            # Perform some action with the guild data
-        logging.info(f"Guild ID: {guild['id']}, Guild Name: {guild['name']}")
-        # Get guild data from memory_cache or create default entry if not exists
-        guild_data = memory_cache.get(guild_id, {})
-        if guild_id not in memory_cache:
-            memory_cache[guild_id] = guild_data
-
-
-
-    # Ensure all required settings exist with defaults
-    if "name" not in guild_data:
-        guild_data["name"] = "Unknown Guild"
-    if "owner_name" not in guild_data:
-        guild_data["owner_name"] = "Unknown"
-    if "owner_id" not in guild_data:
-        guild_data["owner_id"] = "Unknown"
-    if "automod_enabled" not in guild_data:
-        guild_data["automod_enabled"] = False# Load owner roles and server settings
-        owner_roles = load_owner_roles()
-        logging.info("Owner roles loaded: {}".format(owner_roles))
-            
-    if "timeout_enabled" not in guild_data:
-        guild_data["timeout_enabled"] = False
-    if "blocked_keywords" not in guild_data:
-        guild_data["blocked_keywords"] = []
-    if "regex_patterns" not in guild_data:
-        guild_data["regex_patterns"] = []
-    if "spam_threshold" not in guild_data:
-        guild_data["spam_threshold"] = 5
-    if "spam_time_window" not in guild_data:
-        guild_data["spam_time_window"] = 10
-    if "bot_role_top" not in guild_data:
-        guild_data["bot_role_top"] = False
-    if "warning_threshold" not in guild_data:
-        guild_data["warning_threshold"] = 3
-    if "timeout_threshold" not in guild_data:
-        guild_data["timeout_threshold"] = 5
-    if "ban_threshold" not in guild_data:
-        guild_data["ban_threshold"] = 10
-    if "warning_window" not in guild_data:
-        guild_data["warning_window"] = 5
-    if "timeout_window" not in guild_data:
-        guild_data["timeout_window"] = 10
-    if "ban_window" not in guild_data:
-        guild_data["ban_window"] = 30
-    if "timeout_duration" not in guild_data:
-        guild_data["timeout_duration"] = "10 minutes"
-    if "timeout_message" not in guild_data:
-        guild_data["timeout_message"] = "Your message violated our rules."
-    
-        # Add to bot_guilds list with complete settings
-        bot_guilds.append({
-            'id': guild_id,
-            'name': guild_data["name"],
-            'owner_name': guild_data["owner_name"],
-            'owner_id': guild_data["owner_id"],
-            'automod_enabled': guild_data["automod_enabled"],
-            'timeout_enabled': guild_data["timeout_enabled"],
-            'blocked_keywords': guild_data["blocked_keywords"],
-            'regex_patterns': guild_data["regex_patterns"],
-            'spam_threshold': guild_data["spam_threshold"],
-            'spam_time_window': guild_data["spam_time_window"],
-            'bot_role_top': guild_data["bot_role_top"],
-            'warning_threshold': guild_data["warning_threshold"],
-            'timeout_threshold': guild_data["timeout_threshold"],
-            'ban_threshold': guild_data["ban_threshold"],
-            'warning_window': guild_data["warning_window"],
-            'timeout_window': guild_data["timeout_window"],
-            'ban_window': guild_data["ban_window"],
-            'timeout_duration': guild_data["timeout_duration"],
-            'timeout_message': guild_data["timeout_message"]
-        })
-    
-        # Save updated settings to ensure persistence
-        save_server_settings(server_settings)
-
-        # Separate guilds into those the bot is in and those it can be added to
-        bot_guild_ids = {str(guild.id) for guild in bot.guilds}
-        user_guilds_with_permissions = []
-
-        for guild in user_guilds:
-            guild_id = guild.get('id')
-            if not guild_id:
-                continue
-            if guild_id not in bot_guild_ids and guild.get('permissions', 0) & 0x20:  # Check for 'Manage Server' permission
-                owner_role = owner_roles.get(guild_id, {}).get("role_name", f"Role ID: {owner_roles.get(guild_id, {}).get('role_id', 'Unknown')}")
-                user_guilds_with_permissions.append({
-                    'id': guild_id,
-                    'name': guild.get('name', 'Unknown'),
-                    'icon': guild.get('icon', None),
-                    'owner_role': owner_role or 'Unknown'
-                })
-
-        # Get the list of guilds the bot is already in
-        bot_guilds = []
-        for guild_id, data in memory_cache.items():
-            bot_guilds.append({
-                'id': guild_id,
-                'name': data.get("name", "Unknown"),
-                'owner_name': data.get("owner_name", "Unknown"),
-                'owner_id': data.get("owner_id", "Unknown"),
-                'automod_enabled': data.get("automod_enabled", False),
-                'blocked_keywords': data.get("blocked_keywords", []),
-                'regex_patterns': data.get("regex_patterns", []),
-                'spam_threshold': data.get("spam_threshold", 5),
-                'spam_time_window': data.get("spam_time_window", 10),
-                'bot_role_top': data.get("bot_role_top", False),
-            })
-
-        # Fetch the Discord user
-        discord_user = get_discord_user()
-        if not discord_user:
-            return redirect(url_for('login'))
-        server_settings = load_server_settings()
-
-        try:
-            return render_template(
-                'portal.html',
-                bot_guilds=bot_guilds,
-                user_guilds_with_permissions=user_guilds_with_permissions,
-                discord_user=discord_user,
-                server_settings=server_settings,  # Pass server_settings to the template
-                templates_creation_result=templates_creation_result
-            )
-        except Exception as e:
-            logging.error(f"Error loading portal: {e}")
-            return render_template('error.html', message="An unexpected error occurred. Please try again later.")
-
 @bot.command()
 async def manage_guild(ctx, action: str, guild_id: int):
     """Command to manage a guild, restricted to the owner."""
@@ -4676,11 +6463,11 @@ async def manage_guild(ctx, action: str, guild_id: int):
 
         # Perform the requested action
         if action == "enable_automod":
-            server_settings[str(guild_id)]["automod_enabled"] = True
+            update_guild_settings(guild_id, {"automod_enabled": True})
             save_server_settings(server_settings)
             await ctx.send(f"Automod enabled for guild {guild.name}.")
         elif action == "disable_automod":
-            server_settings[str(guild_id)]["automod_enabled"] = False
+            update_guild_settings(guild_id, {"automod_enabled": False})
             save_server_settings(server_settings)
             await ctx.send(f"Automod disabled for guild {guild.name}.")
         else:
@@ -4713,18 +6500,19 @@ def update_server_settings_for_all_guilds():
     for guild in bot.guilds:
         gid = str(guild.id)
         if gid not in server_settings or not isinstance(server_settings[gid], dict):
-            server_settings[gid] = default_settings.copy()
+            replace_guild_settings(gid, default_settings)
         else:
             # Ensure all required fields exist
-            for k, v in default_settings.items():
-                if k not in server_settings[gid]:
-                    server_settings[gid][k] = v
+            missing = {k: v for k, v in default_settings.items() if k not in server_settings[gid]}
+            if missing:
+                update_guild_settings(gid, missing)
     save_server_settings(server_settings)
 
 @bot.event
 async def on_ready():
     """Triggered when the bot is ready."""
     logging.info(f'Logged in as {bot.user}')
+    portal_state.bump()  # The guild list is complete now
     try:
         # Log all guilds the bot is in
         logging.info("Bot is in the following guilds:")
@@ -4738,12 +6526,11 @@ async def on_ready():
         logging.error(f"Error during on_ready: {e}")
     # Update server_settings for all guilds
     update_server_settings_for_all_guilds()
-    # Assign Owner role to all members in all guilds at startup
-    for guild in bot.guilds:
-        await scan_and_create_owner_role(guild)
-    print("Owner roles assigned to all members in all guilds.")
+    # Assign Owner role to all members in all guilds at startup, as a background job
+    jobs.start_async('owner_role_scan', scan_owner_roles_for_all_guilds)
+    print("Owner role assignment started for all guilds.")
     # Create templates for all guilds automatically on startup
-    threading.Thread(target=generate_templates_on_ready, daemon=True).start()
+    jobs.start('create_templates', generate_templates_on_ready)
 
 
 @bot.event
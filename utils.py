@@ -1,47 +1,431 @@
 import json
 from collections.abc import Mapping, Sequence
+from itertools import islice
+from json.encoder import encode_basestring, encode_basestring_ascii
 
-def sanitize_for_json(obj, seen=None):
+# Keys whose values are always forced to a string / boolean on output
+_STR_KEYS = frozenset(('author', 'content', 'channel'))
+_SPECIAL_KEYS = _STR_KEYS | {'timeout_enabled'}
+_PRIMITIVES = (str, int, float, bool, type(None))
+_PRIMITIVE_TYPES = frozenset(_PRIMITIVES)
+_CIRCULAR = '<circular-reference>'
+# Keyword arguments the fused encoder understands; anything else goes through json.dumps
+_FUSED_KWARGS = frozenset(('indent', 'ensure_ascii', 'sort_keys', 'separators'))
+
+
+def _placeholder(obj):
+    return f'<non-serializable: {type(obj).__qualname__}>'
+
+
+def _is_sequence(obj):
+    return isinstance(obj, Sequence) and not isinstance(obj, (str, bytes, bytearray))
+
+
+def _fix_key(key):
+    """Return a JSON-compatible key (str, int, float, bool or None)."""
+    if isinstance(key, _PRIMITIVES):
+        return key
+    return _placeholder(key)
+
+
+def _fix_special(key, value):
+    """Apply the per-key coercions; returns the (possibly) replaced value."""
+    if key in _STR_KEYS:
+        return value if isinstance(value, str) else str(value)
+    # Always output a boolean for timeout_enabled
+    return value if isinstance(value, bool) else True
+
+
+class _Frame:
+    """One container on the explicit walk stack."""
+    __slots__ = ('obj', 'items', 'is_map', 'out', 'index', 'key', 'key_changed')
+
+    def __init__(self, obj, is_map):
+        self.obj = obj
+        self.is_map = is_map
+        # enumerate() gives the position for free, so a lazy copy knows how much to take
+        self.items = enumerate(obj.items()) if is_map else enumerate(obj)
+        # Copy of the container, created only once something inside it changes.
+        # Mappings that aren't dicts and sequences that aren't lists/tuples always need one.
+        if is_map:
+            self.out = None if type(obj) is dict else {}
+        else:
+            self.out = None if type(obj) in (list, tuple) else []
+        self.index = 0
+        self.key = None
+        self.key_changed = False
+
+    def copy_upto(self, index):
+        """Start the output copy with the first `index` (unchanged) entries."""
+        if self.is_map:
+            self.out = dict(islice(self.obj.items(), index))
+        else:
+            self.out = list(islice(self.obj, index))
+        return self.out
+
+
+def sanitize_for_json(obj):
     """
-    Recursively sanitize an object for JSON serialization:
-    - Handles circular references by replacing them with a string.
+    Sanitize an object for JSON serialization without recursion:
+    - Circular references (a container that appears again inside itself) become a string.
     - Converts only serializable types (dict, list, str, int, float, bool, None).
     - Replaces non-serializable objects with a string placeholder.
+    Containers that need no changes are returned as-is, so an already-primitive
+    tree is handed back without being copied. Objects shared between branches are
+    not cycles and are kept.
     """
-    if seen is None:
-        seen = set()
-    obj_id = id(obj)
-    if obj_id in seen:
-        return '<circular-reference>'
-    seen.add(obj_id)
-
-    if isinstance(obj, (str, int, float, bool)) or obj is None:
+    if _is_json_ready(obj):
         return obj
-    elif isinstance(obj, Mapping):
-        # Defensive: force 'author', 'content', and 'channel' fields to string
-        out = {}
-        for k, v in obj.items():
-            key = sanitize_for_json(k, seen) if not isinstance(k, str) else k
-            if key in ('author', 'content', 'channel'):
-                out[key] = str(v)
-            elif key == 'timeout_enabled':
-                # Always output a boolean for timeout_enabled
-                out[key] = v if isinstance(v, bool) else True
+    if isinstance(obj, Mapping):
+        root = _Frame(obj, True)
+    elif _is_sequence(obj):
+        root = _Frame(obj, False)
+    else:
+        return _placeholder(obj)
+
+    primitive_types = _PRIMITIVE_TYPES
+    special_keys = _SPECIAL_KEYS
+    path = {id(obj)}
+    stack = [root]
+    while stack:
+        frame = stack[-1]
+        out = frame.out
+        child = None
+        if frame.is_map:
+            for index, (raw_key, value) in frame.items:
+                key = raw_key if type(raw_key) is str else _fix_key(raw_key)
+                if key in special_keys:
+                    fixed = _fix_special(key, value)
+                    if out is None and (fixed is not value or key is not raw_key):
+                        out = frame.copy_upto(index)
+                    if out is not None:
+                        out[key] = fixed
+                    continue
+                if type(value) in primitive_types or isinstance(value, _PRIMITIVES):
+                    if out is None and key is not raw_key:
+                        out = frame.copy_upto(index)
+                    if out is not None:
+                        out[key] = value
+                    continue
+                child = _child_frame(value, path)
+                if type(child) is _Frame:
+                    frame.index, frame.key, frame.key_changed = index, key, key is not raw_key
+                    break
+                if child is value:
+                    if out is None and key is not raw_key:
+                        out = frame.copy_upto(index)
+                    if out is not None:
+                        out[key] = value
+                    child = None
+                    continue
+                # A leaf replacement string
+                if out is None:
+                    out = frame.copy_upto(index)
+                out[key] = child
+                child = None
+        else:
+            for index, value in frame.items:
+                if type(value) in primitive_types or isinstance(value, _PRIMITIVES):
+                    if out is not None:
+                        out.append(value)
+                    continue
+                child = _child_frame(value, path)
+                if type(child) is _Frame:
+                    frame.index, frame.key_changed = index, False
+                    break
+                if child is value:
+                    if out is not None:
+                        out.append(value)
+                    child = None
+                    continue
+                if out is None:
+                    out = frame.copy_upto(index)
+                out.append(child)
+                child = None
+        if child is not None:
+            # Descend; the parent resumes from its iterator once the child is done
+            stack.append(child)
+            continue
+        stack.pop()
+        path.discard(id(frame.obj))
+        value = frame.obj if out is None else out
+        if not stack:
+            return value
+        parent = stack[-1]
+        parent_out = parent.out
+        if parent_out is None and (out is not None or parent.key_changed):
+            parent_out = parent.copy_upto(parent.index)
+        if parent_out is not None:
+            if parent.is_map:
+                parent_out[parent.key] = value
+            else:
+                parent_out.append(value)
+    return obj
+
+
+def _child_frame(value, path):
+    """
+    Frame to descend into for a container, the container itself when it is already
+    clean, or the replacement string for a leaf.
+    """
+    if (type(value) is dict or type(value) is list) and id(value) not in path and _is_json_ready(value):
+        return value
+    is_map = isinstance(value, Mapping)
+    if not is_map and not _is_sequence(value):
+        return _placeholder(value)
+    if id(value) in path:
+        return _CIRCULAR
+    path.add(id(value))
+    return _Frame(value, is_map)
+
+
+def _is_json_ready(obj):
+    """
+    True when `obj` is already a plain tree that sanitize_for_json would return unchanged,
+    so it can go straight to the C encoder. Walks without allocating copies.
+    """
+    if isinstance(obj, _PRIMITIVES):
+        return True
+    if type(obj) is not dict and type(obj) is not list:
+        return False
+    primitive_types = _PRIMITIVE_TYPES
+    path = {id(obj)}
+    stack = [(obj, iter(obj.items()) if type(obj) is dict else iter(obj))]
+    while stack:
+        container, items = stack[-1]
+        if type(container) is dict:
+            for key, value in items:
+                if type(key) is not str:
+                    return False
+                if key in _SPECIAL_KEYS:
+                    if type(value) is not (bool if key == 'timeout_enabled' else str):
+                        return False
+                    continue
+                if type(value) in primitive_types:
+                    continue
+                break
             else:
-                out[key] = sanitize_for_json(v, seen)
-        return out
-    elif isinstance(obj, Sequence) and not isinstance(obj, (str, bytes, bytearray)):
-        return [sanitize_for_json(item, seen) for item in obj]
+                value = None
+        else:
+            for value in items:
+                if type(value) not in primitive_types:
+                    break
+            else:
+                value = None
+        if value is None or type(value) in primitive_types:
+            stack.pop()
+            path.discard(id(container))
+            continue
+        kind = type(value)
+        if kind is not dict and kind is not list:
+            return False
+        if id(value) in path:
+            return False
+        path.add(id(value))
+        stack.append((value, iter(value.items()) if kind is dict else iter(value)))
+    return True
+
+
+def _float_repr(value):
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def _encode_primitive(value, encode_str):
+    if isinstance(value, str):
+        return encode_str(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return _float_repr(value)
+
+
+def _key_to_str(key):
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return 'true'
+    if key is False:
+        return 'false'
+    if key is None:
+        return 'null'
+    if isinstance(key, int):
+        return int.__repr__(key)
+    if isinstance(key, float):
+        return _float_repr(key)
+    return _placeholder(key)
+
+
+def _first(pair):
+    return pair[0]
+
+
+def _iterencode(obj, indent=None, ensure_ascii=True, sort_keys=False, separators=None):
+    """
+    Sanitize and encode in a single iterative walk, producing the same text as
+    json.dumps(sanitize_for_json(obj), ...) without building the sanitized copy.
+    """
+    encode_str = encode_basestring_ascii if ensure_ascii else encode_basestring
+    if isinstance(indent, int):
+        indent = ' ' * indent
+    if separators is not None:
+        item_sep, key_sep = separators
+    elif indent is not None:
+        item_sep, key_sep = ',', ': '
     else:
-        return f'<non-serializable: {type(obj).__qualname__}>'
+        item_sep, key_sep = ', ', ': '
+    # Per-depth "before first item", "between items" and "closing" strings
+    newlines = []
+
+    def layout(depth):
+        while len(newlines) <= depth:
+            d = len(newlines)
+            newline = '\n' + indent * d if indent is not None else ''
+            closing = '\n' + indent * (d - 1) if indent is not None and d else ''
+            # The last slot caches "between items + key + key separator" per key
+            newlines.append((newline, item_sep + newline, closing, {}))
+        return newlines[depth]
+
+    chunks = []
+    append = chunks.append
+    primitive_types = _PRIMITIVE_TYPES
+    special_keys = _SPECIAL_KEYS
+    path = set()
+
+    def open_container(value, depth):
+        """Write a leaf, or the opening bracket of a container and return its stack entry."""
+        if type(value) in primitive_types or isinstance(value, _PRIMITIVES):
+            append(_encode_primitive(value, encode_str))
+            return None
+        is_map = isinstance(value, Mapping)
+        if not is_map and not _is_sequence(value):
+            append(encode_str(_placeholder(value)))
+            return None
+        if id(value) in path:
+            append(encode_str(_CIRCULAR))
+            return None
+        if not value:
+            append('{}' if is_map else '[]')
+            return None
+        path.add(id(value))
+        if is_map:
+            append('{')
+            items = value.items()
+            if sort_keys:
+                try:
+                    items = sorted(items, key=_first)
+                except TypeError:
+                    # Mixed key types: order by their JSON text instead of failing
+                    items = sorted(((_key_to_str(k), v) for k, v in items), key=_first)
+            return [value, iter(items), True, depth + 1, layout(depth + 1)[0]]
+        append('[')
+        return [value, iter(value), False, depth + 1, layout(depth + 1)[0]]
+
+    root = open_container(obj, 0)
+    if root is None:
+        return chunks
+    stack = [root]
+    while stack:
+        frame = stack[-1]
+        container, items, is_map, depth, sep = frame
+        _, next_sep, closing, prefixes = layout(depth)
+        child = None
+        if is_map:
+            for key, value in items:
+                if type(key) is not str:
+                    key = _key_to_str(key)
+                if key in special_keys:
+                    value = _fix_special(key, value)
+                if sep is next_sep:
+                    prefix = prefixes.get(key)
+                    if prefix is None:
+                        prefix = prefixes[key] = sep + encode_str(key) + key_sep
+                else:
+                    prefix = sep + encode_str(key) + key_sep
+                    sep = next_sep
+                kind = type(value)
+                if kind is str:
+                    append(prefix + encode_str(value))
+                elif kind is int:
+                    append(prefix + int.__repr__(value))
+                elif kind is bool or value is None:
+                    append(prefix + _encode_primitive(value, encode_str))
+                else:
+                    append(prefix)
+                    child = open_container(value, depth)
+                    if child is not None:
+                        break
+        else:
+            if sep is not next_sep and type(container) is list:
+                # Fast path for flat lists of strings (keyword lists, patterns)
+                try:
+                    encoded = next_sep.join(map(encode_str, container))
+                except TypeError:
+                    pass
+                else:
+                    append(sep + encoded)
+                    items = ()
+            for value in items:
+                kind = type(value)
+                if kind is str:
+                    append(sep + encode_str(value))
+                elif kind is int:
+                    append(sep + int.__repr__(value))
+                else:
+                    append(sep)
+                    child = open_container(value, depth)
+                sep = next_sep
+                if child is not None:
+                    break
+        if child is not None:
+            frame[4] = sep
+            stack.append(child)
+            continue
+        stack.pop()
+        path.discard(id(container))
+        append(closing + ('}' if is_map else ']'))
+    return chunks
+
+
+def safe_json_dumps(obj, **kwargs):
+    """
+    Safely convert an object to a JSON string, avoiding circular references.
+    Already-clean trees without indentation go straight to the C encoder; everything
+    else is sanitized and encoded in one walk.
+    """
+    if not kwargs.keys() <= _FUSED_KWARGS:
+        return json.dumps(sanitize_for_json(obj), **kwargs)
+    if kwargs.get('indent') is None and _is_json_ready(obj):
+        return json.dumps(obj, **kwargs)
+    return ''.join(_iterencode(obj, **kwargs))
+
 
 def safe_json_dump(obj, fp, **kwargs):
     """Safely dump an object to JSON, avoiding circular references."""
-    sanitized = sanitize_for_json(obj)
-    json.dump(sanitized, fp, **kwargs)
+    fp.write(safe_json_dumps(obj, **kwargs))
 
 
-def safe_json_dumps(obj, **kwargs):
-    """Safely convert an object to a JSON string, avoiding circular references."""
-    sanitized = sanitize_for_json(obj)
-    return json.dumps(sanitized, **kwargs)
+def json_merge_patch(target, patch):
+    """
+    Apply an RFC 7386 JSON merge patch and return the result. `target` is not
+    modified; subtrees the patch does not touch are shared with it.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = json_merge_patch(result.get(key), value)
+    return result